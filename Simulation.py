@@ -1,15 +1,23 @@
+import argparse
 import pygame
 import sys
 import math
-
-# Initialisation de Pygame
-pygame.init()
+import numpy as np
+
+from collision_continue import avancer_continu
+import kernels
+import phase_etroite
+from grille_spatiale import GrilleSpatiale
+from integrators import make_integrator
+from physics_thread import PhysicsThread
+from profiling import NULL_PROFILER, Profiler
+from solveur_contacts import SolveurContacts
+from sommeil import Sommeil
+from stock_corps import StockCorps, champ_scalaire, champ_vecteur
 
 # Dimensions de l'écran
 largeur = 800
 hauteur = 600
-ecran = pygame.display.set_mode((largeur, hauteur))
-pygame.display.set_caption("Simulateur Physique avec Vecteurs")
 
 # Couleurs
 BLANC = (255, 255, 255)
@@ -31,8 +39,22 @@ class Sol:
         pygame.draw.rect(surface, self.couleur, (0, self.y, largeur, self.hauteur))
 
 # Classe de base pour les objets physiques
+# L'état physique est rangé dans un StockCorps (tableaux NumPy) : l'objet n'en est qu'une vue.
+# Un objet isolé possède son propre stock d'une ligne ; World.ajouter le rattache au stock du monde.
 class ObjetPhysique:
+    forme = None # Type de forme de la table de phase_etroite (CERCLE, CARRE, RECTANGLE)
+    x = champ_vecteur("position", 0)
+    y = champ_vecteur("position", 1)
+    vx = champ_vecteur("vitesse", 0)
+    vy = champ_vecteur("vitesse", 1)
+    ax = champ_vecteur("acceleration", 0)
+    ay = champ_vecteur("acceleration", 1)
+    coefficient_restitution = champ_scalaire("restitution")
+    masse = champ_scalaire("masse")
+
     def __init__(self, x, y, couleur, coefficient_restitution=1.0):
+        self._stock = None
+        StockCorps(1).ajouter(self)
         self.x = x
         self.y = y
         self.couleur = couleur
@@ -46,33 +68,54 @@ class ObjetPhysique:
         self.echelle_vitesse = 0.5  # Longueur du vecteur vitesse = magnitude * echelle_vitesse
         self.echelle_acceleration = 0.3 # Longueur du vecteur accélération = magnitude * echelle_acceleration
 
+    @classmethod
+    def vue(cls, stock, indice, couleur):
+        # Objet rattaché à une ligne déjà remplie d'un stock, sans passer par __init__ (pas de stock
+        # propre d'une ligne) : sert à la création de corps en bloc
+        objet = cls.__new__(cls)
+        objet._stock = stock
+        objet._indice = indice
+        objet.couleur = couleur
+        objet.echelle_vitesse = 0.5
+        objet.echelle_acceleration = 0.3
+        return objet
+
     def deplacer(self, dt):
         self.vx += self.ax * dt
         self.vy += self.ay * dt
         self.x += self.vx * dt
         self.y += self.vy * dt
 
-    def dessiner(self, surface):
+    def dessiner(self, surface, position=None):
+        # position : (x, y) à utiliser à la place de l'état courant (affichage interpolé)
         raise NotImplementedError("La méthode dessiner doit être implémentée par les sous-classes.")
 
     def get_centre(self):
+        return self.centre_en(self.x, self.y)
+
+    def centre_en(self, x, y):
         # Par défaut, le point (x,y) est le centre (utile pour les objets ponctuels ou si surchargé)
         # Pour les formes, cette méthode sera surchargée
-        return self.x, self.y
+        return x, y
+
+    def get_boite(self):
+        # Boîte englobante alignée sur les axes (xmin, ymin, xmax, ymax), utilisée par la broad phase
+        return self.x, self.y, self.x, self.y
 
-    def dessiner_vecteurs(self, surface):
-        centre_x, centre_y = self.get_centre()
+    def dessiner_vecteurs(self, surface, position=None, vitesse=None):
+        centre_x, centre_y = self.get_centre() if position is None else self.centre_en(*position)
+        vx, vy = (self.vx, self.vy) if vitesse is None else vitesse
         longueur_pointe = 8
         epaisseur_vecteur = 2
 
         # Dessiner le vecteur vitesse (en bleu)
-        fin_vx = centre_x + self.vx * self.echelle_vitesse
-        fin_vy = centre_y + self.vy * self.echelle_vitesse
+        fin_vx = centre_x + vx * self.echelle_vitesse
+        fin_vy = centre_y + vy * self.echelle_vitesse
         pygame.draw.line(surface, BLEU, (int(centre_x), int(centre_y)), (int(fin_vx), int(fin_vy)), epaisseur_vecteur)
         
-        magnitude_v = math.sqrt(self.vx**2 + self.vy**2)
+        magnitude_v = math.sqrt(vx**2 + vy**2)
         if magnitude_v > 0.01: # Éviter atan2(0,0) et dessiner pour des vecteurs non nuls
-            angle_v = math.atan2(self.vy, self.vx)
+            angle_v = math.atan2(vy, vx)
             pygame.draw.line(surface, BLEU, (int(fin_vx), int(fin_vy)), (int(fin_vx - longueur_pointe * math.cos(angle_v - math.pi / 6)), int(fin_vy - longueur_pointe * math.sin(angle_v - math.pi / 6))), epaisseur_vecteur)
             pygame.draw.line(surface, BLEU, (int(fin_vx), int(fin_vy)), (int(fin_vx - longueur_pointe * math.cos(angle_v + math.pi / 6)), int(fin_vy - longueur_pointe * math.sin(angle_v + math.pi / 6))), epaisseur_vecteur)
 
@@ -88,324 +131,488 @@ class ObjetPhysique:
             pygame.draw.line(surface, VERT, (int(fin_ax), int(fin_ay)), (int(fin_ax - longueur_pointe * math.cos(angle_a + math.pi / 6)), int(fin_ay - longueur_pointe * math.sin(angle_a + math.pi / 6))), epaisseur_vecteur)
 
     def collision(self, autre_objet):
-        raise NotImplementedError("La méthode collision doit être implémentée par les sous-classes.")
+        # Test et réponse donnés par la table de phase_etroite, selon le couple de formes
+        return phase_etroite.collision_paire(self, autre_objet)
 
     def gestion_collision(self, autre_objet):
-        pass
+        phase_etroite.gestion_paire(self, autre_objet)
 
 # Classe pour les cercles
 class Cercle(ObjetPhysique):
+    forme = phase_etroite.CERCLE
+
     def __init__(self, x, y, rayon, couleur, coefficient_restitution=0.8):
         super().__init__(x, y, couleur, coefficient_restitution)
         self.rayon = rayon
         self.masse = math.pi * rayon**2 # Masse proportionnelle à l'aire (densité = 1)
 
-    def dessiner(self, surface):
-        pygame.draw.circle(surface, self.couleur, (int(self.x), int(self.y)), self.rayon)
+    @property
+    def rayon(self):
+        return self._rayon
 
-    def get_centre(self):
-        return self.x, self.y
+    @rayon.setter
+    def rayon(self, rayon):
+        # La boîte englobante du stock suit le rayon : (x, y) est le centre du cercle
+        self._rayon = rayon
+        self._stock.decalage[self._indice] = -rayon
+        self._stock.dimensions[self._indice] = 2 * rayon
 
-    def collision(self, autre_objet):
-        if isinstance(autre_objet, Cercle):
-            distance_centre = math.sqrt((self.x - autre_objet.x)**2 + (self.y - autre_objet.y)**2)
-            return distance_centre < self.rayon + autre_objet.rayon
-        elif isinstance(autre_objet, Carre):
-            # Le point le plus proche sur le carré du centre du cercle
-            closest_x = max(autre_objet.x, min(self.x, autre_objet.x + autre_objet.taille))
-            closest_y = max(autre_objet.y, min(self.y, autre_objet.y + autre_objet.taille))
-            distance_sq = (self.x - closest_x)**2 + (self.y - closest_y)**2
-            return distance_sq < self.rayon**2
-        elif isinstance(autre_objet, Rectangle):
-            closest_x = max(autre_objet.x, min(self.x, autre_objet.x + autre_objet.largeur))
-            closest_y = max(autre_objet.y, min(self.y, autre_objet.y + autre_objet.hauteur))
-            distance_sq = (self.x - closest_x)**2 + (self.y - closest_y)**2
-            return distance_sq < self.rayon**2
-        return False
+    def dessiner(self, surface, position=None):
+        x, y = (self.x, self.y) if position is None else position
+        pygame.draw.circle(surface, self.couleur, (int(x), int(y)), self.rayon)
 
-    def gestion_collision(self, autre_objet):
-        if isinstance(autre_objet, Cercle):
-            # S'assurer que les deux objets ont une masse
-            if not hasattr(self, 'masse'): self.masse = 1 
-            if not hasattr(autre_objet, 'masse'): autre_objet.masse = 1
-
-            distance_centre = math.sqrt((self.x - autre_objet.x)**2 + (self.y - autre_objet.y)**2)
-            if distance_centre == 0: # Éviter la division par zéro si superposés parfaitement
-                return 
-
-            nx = (autre_objet.x - self.x) / distance_centre
-            ny = (autre_objet.y - self.y) / distance_centre
-            
-            # Vitesses le long de la normale
-            v1n = self.vx * nx + self.vy * ny
-            v2n = autre_objet.vx * nx + autre_objet.vy * ny
-
-            e = min(self.coefficient_restitution, autre_objet.coefficient_restitution)
-            
-            # Calcul des nouvelles vitesses le long de la normale
-            # Formule de collision 1D pour masses m1, m2 et vitesses u1, u2:
-            # v1_new = (m1*u1 + m2*u2 + m2*e*(u2-u1)) / (m1+m2)
-            # v2_new = (m1*u1 + m2*u2 + m1*e*(u1-u2)) / (m1+m2)
-            m1 = self.masse
-            m2 = autre_objet.masse
-
-            v1n_new = (m1 * v1n + m2 * v2n + m2 * e * (v2n - v1n)) / (m1 + m2)
-            v2n_new = (m1 * v1n + m2 * v2n + m1 * e * (v1n - v2n)) / (m1 + m2)
-
-            # Mettre à jour les vitesses des objets
-            self.vx += (v1n_new - v1n) * nx
-            self.vy += (v1n_new - v1n) * ny
-            autre_objet.vx += (v2n_new - v2n) * nx
-            autre_objet.vy += (v2n_new - v2n) * ny
-
-            # Résoudre le chevauchement
-            overlap = 0.5 * (self.rayon + autre_objet.rayon - distance_centre)
-            if overlap > 0: # S'assurer qu'il y a bien chevauchement à corriger
-                self.x -= overlap * nx
-                self.y -= overlap * ny
-                autre_objet.x += overlap * nx
-                autre_objet.y += overlap * ny
+    def centre_en(self, x, y):
+        return x, y
+
+    def get_boite(self):
+        return self.x - self.rayon, self.y - self.rayon, self.x + self.rayon, self.y + self.rayon
 
 
 # Classe pour les carrés
 class Carre(ObjetPhysique):
+    forme = phase_etroite.CARRE
+
     def __init__(self, x, y, taille, couleur, coefficient_restitution=0.7):
         super().__init__(x, y, couleur, coefficient_restitution)
         self.taille = taille
         self.masse = taille**2 # Masse proportionnelle à l'aire
 
-    def dessiner(self, surface):
-        pygame.draw.rect(surface, self.couleur, (int(self.x), int(self.y), self.taille, self.taille))
+    @property
+    def taille(self):
+        return self._taille
 
-    def get_centre(self):
-        return self.x + self.taille / 2, self.y + self.taille / 2
+    @taille.setter
+    def taille(self, taille):
+        # (x, y) est le coin supérieur gauche : pas de décalage
+        self._taille = taille
+        self._stock.dimensions[self._indice] = taille
 
-    def collision(self, autre_objet):
-        if isinstance(autre_objet, Carre):
-            return (self.x < autre_objet.x + autre_objet.taille and
-                    self.x + self.taille > autre_objet.x and
-                    self.y < autre_objet.y + autre_objet.taille and
-                    self.y + self.taille > autre_objet.y)
-        elif isinstance(autre_objet, Cercle):
-            return autre_objet.collision(self) # Déléguer à la méthode du cercle
-        elif isinstance(autre_objet, Rectangle):
-            return (self.x < autre_objet.x + autre_objet.largeur and
-                    self.x + self.taille > autre_objet.x and
-                    self.y < autre_objet.y + autre_objet.hauteur and
-                    self.y + self.taille > autre_objet.y)
-        return False
+    def dessiner(self, surface, position=None):
+        x, y = (self.x, self.y) if position is None else position
+        pygame.draw.rect(surface, self.couleur, (int(x), int(y), self.taille, self.taille))
 
-    def gestion_collision(self, autre_objet):
-        if isinstance(autre_objet, Carre):
-            # Simplifié, sans utiliser la masse explicitement ici
-            v1x, v1y = self.vx, self.vy
-            v2x, v2y = autre_objet.vx, autre_objet.vy
-            e = min(self.coefficient_restitution, autre_objet.coefficient_restitution)
-            
-            # Échange simple de vitesses (comme si les masses étaient égales)
-            self.vx, autre_objet.vx = e * v2x, e * v1x
-            self.vy, autre_objet.vy = e * v2y, e * v1y
-
-            # Ajustement de position pour éviter le chevauchement (méthode de séparation par axe)
-            overlap_x = (self.taille / 2 + autre_objet.taille / 2) - abs((self.x + self.taille/2) - (autre_objet.x + autre_objet.taille/2))
-            overlap_y = (self.taille / 2 + autre_objet.taille / 2) - abs((self.y + self.taille/2) - (autre_objet.y + autre_objet.taille/2))
-
-            if overlap_x > 0 and overlap_y > 0:
-                dx = (autre_objet.x + autre_objet.taille/2) - (self.x + self.taille/2)
-                dy = (autre_objet.y + autre_objet.taille/2) - (self.y + self.taille/2)
-
-                if overlap_x < overlap_y:
-                    if dx > 0: # L'autre objet est à droite
-                        self.x -= overlap_x / 2
-                        autre_objet.x += overlap_x / 2
-                    else: # L'autre objet est à gauche
-                        self.x += overlap_x / 2
-                        autre_objet.x -= overlap_x / 2
-                else:
-                    if dy > 0: # L'autre objet est en dessous
-                        self.y -= overlap_y / 2
-                        autre_objet.y += overlap_y / 2
-                    else: # L'autre objet est au-dessus
-                        self.y += overlap_y / 2
-                        autre_objet.y -= overlap_y / 2
+    def centre_en(self, x, y):
+        return x + self.taille / 2, y + self.taille / 2
+
+    def get_boite(self):
+        return self.x, self.y, self.x + self.taille, self.y + self.taille
 
 
 # Classe pour les rectangles
 class Rectangle(ObjetPhysique):
+    forme = phase_etroite.RECTANGLE
+
     def __init__(self, x, y, largeur, hauteur, couleur, coefficient_restitution=0.6):
         super().__init__(x, y, couleur, coefficient_restitution)
         self.largeur = largeur
         self.hauteur = hauteur
         self.masse = largeur * hauteur # Masse proportionnelle à l'aire
 
-    def dessiner(self, surface):
-        pygame.draw.rect(surface, self.couleur, (int(self.x), int(self.y), self.largeur, self.hauteur))
-
-    def get_centre(self):
-        return self.x + self.largeur / 2, self.y + self.hauteur / 2
-
-    def collision(self, autre_objet):
-        if isinstance(autre_objet, Rectangle):
-            return (self.x < autre_objet.x + autre_objet.largeur and
-                    self.x + self.largeur > autre_objet.x and
-                    self.y < autre_objet.y + autre_objet.hauteur and
-                    self.y + self.hauteur > autre_objet.y)
-        elif isinstance(autre_objet, Cercle):
-            return autre_objet.collision(self)
-        elif isinstance(autre_objet, Carre):
-            return autre_objet.collision(self) # Déléguer au carré ou réimplémenter
-        return False
+    @property
+    def largeur(self):
+        return self._largeur
+
+    @largeur.setter
+    def largeur(self, largeur):
+        self._largeur = largeur
+        self._stock.dimensions[self._indice, 0] = largeur
+
+    @property
+    def hauteur(self):
+        return self._hauteur
+
+    @hauteur.setter
+    def hauteur(self, hauteur):
+        self._hauteur = hauteur
+        self._stock.dimensions[self._indice, 1] = hauteur
+
+    def dessiner(self, surface, position=None):
+        x, y = (self.x, self.y) if position is None else position
+        pygame.draw.rect(surface, self.couleur, (int(x), int(y), self.largeur, self.hauteur))
+
+    def centre_en(self, x, y):
+        return x + self.largeur / 2, y + self.hauteur / 2
+
+    def get_boite(self):
+        return self.x, self.y, self.x + self.largeur, self.y + self.hauteur
+
+
+# Paramètres du pas de temps
+FPS = 60 # Frames par seconde (affichage)
+DT_FIXE = 1 / FPS # Pas de temps fixe de la physique, en secondes
+MAX_PAS_PAR_FRAME = 8 # Limite de pas rattrapés par frame (évite la "spirale de la mort")
+MARGE_PAIRES = 0.1 # Marge des boîtes de la broad phase, en fraction de leur côté moyen
+
+
+# Fonction d'accélération des intégrateurs (integrators.py) pour des accélérations qui ne dépendent
+# pas des positions ; cibles : indices des seuls corps demandés (BlockTimestep), ou None pour tous
+def acceleration_constante(acceleration):
+    return lambda positions, cibles=None: acceleration if cibles is None else acceleration[cibles]
+
+
+# Monde physique sans affichage : possède les objets et le sol, et fait avancer la physique.
+# Utilisable sans pygame.display (calculs en lot), ou piloté par la boucle d'affichage via avancer().
+class World:
+    def __init__(self, objets=None, sol=None, largeur_monde=largeur, dt_fixe=DT_FIXE, sous_pas=1,
+                 broad_phase=None, integrateur="euler", ccd=False, sommeil=False,
+                 solveur=None):
+        # Les objets du monde sont des vues sur self.stock : objets[k] correspond à la ligne k
+        self.stock = StockCorps()
+        self.objets = []
+        self._formes = np.zeros(0, dtype=np.int64)
+        for objet in objets or []:
+            self.ajouter(objet)
+        self.sol = sol
+        self.largeur = largeur_monde
+        self.dt_fixe = dt_fixe
+        self.sous_pas = sous_pas # Nombre de sous-pas par pas (plus précis pour les objets rapides)
+        # Recherche des paires candidates (grille spatiale par défaut, au lieu de la double boucle O(n²))
+        self.broad_phase = broad_phase if broad_phase is not None else GrilleSpatiale()
+        # Schéma d'intégration : "euler" (d'origine), "verlet", "yoshida4", "rk4" ou "block"
+        self.integrateur = make_integrator(integrateur)
+        # Détection continue des collisions (collision_continue) : pas plus grands sans effet tunnel
+        self.ccd = ccd
+        # Mise en sommeil des îlots au repos (True, ou une instance de sommeil.Sommeil réglée)
+        self.sommeil = Sommeil() if sommeil is True else (sommeil or None)
+        # Solveur de contacts itératif (True, ou une instance de solveur_contacts.SolveurContacts) :
+        # remplace la phase étroite et les rebonds. Il intègre lui-même les vitesses puis les
+        # positions (Euler semi-implicite), l'intégrateur et la CCD ne sont alors pas utilisés.
+        self.solveur = SolveurContacts() if solveur is True else (solveur or None)
+        # Mesure du temps par phase (profiling.Profiler) ; NULL_PROFILER ne mesure rien
+        self.profiler = NULL_PROFILER
+
+        self.accumulateur = 0.0 # Temps réel non encore simulé
+        self.temps = 0.0 # Temps simulé total
+        self.nb_pas = 0
+        self.nb_collisions = 0 # Collisions entre objets détectées depuis le début
+
+    def ajouter(self, objet):
+        self.stock.ajouter(objet)
+        self.objets.append(objet)
+        return objet
+
+    def ajouter_cercles(self, positions, rayons, vitesses=None, accelerations=None, restitution=0.8,
+                        masses=None, couleur=NOIR):
+        # Ajout en bloc de len(rayons) cercles : les lignes du stock sont remplies par tableaux, puis
+        # une vue Cercle est créée par ligne. restitution est un nombre ou un tableau ; masses par
+        # défaut proportionnelles à l'aire, comme Cercle. Renvoie la liste des nouveaux cercles.
+        rayons = np.asarray(rayons, dtype=float)
+        k = len(rayons)
+        debut = self.stock.allouer(k)
+        lignes = slice(debut, debut + k)
+        self.stock.position[lignes] = positions
+        self.stock.vitesse[lignes] = 0.0 if vitesses is None else vitesses
+        self.stock.acceleration[lignes] = 0.0 if accelerations is None else accelerations
+        self.stock.decalage[lignes] = -rayons[:, None]
+        self.stock.dimensions[lignes] = 2 * rayons[:, None]
+        self.stock.restitution[lignes] = restitution
+        self.stock.masse[lignes] = math.pi * rayons ** 2 if masses is None else masses
+
+        cercles = []
+        for indice, rayon in zip(range(debut, debut + k), rayons.tolist()):
+            cercle = Cercle.vue(self.stock, indice, couleur)
+            cercle._rayon = rayon
+            cercles.append(cercle)
+        self.formes()
+        self.objets.extend(cercles)
+        self._formes = np.concatenate((self._formes, np.full(k, phase_etroite.CERCLE)))
+        return cercles
+
+    def step(self, dt):
+        profiler = self.profiler
+        collisions_avant = self.nb_collisions
+        if self.sommeil is not None:
+            self.sommeil.redimensionner(self.stock.n)
+            self.sommeil.reveiller_si_vitesse(self.stock.vitesse[:self.stock.n])
+        dt_sous_pas = dt / self.sous_pas
+        for _ in range(self.sous_pas):
+            if self.solveur is not None:
+                actifs = self.sommeil.actifs() if self.sommeil is not None and self.sommeil.endormi.any() else None
+                with profiler.phase("solver"):
+                    self.solveur.step(self, dt_sous_pas, actifs)
+                continue
+            if self.ccd:
+                with profiler.phase("ccd"):
+                    avancer_continu(self, dt_sous_pas)
+            else:
+                with profiler.phase("integration"):
+                    self.integrer(dt_sous_pas)
+            with profiler.phase("bounds"):
+                self.rebonds()
+            self.collisions()
+        if self.sommeil is not None:
+            with profiler.phase("sleep"):
+                self.endormir(dt)
+        profiler.count("collisions", self.nb_collisions - collisions_avant)
+        self.temps += dt
+        self.nb_pas += 1
+
+    def run(self, n_steps, dt=None):
+        # Exécute n_steps pas fixes, aussi vite que possible (aucune synchronisation avec l'horloge)
+        if dt is None:
+            dt = self.dt_fixe
+        for _ in range(n_steps):
+            self.step(dt)
+
+    def avancer(self, temps_ecoule, max_pas=MAX_PAS_PAR_FRAME):
+        # Accumulateur à pas fixe : consomme le temps réel écoulé par tranches de dt_fixe.
+        # Renvoie la fraction de pas restante (0 <= alpha < 1), utile pour interpoler l'affichage.
+        self.accumulateur += temps_ecoule
+        n = 0
+        while self.accumulateur >= self.dt_fixe and n < max_pas:
+            self.step(self.dt_fixe)
+            self.accumulateur -= self.dt_fixe
+            n += 1
+        if n == max_pas:
+            # Trop de retard : on abandonne le temps non rattrapé plutôt que de ralentir encore
+            self.accumulateur = min(self.accumulateur, self.dt_fixe)
+        return self.accumulateur / self.dt_fixe
+
+    def deplacer_objets(self, dt):
+        # Intégration puis rebonds sur les bords et le sol, vectorisés sur tous les objets
+        self.integrer(dt)
+        self.rebonds()
+
+    def integrer(self, dt):
+        n = self.stock.n
+        if self.sommeil is not None and self.sommeil.endormi.any():
+            # Seuls les corps éveillés sont intégrés (copies, recopiées ensuite dans le stock)
+            actifs = self.sommeil.actifs()
+            position, vitesse = self.stock.position[actifs], self.stock.vitesse[actifs]
+            acceleration = self.stock.acceleration[actifs]
+            self.integrateur.step(position, vitesse, acceleration_constante(acceleration), dt)
+            self.stock.position[actifs] = position
+            self.stock.vitesse[actifs] = vitesse
+            return
+        acceleration = self.stock.acceleration[:n]
+        self.integrateur.step(self.stock.position[:n], self.stock.vitesse[:n], acceleration_constante(acceleration), dt)
+
+    def rebonds(self):
+        self.stock.rebonds_bords(self.largeur, self.sol)
+
+    def collisions(self):
+        # Vérifier les collisions entre les objets : la broad phase ne renvoie que les paires
+        # dont les boîtes englobantes (élargies) se chevauchent, la phase étroite décide ensuite
+        with self.profiler.phase("broad_phase"):
+            boites = self.boites_elargies()
+            paires = self.paires_candidates(boites)
+        with self.profiler.phase("narrow_phase"):
+            self.phase_etroite(paires, boites)
+
+    def formes(self):
+        # Type de forme de chaque objet (phase_etroite.CERCLE, CARRE ou RECTANGLE)
+        if len(self._formes) != len(self.objets):
+            self._formes = np.array([objet.forme for objet in self.objets], dtype=np.int64)
+        return self._formes
+
+    def masque_cercles(self):
+        # Tableau booléen : objets[k] est-il un Cercle (les autres formes sont des boîtes)
+        return self.formes() == phase_etroite.CERCLE
+
+    def boites_elargies(self):
+        # Boîtes englobantes agrandies de MARGE_PAIRES fois le côté moyen : les paires candidates
+        # couvrent aussi les corps qu'une réponse pousse un peu (voir phase_etroite)
+        boites = self.stock.boites()
+        if len(boites) == 0:
+            return boites
+        marge = MARGE_PAIRES * float(np.maximum(boites[:, 2] - boites[:, 0], boites[:, 3] - boites[:, 1]).mean())
+        return boites + np.array([-marge, -marge, marge, marge])
+
+    def paires_candidates(self, boites=None):
+        # Paires dont les boîtes se chevauchent (par défaut, les boîtes englobantes des corps)
+        return self.broad_phase.paires_depuis_boites(self.stock.boites() if boites is None else boites)
+
+    def phase_etroite(self, paires, boites=None):
+        # paires : toutes les paires dont les boîtes (par défaut les boîtes englobantes actuelles) se
+        # chevauchent. Une réponse peut pousser un corps hors de sa boîte, contre un autre qui n'était
+        # pas candidat (la double boucle d'origine testait toutes les paires) : l'enveloppe de chaque
+        # boîte et des positions prises ensuite par le corps est suivie. Si des enveloppes sorties de
+        # leur boîte en chevauchent d'autres hors des paires candidates, la phase reprend depuis l'état
+        # de départ avec ces paires en plus ; sinon aucune autre paire n'a pu se toucher, et le
+        # résultat est celui de la double boucle.
+        paires = np.array(paires, dtype=np.int64).reshape(-1, 2)
+        n = self.stock.n
+        boites = self.stock.boites() if boites is None else boites
+        while True:
+            # Seuls les corps des paires peuvent bouger : leur état de départ suffit pour reprendre
+            corps = np.unique(paires)
+            depart = self.stock.position[corps].copy(), self.stock.vitesse[corps].copy()
+            enveloppes = boites.copy()
+            i, j, touche = self.resoudre_paires(paires, enveloppes)
+            sortis = ((enveloppes[corps, :2] < boites[corps, :2]) | (enveloppes[corps, 2:] > boites[corps, 2:])).any(axis=1)
+            nouvelles = np.array(self.broad_phase.paires_avec(enveloppes, corps[sortis]), dtype=np.int64).reshape(-1, 2)
+            cles = paires[:, 0] * n + paires[:, 1]
+            nouvelles = nouvelles[~np.isin(nouvelles[:, 0] * n + nouvelles[:, 1], cles)]
+            if len(nouvelles) == 0:
+                break
+            self.stock.position[corps], self.stock.vitesse[corps] = depart
+            cles = np.union1d(cles, nouvelles[:, 0] * n + nouvelles[:, 1])
+            paires = np.column_stack((cles // n, cles % n))
+        self.profiler.count("pair_tests", len(i))
+        self.nb_collisions += int(touche.sum())
+        if self.sommeil is not None:
+            # Contacts notés pour former les îlots ; un contact avec un corps endormi réveille son îlot
+            self.sommeil.noter_contacts(i[touche], j[touche])
+
+    def resoudre_paires(self, paires, enveloppes):
+        # Une passe de la phase étroite sur les paires (tableau (k, 2)), dans l'ordre ; renvoie les
+        # paires testées (i, j) et le masque de celles en collision
+        i, j = paires[:, 0], paires[:, 1]
+        if self.sommeil is not None:
+            # Les paires de deux corps endormis ne sont pas testées
+            i, j = self.sommeil.filtrer_paires(i, j)
+        elif kernels.ENABLED and self.masque_cercles().all():
+            # Noyau compilé (Numba) : même boucle que Cercle.collision / gestion_collision
+            n = self.stock.n
+            touche = np.zeros(len(i), dtype=bool)
+            kernels.circle_pairs(self.stock.position[:n], self.stock.vitesse[:n], self.stock.dimensions[:n, 0] / 2,
+                                 self.stock.masse[:n], self.stock.restitution[:n], i, j, enveloppes, touche)
+            return i, j, touche
+        # Table de phase_etroite : paires regroupées par couple de formes, testées et résolues par lots
+        return i, j, phase_etroite.phase_etroite(self.stock, self.formes(), i, j, enveloppes)
+
+    def endormir(self, dt):
+        # Endort les îlots au repos : leur vitesse est annulée
+        n = self.stock.n
+        nouveaux = self.sommeil.mettre_a_jour(self.stock.vitesse[:n], self.stock.masse[:n], dt)
+        self.stock.vitesse[:n][nouveaux] = 0.0
+
+    def energie(self):
+        # Énergie mécanique : cinétique + potentielle de l'accélération constante de chaque objet
+        n = self.stock.n
+        masse = self.stock.masse[:n]
+        cinetique = 0.5 * (masse * (self.stock.vitesse[:n] ** 2).sum(axis=1)).sum()
+        potentielle = -(masse * (self.stock.acceleration[:n] * self.stock.position[:n]).sum(axis=1)).sum()
+        return float(cinetique + potentielle)
+
+    def etat(self):
+        # Copie de l'état affiché (x, y, vx, vy) de chaque objet : instantané publié par le thread physique
+        n = self.stock.n
+        return np.hstack((self.stock.position[:n], self.stock.vitesse[:n]))
+
+    def dessiner(self, surface, etat=None, profiler=NULL_PROFILER):
+        # etat : tableau (n, 4) renvoyé par etat() (ou interpolé) à dessiner à la place de l'état courant.
+        # profiler : mesure séparément le dessin des formes et celui des vecteurs
+        if self.sol is not None:
+            self.sol.dessiner(surface)
+        if etat is None:
+            for objet in self.objets:
+                with profiler.phase("draw"):
+                    objet.dessiner(surface)
+                with profiler.phase("vectors"):
+                    objet.dessiner_vecteurs(surface)
+            return
+        for objet, (x, y, vx, vy) in zip(self.objets, etat.tolist()):
+            with profiler.phase("draw"):
+                objet.dessiner(surface, (x, y))
+            with profiler.phase("vectors"):
+                objet.dessiner_vecteurs(surface, (x, y), (vx, vy))
+
+
+# Création de la scène de démonstration
+def creer_monde():
+    # Création du sol
+    sol = Sol(hauteur - 50, 50, GRIS, 0.3)
+    monde = World(sol=sol)
+
+    # Création d'objets
+    cercle1 = Cercle(150, 100, 30, NOIR, 0.5) # Changé en ROUGE pour mieux le voir
+    cercle1.vx = 50
+    cercle1.vy = 0
+    cercle1.ay = 98 # Simule la gravité (pixels/s^2)
+    cercle1.masse = 5 # Masse spécifique
+    monde.ajouter(cercle1)
+
+    cercle2 = Cercle(50, 150, 20, NOIR, 0.5) # Changé en BLEU
+    cercle2.vx = 70
+    cercle2.vy = -20
+    cercle2.ay = 98
+    cercle2.masse = 10 # Masse spécifique plus grande
+    monde.ajouter(cercle2)
+
+    cercle3 = Cercle(330, 80, 25, VERT, 0.7) # Changé en VERT
+    cercle3.vx = -70
+    cercle3.vy = 10
+    cercle3.ay = 98
+    cercle3.masse = 1
+    monde.ajouter(cercle3)
+
+    # carre1 = Carre(400, 100, 40, NOIR, 0.7)
+    # carre1.vx = -30
+    # carre1.ay = 98
+    # monde.ajouter(carre1)
+
+    return monde
 
-    def gestion_collision(self, autre_objet):
-         if isinstance(autre_objet, Rectangle):
-            v1x, v1y = self.vx, self.vy
-            v2x, v2y = autre_objet.vx, autre_objet.vy
-            e = min(self.coefficient_restitution, autre_objet.coefficient_restitution)
-            
-            self.vx, autre_objet.vx = e * v2x, e * v1x
-            self.vy, autre_objet.vy = e * v2y, e * v1y
-            
-            # Ajustement de position
-            overlap_x = (self.largeur / 2 + autre_objet.largeur / 2) - abs((self.x + self.largeur/2) - (autre_objet.x + autre_objet.largeur/2))
-            overlap_y = (self.hauteur / 2 + autre_objet.hauteur / 2) - abs((self.y + self.hauteur/2) - (autre_objet.y + autre_objet.hauteur/2))
-
-            if overlap_x > 0 and overlap_y > 0:
-                dx = (autre_objet.x + autre_objet.largeur/2) - (self.x + self.largeur/2)
-                dy = (autre_objet.y + autre_objet.hauteur/2) - (self.y + self.hauteur/2)
-
-                if overlap_x < overlap_y:
-                    if dx > 0:
-                        self.x -= overlap_x / 2
-                        autre_objet.x += overlap_x / 2
-                    else:
-                        self.x += overlap_x / 2
-                        autre_objet.x -= overlap_x / 2
-                else:
-                    if dy > 0:
-                        self.y -= overlap_y / 2
-                        autre_objet.y += overlap_y / 2
-                    else:
-                        self.y += overlap_y / 2
-                        autre_objet.y -= overlap_y / 2
-
-
-# Création du sol
-sol = Sol(hauteur - 50, 50, GRIS, 0.3)
-
-# Liste pour stocker les objets physiques
-objets = []
-
-# Création d'objets
-cercle1 = Cercle(150, 100, 30, NOIR, 0.5) # Changé en ROUGE pour mieux le voir
-cercle1.vx = 50
-cercle1.vy = 0
-cercle1.ay = 98 # Simule la gravité (pixels/s^2)
-cercle1.masse = 5 # Masse spécifique
-objets.append(cercle1)
-
-cercle2 = Cercle(50, 150, 20, NOIR, 0.5) # Changé en BLEU
-cercle2.vx = 70
-cercle2.vy = -20
-cercle2.ay = 98
-cercle2.masse = 10 # Masse spécifique plus grande
-objets.append(cercle2)
-
-cercle3 = Cercle(330, 80, 25, VERT, 0.7) # Changé en VERT
-cercle3.vx = -70
-cercle3.vy = 10
-cercle3.ay = 98
-cercle3.masse = 1
-objets.append(cercle3)
-
-# carre1 = Carre(400, 100, 40, NOIR, 0.7)
-# carre1.vx = -30
-# carre1.ay = 98
-# objets.append(carre1)
 
 # Boucle principale du jeu
-en_cours = True
-clock = pygame.time.Clock()
-FPS = 60 # Frames par seconde
-
-while en_cours:
-    dt = 1 / FPS # Delta de temps en secondes
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            en_cours = False
-
-    # Effacer l'écran
-    ecran.fill(BLANC)
-
-    # Dessiner le sol
-    sol.dessiner(ecran)
-
-    # Mettre à jour et dessiner les objets
-    for objet in objets:
-        # Appliquer la gravité si ce n'est pas déjà une accélération constante
-        # Si vous voulez que ay soit toujours la gravité, vous pouvez le définir ici.
-        # Pour l'instant, on suppose que ay est correctement géré (par ex. initialisé à la gravité)
-        # objet.ay = 98 # Si vous voulez une gravité constante appliquée ici
-        
-        objet.deplacer(dt)
-        objet.dessiner(ecran)
-        objet.dessiner_vecteurs(ecran) # <<< DESSIN DES VECTEURS ICI
-
-        # Gestion des collisions avec les bords
-        if isinstance(objet, Cercle):
-            if objet.x + objet.rayon > largeur:
-                objet.x = largeur - objet.rayon
-                objet.vx *= -objet.coefficient_restitution
-            elif objet.x - objet.rayon < 0:
-                objet.x = objet.rayon
-                objet.vx *= -objet.coefficient_restitution
-            
-            if objet.y + objet.rayon > sol.y:
-                objet.y = sol.y - objet.rayon
-                objet.vy *= -sol.coefficient_restitution
-                # Optionnel: friction au sol
-                # objet.vx *= 0.98 
-            elif objet.y - objet.rayon < 0 : # Plafond
-                objet.y = objet.rayon
-                objet.vy *= -objet.coefficient_restitution
-
-        elif isinstance(objet, (Carre, Rectangle)): # Traitement unifié pour Carre et Rectangle
-            obj_largeur = objet.taille if isinstance(objet, Carre) else objet.largeur
-            obj_hauteur = objet.taille if isinstance(objet, Carre) else objet.hauteur
-
-            if objet.x + obj_largeur > largeur:
-                objet.x = largeur - obj_largeur
-                objet.vx *= -objet.coefficient_restitution
-            elif objet.x < 0:
-                objet.x = 0
-                objet.vx *= -objet.coefficient_restitution
-
-            if objet.y + obj_hauteur > sol.y:
-                objet.y = sol.y - obj_hauteur
-                objet.vy *= -sol.coefficient_restitution
-                # objet.vx *= 0.98
-            elif objet.y < 0: # Plafond
-                objet.y = 0
-                objet.vy *= -objet.coefficient_restitution
-        
-        # La ligne "objet.ay = objet.ay" a été retirée car elle n'avait pas d'effet.
-        # Si la gravité doit être toujours appliquée, initialisez ay et ne le modifiez pas,
-        # ou réaffectez-le à chaque image avant deplacer().
-
-    # Vérifier les collisions entre les objets
-    for i in range(len(objets)):
-        for j in range(i + 1, len(objets)):
-            if objets[i].collision(objets[j]):
-                objets[i].gestion_collision(objets[j])
-                # Note: gestion_collision peut aussi appeler la gestion de l'autre objet si nécessaire,
-                # ou être symétrique. Pour l'instant, seul le premier objet gère.
-
-    # Mettre à jour l'affichage
-    pygame.display.flip()
-
-    # Contrôler la vitesse de la boucle
-    clock.tick(FPS)
-
-# Quitter Pygame
-pygame.quit()
-sys.exit()
+# threaded=True (option --threaded) : la physique tourne dans son propre thread à 1/DT_FIXE pas par
+# seconde, et l'affichage dessine l'état interpolé entre les deux derniers instantanés publiés
+# scene : fichier de scène (scenes.py) à charger à la place de la scène de démonstration
+def main(threaded=False, profil=None, scene=None):
+    # Initialisation de Pygame
+    pygame.init()
+    ecran = pygame.display.set_mode((largeur, hauteur))
+    pygame.display.set_caption("Simulateur Physique avec Vecteurs")
+
+    if scene is not None:
+        import scenes # Importé ici : scenes importe lui-même ce module
+        monde = scenes.load(scene, "simulation")
+    else:
+        monde = creer_monde()
+    en_cours = True
+    clock = pygame.time.Clock()
+
+    # Temps par phase et nombre de tests de paires / collisions par frame : F3 affiche le
+    # résumé, profil (option --profile) enregistre chaque frame dans un fichier JSON ou CSV
+    profiler = Profiler(record=profil is not None)
+
+    physique = None
+    if threaded:
+        # Le thread physique n'est pas mesuré (seules les phases d'affichage le sont)
+        physique = PhysicsThread(lambda: monde.step(monde.dt_fixe), monde.etat, 1 / monde.dt_fixe)
+        physique.start()
+    else:
+        monde.profiler = profiler
+
+    while en_cours:
+        # Temps réel écoulé depuis la dernière frame, en secondes
+        with profiler.phase("wait"):
+            temps_ecoule = clock.tick(FPS) / 1000
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                en_cours = False
+            profiler.handle_event(event)
+
+        # Effacer l'écran, puis dessiner le sol, les objets et leurs vecteurs
+        ecran.fill(BLANC)
+        if physique is not None:
+            monde.dessiner(ecran, physique.interpolated(), profiler)
+        else:
+            # La physique avance par pas fixes de DT_FIXE, indépendamment du rythme d'affichage
+            monde.avancer(temps_ecoule)
+            monde.dessiner(ecran, profiler=profiler)
+        profiler.draw_overlay(ecran)
+
+        # Mettre à jour l'affichage
+        with profiler.phase("flip"):
+            pygame.display.flip()
+        profiler.end_frame()
+
+    if physique is not None:
+        physique.stop()
+    if profil is not None:
+        profiler.dump(profil)
+    # Quitter Pygame
+    pygame.quit()
+    sys.exit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulateur physique 2D")
+    parser.add_argument("--threaded", action="store_true", help="physique dans un thread séparé")
+    parser.add_argument("--profile", metavar="PATH", help="enregistre le temps de chaque phase, par frame (JSON ou CSV)")
+    parser.add_argument("--scene", metavar="PATH", help="scène à charger (JSON ou TOML, voir scenes.py)")
+    args = parser.parse_args()
+    main(args.threaded, args.profile, args.scene)
@@ -1,16 +1,21 @@
+import argparse
 import pygame
 import sys
+import math
+import numpy as np
+
+import kernels
+from physics_thread import PhysicsThread
+from profiling import NULL_PROFILER, Profiler
+from sommeil import Sommeil
 
-pygame.init()
 WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Moteur Physique Isométrique avec plusieurs balles")
-clock = pygame.time.Clock()
 
 TILE_WIDTH = 64
 TILE_HEIGHT = 32
 GRAVITY = 98.1
 FLOOR_Z = 0
+PHYSICS_RATE = 120 # Pas de physique par seconde quand la physique tourne dans son propre thread
 
 WHITE = (255, 255, 255)
 GREY = (180, 180, 180)
@@ -19,13 +24,18 @@ AXIS_Y_COLOR = (0, 255, 0)
 AXIS_Z_COLOR = (0, 0, 255)
 GRID_COLOR = (150, 150, 150, 70)  # gris transparent
 
+# x et y sont en cases de la grille, z et les rayons en pixels : pour les collisions entre
+# balles, x et y sont convertis en pixels (longueur à l'écran d'une case le long d'un axe)
+TILE_SIZE_PX = math.hypot(TILE_WIDTH / 2, TILE_HEIGHT / 2)
+METRIC = np.array([TILE_SIZE_PX, TILE_SIZE_PX, 1.0])
+
 def iso_project(x, y, z):
     screen_x = WIDTH // 2 + (x - y) * TILE_WIDTH // 2
     screen_y = HEIGHT // 2 + (x + y) * TILE_HEIGHT // 2 - z
     return int(screen_x), int(screen_y)
 
 class Ball:
-    def __init__(self, x, y, z, color, radius=10, vx=0, vy=0, vz=0, ax=0, ay=0, az=0):
+    def __init__(self, x, y, z, color, radius=10, vx=0, vy=0, vz=0, ax=0, ay=0, az=0, restitution=0.8):
         self.x = x
         self.y = y
         self.z = z
@@ -37,6 +47,8 @@ class Ball:
         self.az = az
         self.radius = radius
         self.color = color
+        self.restitution = restitution
+        self.mass = radius ** 3 # Masse proportionnelle au volume
 
     def apply_gravity(self, dt):
         self.az -= GRAVITY * dt
@@ -55,7 +67,7 @@ class Ball:
         # Collision avec le sol
         if self.z <= FLOOR_Z:
             self.z = FLOOR_Z
-            self.vz *= -0.8
+            self.vz *= -self.restitution
             self.vx *= 0.9
             self.vy *= 0.9
             if abs(self.vz) < 1:
@@ -64,11 +76,24 @@ class Ball:
 
 
 
-    def draw(self, surface):
-        px, py = iso_project(self.x, self.y, self.z)
-        shadow_x, shadow_y = iso_project(self.x, self.y, 0)
-        pygame.draw.circle(surface, GREY, (shadow_x, shadow_y), self.radius)  # ombre
-        pygame.draw.circle(surface, self.color, (px, py), self.radius)
+    def draw(self, surface, position=None):
+        # Renvoie les rectangles modifiés (ombre et balle), pour la mise à jour partielle de l'écran.
+        # position : (x, y, z) à dessiner à la place de l'état courant (affichage interpolé)
+        x, y, z = (self.x, self.y, self.z) if position is None else position
+        px, py = iso_project(x, y, z)
+        shadow_x, shadow_y = iso_project(x, y, 0)
+        shadow = pygame.draw.circle(surface, GREY, (shadow_x, shadow_y), self.radius)  # ombre
+        body = pygame.draw.circle(surface, self.color, (px, py), self.radius)
+        return shadow, body
+
+_axis_font = None
+
+def axis_font():
+    # Police des axes créée une seule fois (SysFont est coûteux)
+    global _axis_font
+    if _axis_font is None:
+        _axis_font = pygame.font.SysFont(None, 20)
+    return _axis_font
 
 def draw_axes(surface):
     origin = iso_project(0, 0, 0)
@@ -80,13 +105,13 @@ def draw_axes(surface):
     pygame.draw.line(surface, AXIS_Y_COLOR, origin, y_axis, 3)
     pygame.draw.line(surface, AXIS_Z_COLOR, origin, z_axis, 3)
 
-    font = pygame.font.SysFont(None, 20)
+    font = axis_font()
     surface.blit(font.render("X", True, AXIS_X_COLOR), x_axis)
     surface.blit(font.render("Y", True, AXIS_Y_COLOR), y_axis)
     surface.blit(font.render("Z", True, AXIS_Z_COLOR), (z_axis[0]+5, z_axis[1]))
 
 def draw_grid(surface, size=10):
-    grid_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+    grid_surface = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
 
     for i in range(size + 1):
         start = iso_project(0, i, 0)
@@ -99,30 +124,305 @@ def draw_grid(surface, size=10):
 
     surface.blit(grid_surface, (0, 0))
 
+# Fond statique (blanc, grille et axes) dessiné une seule fois dans une surface, puis réutilisé.
+# Il n'est reconstruit que si la taille de la fenêtre ou les paramètres de la vue changent.
+class RenderLayers:
+    def __init__(self, grid_size=15):
+        self.grid_size = grid_size
+        self.key = None
+        self.background = None
+
+    def view_key(self, surface):
+        return surface.get_size(), WIDTH, HEIGHT, TILE_WIDTH, TILE_HEIGHT, self.grid_size
+
+    def get(self, surface):
+        # Renvoie (fond, reconstruit)
+        key = self.view_key(surface)
+        if key == self.key:
+            return self.background, False
+        self.background = pygame.Surface(surface.get_size()).convert()
+        self.background.fill(WHITE)
+        draw_grid(self.background, size=self.grid_size)
+        draw_axes(self.background)
+        self.key = key
+        return self.background, True
+
+# Dessin par rectangles sales : on restaure le fond sous les rectangles de la frame précédente,
+# on redessine les balles et on ne transmet à l'écran que ces zones
+class DirtyRenderer:
+    def __init__(self, layers=None):
+        self.layers = layers if layers is not None else RenderLayers()
+        self.previous = []
+
+    def draw(self, surface, balls, positions=None):
+        # positions : tableau (n, 3) des positions à dessiner (instantané interpolé), sinon l'état des balles
+        background, rebuilt = self.layers.get(surface)
+        if rebuilt:
+            surface.blit(background, (0, 0))
+        else:
+            for rect in self.previous:
+                surface.blit(background, rect, rect)
+
+        drawn = []
+        if positions is None:
+            for ball in balls:
+                drawn.extend(ball.draw(surface))
+        else:
+            for ball, position in zip(balls, positions.tolist()):
+                drawn.extend(ball.draw(surface, position))
+
+        dirty = [surface.get_rect()] if rebuilt else self.previous + drawn
+        self.previous = drawn
+        return dirty
+
 # Création de plusieurs balles avec couleurs, vitesses, accélérations différentes
-balls = [
-    Ball(x=0, y=0, z=100, color=(255, 0, 0), vz=0, radius=12),
-    Ball(x=0, y=0, z=100, color=(0, 255, 0), vx=-0.5, vy=0.5, vz=0, radius=15),
-    Ball(x=0, y=0, z=100, color=(0, 0, 255), vx=0.5, vy=0.5, vz=0, az=0, radius=10),
-]
+def create_balls():
+    return [
+        Ball(x=0, y=0, z=100, color=(255, 0, 0), vz=0, radius=12),
+        Ball(x=0, y=0, z=100, color=(0, 255, 0), vx=-0.5, vy=0.5, vz=0, radius=15),
+        Ball(x=0, y=0, z=100, color=(0, 0, 255), vx=0.5, vy=0.5, vz=0, az=0, radius=10),
+    ]
+
+# Création en bloc : une balle par ligne des tableaux (positions et vitesses (n, 3), rayons (n,)) ;
+# colors et restitution : une valeur commune ou une par balle
+def balls_from_arrays(positions, radii, colors, velocities=None, restitution=0.8):
+    n = len(radii)
+    velocities = np.zeros((n, 3)) if velocities is None else velocities
+    colors = [tuple(colors)] * n if np.ndim(colors) == 1 else [tuple(c) for c in colors]
+    restitution = np.broadcast_to(restitution, (n,))
+    return [Ball(x, y, z, color, radius=r, vx=vx, vy=vy, vz=vz, restitution=e)
+            for (x, y, z), (vx, vy, vz), r, color, e in zip(np.asarray(positions, dtype=float).tolist(),
+                                                             np.asarray(velocities, dtype=float).tolist(),
+                                                             np.asarray(radii, dtype=float).tolist(), colors,
+                                                             restitution.tolist())]
+
+# Broad phase "sweep and prune" : tri des balles le long de l'axe le plus étalé, puis seules
+# les balles dont les intervalles se chevauchent sur cet axe sont testées (vectorisé)
+def sweep_and_prune(positions, radii):
+    # positions : (n, 3) en pixels, radii : (n,) ; renvoie deux tableaux i, j (i < j) des paires
+    # dont les cubes englobants se chevauchent
+    n = len(positions)
+    if n < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    axis = int(np.argmax(positions.var(axis=0)))
+    low = positions[:, axis] - radii
+    high = positions[:, axis] + radii
+    order = np.argsort(low, kind="stable")
+    low_sorted = low[order]
+
+    # Pour la k-ième balle triée, les candidates sont les suivantes qui commencent avant sa fin
+    end = np.searchsorted(low_sorted, high[order], side="left")
+    counts = np.maximum(end - np.arange(n) - 1, 0)
+    first = np.repeat(np.arange(n), counts)
+    second = first + 1 + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    i, j = order[first], order[second]
 
-while True:
-    dt = clock.tick(60) / 1000.0
+    # Chevauchement sur les trois axes
+    reach = radii[i] + radii[j]
+    keep = (np.abs(positions[i] - positions[j]) < reach[:, None]).all(axis=1)
+    i, j = i[keep], j[keep]
+    return np.minimum(i, j), np.maximum(i, j)
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
+# Balles endormies pouvant toucher une balle éveillée : celles dont le cube englobant coupe la
+# boîte englobant toutes les balles éveillées. Leurs positions (pixels) et rayons sont gardés dans
+# sleep.cache tant qu'aucune balle ne s'endort ni ne se réveille. Renvoie les indices à traiter.
+def balls_near_awake(balls, sleep):
+    awake = sleep.actifs()
+    if len(awake) == 0:
+        return awake
+    sleeping = sleep.cache.get("balls")
+    if sleeping is None:
+        index = np.nonzero(sleep.endormi)[0]
+        bounds = np.array([(balls[k].x, balls[k].y, balls[k].z, balls[k].radius) for k in index.tolist()],
+                          dtype=float).reshape(-1, 4)
+        sleeping = sleep.cache["balls"] = (index, bounds[:, :3] * METRIC, bounds[:, 3])
+    index, positions, radii = sleeping
+    state = np.array([(balls[k].x, balls[k].y, balls[k].z, balls[k].radius) for k in awake.tolist()], dtype=float)
+    awake_positions = state[:, :3] * METRIC
+    low = (awake_positions - state[:, 3:]).min(axis=0)
+    high = (awake_positions + state[:, 3:]).max(axis=0)
+    near = ((positions + radii[:, None] > low) & (positions - radii[:, None] < high)).all(axis=1)
+    return np.sort(np.concatenate((awake, index[near])))
 
-    for ball in balls:
+# Collisions balle-balle : réponse par impulsion le long de la normale (coefficient de
+# restitution = minimum des deux balles) et séparation des balles qui s'interpénètrent.
+# Les impulsions de toutes les paires en contact sont calculées ensemble.
+# sleep (sommeil.Sommeil) : les balles endormies loin des balles éveillées sont écartées avant la
+# broad phase, les paires de deux balles endormies ne sont pas testées, les contacts sont notés
+# pour former les îlots et réveillent les balles endormies touchées.
+# profiler (profiling.Profiler) : compte les paires testées et les paires en contact
+def collide_balls(balls, sleep=None, profiler=NULL_PROFILER):
+    n = len(balls)
+    if n < 2 or (sleep is not None and sleep.endormi.all()):
+        return 0
+    if sleep is not None and sleep.endormi.any():
+        index = balls_near_awake(balls, sleep)
+    else:
+        index = np.arange(n)
+    state = np.array([(b.x, b.y, b.z, b.vx, b.vy, b.vz, b.radius, b.mass, b.restitution)
+                      for b in (balls[k] for k in index.tolist())], dtype=float).reshape(-1, 9)
+    positions = state[:, 0:3] * METRIC
+    velocities = state[:, 3:6] * METRIC
+    radii, masses, restitution = state[:, 6], state[:, 7], state[:, 8]
+
+    # i, j : indices dans index (balles traitées à ce pas)
+    i, j = sweep_and_prune(positions, radii)
+    if sleep is not None:
+        garde = ~(sleep.endormi[index[i]] & sleep.endormi[index[j]])
+        i, j = i[garde], j[garde]
+    profiler.count("pair_tests", len(i))
+    delta = positions[j] - positions[i]
+    distance = np.linalg.norm(delta, axis=1)
+    touching = distance < radii[i] + radii[j]
+    i, j, delta, distance = i[touching], j[touching], delta[touching], distance[touching]
+    if sleep is not None:
+        sleep.noter_contacts(index[i], index[j])
+    profiler.count("collisions", len(i))
+    if len(i) == 0:
+        return 0
+
+    # Normale de i vers j (verticale si les centres sont confondus)
+    normal = np.tile([0.0, 0.0, 1.0], (len(i), 1))
+    apart = distance > 0
+    normal[apart] = delta[apart] / distance[apart, None]
+
+    inv_i, inv_j = 1 / masses[i], 1 / masses[j]
+    approach = ((velocities[j] - velocities[i]) * normal).sum(axis=1)
+    e = np.minimum(restitution[i], restitution[j])
+    impulse = np.where(approach < 0, -(1 + e) * approach / (inv_i + inv_j), 0.0)
+    np.add.at(velocities, i, -(impulse * inv_i)[:, None] * normal)
+    np.add.at(velocities, j, (impulse * inv_j)[:, None] * normal)
+
+    # Séparation proportionnelle à l'inverse des masses
+    overlap = (radii[i] + radii[j] - distance) / (inv_i + inv_j)
+    np.add.at(positions, i, -(overlap * inv_i)[:, None] * normal)
+    np.add.at(positions, j, (overlap * inv_j)[:, None] * normal)
+
+    positions /= METRIC
+    velocities /= METRIC
+    for k in np.unique(np.concatenate((i, j))).tolist():
+        ball = balls[index[k]]
+        ball.x, ball.y, ball.z = positions[k].tolist()
+        ball.vx, ball.vy, ball.vz = velocities[k].tolist()
+    return len(i)
+
+def integrate_balls(balls, dt, sleep=None):
+    # Les balles endormies ne sont pas intégrées
+    active = [balls[k] for k in (range(len(balls)) if sleep is None else sleep.actifs().tolist())]
+    if kernels.ENABLED:
+        # Noyau compilé (Numba) sur un tableau d'état, recopié ensuite dans les balles
+        state = np.array([[getattr(ball, name) for name in kernels.BALL_FIELDS] for ball in active],
+                         dtype=float).reshape(-1, len(kernels.BALL_FIELDS))
+        kernels.update_balls(state, dt, GRAVITY, FLOOR_Z)
+        for ball, row in zip(active, state.tolist()):
+            ball.x, ball.y, ball.z, ball.vx, ball.vy, ball.vz, ball.ax, ball.ay, ball.az, _ = row
+        return
+    for ball in active:
         ball.apply_gravity(dt)
         ball.update(dt)
 
-    screen.fill(WHITE)
-    draw_grid(screen, size=15)
-    draw_axes(screen)
+# Mise en sommeil des îlots de balles au repos (vitesses comparées en pixels/s) ; seules les balles
+# éveillées sont relues (les balles endormies ont une vitesse nulle et ne comptent pas dans les îlots)
+def update_sleep(balls, sleep, dt):
+    if sleep.endormi.all():
+        return
+    awake = sleep.actifs()
+    state = np.array([(balls[k].vx, balls[k].vy, balls[k].vz, balls[k].mass) for k in awake.tolist()], dtype=float)
+    velocities = np.zeros((len(balls), 3))
+    masses = np.zeros(len(balls))
+    velocities[awake] = state[:, :3] * METRIC
+    masses[awake] = state[:, 3]
+    for k in np.nonzero(sleep.mettre_a_jour(velocities, masses, dt))[0].tolist():
+        ball = balls[k]
+        ball.vx = ball.vy = ball.vz = 0
+        ball.az = 0
+
+# Un pas de physique pour toutes les balles (sans affichage) ; sleep : sommeil.Sommeil, optionnel ;
+# profiler : profiling.Profiler mesurant chaque phase du pas
+def step(balls, dt, sleep=None, profiler=NULL_PROFILER):
+    if sleep is not None:
+        sleep.redimensionner(len(balls))
+        sleep.reveiller_si_vitesse(np.array([(b.vx, b.vy, b.vz) for b in balls], dtype=float).reshape(-1, 3))
+    with profiler.phase("integration"):
+        integrate_balls(balls, dt, sleep)
+    with profiler.phase("contacts"):
+        collide_balls(balls, sleep, profiler)
+    if sleep is not None:
+        with profiler.phase("sleep"):
+            update_sleep(balls, sleep, dt)
+
+# État (x, y, z, vx, vy, vz) de chaque balle, copié dans un tableau (n, 6)
+def ball_state(balls):
+    return np.array([(b.x, b.y, b.z, b.vx, b.vy, b.vz) for b in balls], dtype=float).reshape(-1, 6)
+
+# threaded=True (option --threaded) : la physique avance par pas fixes de 1/PHYSICS_RATE dans son
+# propre thread, l'affichage dessine les positions interpolées entre les deux derniers instantanés.
+# F3 affiche le temps passé dans chaque phase ; profile (option --profile) enregistre chaque frame
+# dans un fichier JSON ou CSV ; scene : fichier de scène (scenes.py) à charger à la place de create_balls() ;
+# sleep (option --sleep) : mise en sommeil des îlots de balles au repos (sommeil.Sommeil).
+def main(threaded=False, profile=None, scene=None, sleep=False):
+    global WIDTH, HEIGHT
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+    pygame.display.set_caption("Moteur Physique Isométrique avec plusieurs balles")
+    clock = pygame.time.Clock()
+
+    if scene is not None:
+        import scenes # Importé ici : scenes importe lui-même ce module
+        balls = scenes.load(scene, "3d")
+    else:
+        balls = create_balls()
+    renderer = DirtyRenderer()
+    profiler = Profiler(record=profile is not None)
+    sleep = Sommeil() if sleep else None
+
+    physics = None
+    if threaded:
+        # Le thread physique n'est pas mesuré (seules les phases d'affichage le sont)
+        physics = PhysicsThread(lambda: step(balls, 1 / PHYSICS_RATE, sleep), lambda: ball_state(balls)[:, :3], PHYSICS_RATE)
+        physics.start()
+
+    while True:
+        with profiler.phase("wait"):
+            dt = clock.tick(60) / 1000.0
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                if physics is not None:
+                    physics.stop()
+                if profile is not None:
+                    profiler.dump(profile)
+                pygame.quit()
+                sys.exit()
+            elif event.type == pygame.VIDEORESIZE:
+                # La projection est centrée sur la fenêtre : le fond sera reconstruit
+                WIDTH, HEIGHT = event.w, event.h
+                screen = pygame.display.get_surface()
+            profiler.handle_event(event)
+
+        if physics is not None:
+            positions = physics.interpolated()
+        else:
+            step(balls, dt, sleep, profiler)
+            positions = None
 
-    for ball in balls:
-        ball.draw(screen)
+        # Seules les zones autour des balles et de leurs ombres sont redessinées
+        with profiler.phase("draw"):
+            dirty = renderer.draw(screen, balls, positions)
+        overlay = profiler.draw_overlay(screen)
+        if overlay is not None:
+            # Zone du résumé : transmise à l'écran, et restaurée à la frame suivante
+            dirty.append(overlay)
+            renderer.previous.append(overlay)
+        with profiler.phase("display"):
+            pygame.display.update(dirty)
+        profiler.end_frame()
 
-    pygame.display.flip()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Balles en projection isométrique")
+    parser.add_argument("--threaded", action="store_true", help="physique dans un thread séparé")
+    parser.add_argument("--profile", metavar="PATH", help="enregistre le temps de chaque phase, par frame (JSON ou CSV)")
+    parser.add_argument("--scene", metavar="PATH", help="scène à charger (JSON ou TOML, voir scenes.py)")
+    parser.add_argument("--sleep", action="store_true", help="endort les îlots de balles au repos")
+    args = parser.parse_args()
+    main(args.threaded, args.profile, args.scene, args.sleep)
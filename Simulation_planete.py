@@ -1,19 +1,17 @@
+import argparse
 import pygame
 import math
+import os
+import threading
+import numpy as np
+
+from gravity import DirectSolver
+from integrators import make_integrator
+from physics_thread import PhysicsThread
+from profiling import Profiler
 
 # --- Constants ---
 WIDTH, HEIGHT = 800, 800
-# Attempt to set a video mode. This might still fail in a headless environment,
-# but it's necessary for Pygame drawing functions.
-try:
-    WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-    pygame.display.set_caption("Simulation des Lois de Kepler")
-except pygame.error as e:
-    print(f"Erreur lors de l'initialisation de Pygame : {e}")
-    print("Assurez-vous d'avoir un environnement d'affichage valide (par exemple, en utilisant Xvfb).")
-    # Exit gracefully if display initialization fails
-    pygame.quit()
-    exit()
 
 
 # --- Colors ---
@@ -34,6 +32,69 @@ TIMESTEP = 3600 * 6  # 6 hours in seconds (reduced timestep for potentially smoo
 # Smaller factor means less variation in size
 SIZE_SCALE_FACTOR = 0.5
 BASE_PLANET_RADIUS = 5 # Base radius for visual scaling
+ORBIT_LENGTH = 750 # Number of points kept in each orbit trail
+PHYSICS_RATE = 60 # Physics steps per second of wall-clock time when the physics runs on its own thread
+
+
+def current_view():
+    # Everything the world -> screen projection depends on
+    return SCALE, WIDTH, HEIGHT
+
+
+def project(points, view):
+    # Bulk world -> screen projection of an (n, 2) array of positions
+    scale, width, height = view
+    return (points * scale + (width / 2, height / 2)).astype(np.int32)
+
+
+# --- Orbit Trail ---
+# Fixed-capacity ring buffer of the last positions of a body. Every point is written twice,
+# at i and i + capacity, so that the trail is always one contiguous slice (no copy, no pop(0)).
+# Screen coordinates are stored alongside and only reprojected in bulk when the view changes.
+class OrbitTrail:
+    def __init__(self, capacity=ORBIT_LENGTH):
+        self.capacity = capacity
+        self.world = np.zeros((2 * capacity, 2))
+        self.screen = np.zeros((2 * capacity, 2), dtype=np.int32)
+        self.head = 0 # Next write index, in [0, capacity)
+        self.count = 0
+        self.view = None # View the screen coordinates were computed with
+
+    def __len__(self):
+        return self.count
+
+    def append(self, point):
+        i = self.head
+        self.world[i] = self.world[i + self.capacity] = point
+        if self.view is not None:
+            self.screen[i] = self.screen[i + self.capacity] = project(self.world[i], self.view)
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def points(self):
+        # World positions, oldest first
+        end = self.head + self.capacity
+        return self.world[end - self.count:end]
+
+    def screen_points(self, view):
+        # Screen positions, oldest first, reprojected only if the view changed
+        if view != self.view:
+            self.screen[:] = project(self.world, view)
+            self.view = view
+        end = self.head + self.capacity
+        return self.screen[end - self.count:end]
+
+    def clear(self):
+        self.head = self.count = 0
+
+    def set_points(self, points):
+        # Replaces the trail by the given world positions, oldest first (bulk, e.g. from an ephemeris)
+        points = points[-self.capacity:]
+        count = len(points)
+        self.world[:count] = self.world[self.capacity:self.capacity + count] = points
+        self.head = count % self.capacity
+        self.count = count
+        self.view = None # Screen coordinates are recomputed on the next draw
 
 
 # --- Planet Class ---
@@ -45,7 +106,7 @@ class Planet:
         self.color = color
         self.mass = mass
 
-        self.orbit = []
+        self.orbit = OrbitTrail()
         self.sun = False
         self.distance_to_sun = 0
 
@@ -58,19 +119,9 @@ class Planet:
         x = int(self.x * SCALE + WIDTH / 2)
         y = int(self.y * SCALE + HEIGHT / 2)
 
-        # Draw orbit path
+        # Draw orbit path (already projected points, no per-point work in Python)
         if len(self.orbit) > 2:
-            updated_points = []
-            for point in self.orbit:
-                ox, oy = point
-                # Scale orbit points and convert to integers
-                # Access global constants explicitly
-                ox = int(ox * SCALE + WIDTH / 2)
-                oy = int(oy * SCALE + HEIGHT / 2)
-                updated_points.append((ox, oy))
-            # Ensure there are enough points to draw a line
-            if len(updated_points) > 1:
-                 pygame.draw.lines(win, self.color, False, updated_points, 1)
+            pygame.draw.lines(win, self.color, False, self.orbit.screen_points(current_view()).tolist(), 1)
 
         # Calculate visual radius based on distance to the sun
         if self.sun:
@@ -132,17 +183,120 @@ class Planet:
         self.x += self.x_vel * TIMESTEP
         self.y += self.y_vel * TIMESTEP
 
-        # Store position for orbit drawing
+        # Store position for orbit drawing (the trail keeps the last ORBIT_LENGTH points)
         self.orbit.append((self.x, self.y))
-        # Limit orbit path length to keep it manageable
-        if len(self.orbit) > 750: # Increased orbit path length slightly
-            self.orbit.pop(0)
+
+
+# --- Vectorized System Solver ---
+# Holds the state of all planets in NumPy arrays and advances them together:
+# all pairwise accelerations are computed in one batched (tiled) pass instead of
+# calling Planet.attraction for every pair.
+class PlanetSystem:
+    def __init__(self, planets, timestep=TIMESTEP, solver=None, integrator="euler"):
+        self.planets = planets
+        self.timestep = timestep
+        # Gravity solver: DirectSolver (exact, O(n^2)) or gravity.BarnesHutSolver(theta) for large systems
+        self.solver = solver if solver is not None else DirectSolver()
+        # Time integrator: "euler" (original scheme), "verlet", "yoshida4", "rk4",
+        # or "block" for per-body adaptive block timesteps
+        self.integrator = make_integrator(integrator)
+        self.time = 0.0
+
+        self.positions = np.array([(p.x, p.y) for p in planets], dtype=float).reshape(-1, 2)
+        self.velocities = np.array([(p.x_vel, p.y_vel) for p in planets], dtype=float).reshape(-1, 2)
+        self.masses = np.array([p.mass for p in planets], dtype=float)
+        # The sun stays fixed at the origin, as in the original main loop
+        self.fixed = np.array([p.sun for p in planets], dtype=bool)
+        self._find_sun()
+
+    @classmethod
+    def from_arrays(cls, positions, velocities, masses, fixed=None, **kwargs):
+        # Builds a system directly from state arrays, without any Planet object (large systems)
+        system = cls([], **kwargs)
+        system.positions = np.array(positions, dtype=float).reshape(-1, 2)
+        system.velocities = np.array(velocities, dtype=float).reshape(-1, 2)
+        system.masses = np.array(masses, dtype=float)
+        system.fixed = np.zeros(len(system.masses), dtype=bool) if fixed is None else np.array(fixed, dtype=bool)
+        system._find_sun()
+        return system
+
+    def add_bodies(self, positions, velocities, masses, fixed=None):
+        # Appends bodies in bulk (array rows only, no Planet objects: they are drawn as points)
+        self.positions = np.vstack((self.positions, np.asarray(positions, dtype=float).reshape(-1, 2)))
+        self.velocities = np.vstack((self.velocities, np.asarray(velocities, dtype=float).reshape(-1, 2)))
+        self.masses = np.concatenate((self.masses, np.asarray(masses, dtype=float).reshape(-1)))
+        fixed = np.zeros(len(self.masses) - len(self.fixed), dtype=bool) if fixed is None else np.asarray(fixed, dtype=bool)
+        self.fixed = np.concatenate((self.fixed, fixed))
+        self._find_sun()
+        self.integrator.reset() # Cached accelerations / block levels no longer match the bodies
+
+    def _find_sun(self):
+        suns = np.nonzero(self.fixed)[0]
+        self.sun_index = int(suns[0]) if len(suns) else None
+
+    def accelerations(self, positions=None, targets=None):
+        # Accelerations of all bodies, or only of the `targets` indices (used by block timesteps)
+        acc = self.solver(self.positions if positions is None else positions, self.masses, G, targets)
+        acc[self.fixed if targets is None else self.fixed[targets]] = 0
+        return acc
+
+    def step(self):
+        # With "euler" this is the semi-implicit scheme of Planet.update_position, for every body at once
+        self.integrator.step(self.positions, self.velocities, self.accelerations, self.timestep)
+        self.time += self.timestep
+
+    def energy(self):
+        # Total mechanical energy (kinetic + pairwise gravitational potential)
+        kinetic = 0.5 * (self.masses * (self.velocities ** 2).sum(axis=1)).sum()
+        potential = 0.0
+        for i in range(len(self.masses) - 1):
+            distance = np.linalg.norm(self.positions[i + 1:] - self.positions[i], axis=1)
+            potential -= G * self.masses[i] * (self.masses[i + 1:] / distance).sum()
+        return kinetic + potential
+
+    def distances_to_sun(self, positions=None):
+        positions = self.positions if positions is None else positions
+        if self.sun_index is None:
+            return np.zeros(len(positions))
+        return np.linalg.norm(positions - positions[self.sun_index], axis=1)
+
+    def state(self):
+        # Copy of the (x, y, x_vel, y_vel) rows of every body: the snapshot published by the physics thread
+        return np.hstack((self.positions, self.velocities))
+
+    def sync_planets(self, state=None, trails=True):
+        # Copy the array state (or a snapshot returned by state(), possibly interpolated) back into
+        # the Planet objects used for drawing; trails=False leaves the orbit trails untouched
+        positions, velocities = (self.positions, self.velocities) if state is None else (state[:, :2], state[:, 2:])
+        distances = self.distances_to_sun(positions)
+        for i, planet in enumerate(self.planets):
+            planet.x, planet.y = positions[i]
+            planet.x_vel, planet.y_vel = velocities[i]
+            if planet.sun:
+                continue
+            planet.distance_to_sun = distances[i]
+            if trails:
+                planet.orbit.append(positions[i])
+
+
+def draw_points(win, positions, color):
+    # One pixel per body, written in bulk into the surface
+    points = project(positions, current_view())
+    x, y = points[:, 0], points[:, 1]
+    visible = (x >= 0) & (x < win.get_width()) & (y >= 0) & (y < win.get_height())
+    pixels = pygame.surfarray.pixels3d(win)
+    pixels[x[visible], y[visible]] = color
+    del pixels # Unlocks the surface
 
 
 # --- Main Simulation Loop ---
-def main():
-    run = True
-    clock = pygame.time.Clock()
+# Velocity multipliers applied in create_solar_system to make the orbits elliptical
+ECCENTRICITY_MULTIPLIERS = {"mercury": 1.1, "venus": 0.95, "earth": 1.05, "mars": 0.9}
+
+
+def create_solar_system(multipliers=None):
+    # multipliers: optional {planet name: velocity multiplier} overriding ECCENTRICITY_MULTIPLIERS
+    multipliers = {**ECCENTRICITY_MULTIPLIERS, **(multipliers or {})}
 
     sun = Planet(0, 0, 30, YELLOW, 1.989e31) # Mass of Sun
     sun.sun = True
@@ -175,18 +329,93 @@ def main():
 
     # Adjust initial velocities for a bit of eccentricity (more elliptical orbits)
     # This is a simplification; proper elliptical initial conditions are more complex
-    mercury.y_vel *= 1.1 # Slightly faster for a more elliptical orbit
-    venus.y_vel *= 0.95 # Slightly slower
-    earth.y_vel *= 1.05 # Slightly faster
-    mars.y_vel *= 0.9 # Slightly slower
+    mercury.y_vel *= multipliers["mercury"] # Slightly faster for a more elliptical orbit
+    venus.y_vel *= multipliers["venus"] # Slightly slower
+    earth.y_vel *= multipliers["earth"] # Slightly faster
+    mars.y_vel *= multipliers["mars"] # Slightly slower
+
+    return planets
+
+
+# threaded=True (--threaded): the physics steps on its own thread at PHYSICS_RATE steps per second
+# and every frame draws the state interpolated between the two last published snapshots.
+# F3 shows the time spent in each phase of the loop; profile (--profile PATH) records every frame
+# to a JSON or CSV file. scene (--scene PATH) loads a scene file (scenes.py) instead of the solar system.
+# checkpoint_path (--checkpoint PATH): the run resumes from this file if it exists, and is saved to
+# it every checkpoint_every seconds and on exit (checkpoint.py). ephemeris_path (--ephemeris PATH):
+# no physics, the bodies are evaluated from a precomputed ephemeris (ephemeris.py) at a view time
+# that can be scrubbed with the keyboard (see ephemeris.Scrubber). kepler_mode (--kepler): the
+# bodies follow their analytic Kepler orbits around the sun, "analytic" (two-body only) or "encke"
+# (with the attraction of the other bodies as a correction), see kepler.py.
+def main(threaded=False, profile=None, scene=None, checkpoint_path=None, checkpoint_every=5.0, ephemeris_path=None,
+         kepler_mode=None):
+    # Attempt to set a video mode. This might still fail in a headless environment,
+    # but it's necessary for Pygame drawing functions.
+    try:
+        WIN = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("Simulation des Lois de Kepler")
+    except pygame.error as e:
+        print(f"Erreur lors de l'initialisation de Pygame : {e}")
+        print("Assurez-vous d'avoir un environnement d'affichage valide (par exemple, en utilisant Xvfb).")
+        # Exit gracefully if display initialization fails
+        pygame.quit()
+        return
 
+    run = True
+    clock = pygame.time.Clock()
+    profiler = Profiler(record=profile is not None)
+
+    import checkpoint # Imported here: checkpoint and scenes import this module
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        system = checkpoint.load(checkpoint_path)
+        planets = system.planets
+    elif scene is not None:
+        import scenes
+        system = scenes.load(scene, "planete")
+        planets = system.planets
+    else:
+        planets = create_solar_system()
+        system = PlanetSystem(planets)
+    sun = next((p for p in planets if p.sun), None)
+    if kepler_mode is not None:
+        import kepler
+        system.integrator = kepler.KeplerPropagator.for_system(system, encke=kepler_mode == "encke")
+
+    scrubber = None
+    if ephemeris_path is not None:
+        import ephemeris
+        scrubber = ephemeris.Scrubber(ephemeris.Ephemeris.load(ephemeris_path), system.timestep)
+        if scrubber.ephemeris.n_bodies != len(system.masses):
+            raise ValueError(f"{ephemeris_path} has {scrubber.ephemeris.n_bodies} bodies, the system {len(system.masses)}")
+        threaded = False
+
+    # Threaded: the Planet objects and their trails are written by this (render) thread and read by
+    # the checkpoints saved on the physics thread, one at a time
+    planets_lock = threading.Lock() if threaded else None
+    autosave = (checkpoint.AutoCheckpoint(system, checkpoint_path, checkpoint_every, planets_lock)
+                if checkpoint_path is not None else None)
+
+    def step_and_save():
+        # Saved from the thread that steps the system: a checkpoint never sees half a step
+        system.step()
+        if autosave is not None:
+            autosave.maybe_save()
+
+    physics = None
+    if threaded:
+        physics = PhysicsThread(step_and_save, system.state, PHYSICS_RATE)
+        physics.start()
 
     while run:
-        clock.tick(60)  # Limit frame rate
+        with profiler.phase("wait"):
+            clock.tick(60)  # Limit frame rate
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
+            profiler.handle_event(event)
+            if scrubber is not None:
+                scrubber.handle_event(event)
 
         WIN.fill((0, 0, 0))  # Black background
 
@@ -194,18 +423,70 @@ def main():
         # Draw further planets first. This is a basic z-ordering for the top-down view.
         planets_to_draw = sorted([p for p in planets if not p.sun], key=lambda p: p.distance_to_sun, reverse=True)
 
-        # Draw sun first
-        sun.draw(WIN)
-
-        # Draw other planets based on distance
-        for planet in planets_to_draw:
-            planet.update_position(planets)
-            planet.draw(WIN)
-
-
-        pygame.display.update()
+        if scrubber is not None:
+            # Positions, velocities and trails evaluated at the view time: no integration at all
+            with profiler.phase("ephemeris"):
+                state = scrubber.advance()
+                system.sync_planets(state, trails=False)
+                trails = scrubber.trails(ORBIT_LENGTH)
+                for k, planet in enumerate(planets):
+                    planet.orbit.set_points(trails[:, k])
+            positions = state[:, :2]
+            pygame.display.set_caption(scrubber.caption())
+        elif physics is not None:
+            with profiler.phase("sync"):
+                state = physics.interpolated()
+                with planets_lock:
+                    system.sync_planets(state)
+            positions = state[:, :2]
+        else:
+            # Advance every body in one vectorized step
+            with profiler.phase("physics"):
+                system.step()
+            if isinstance(system.solver, DirectSolver):
+                # Body pairs whose attraction is evaluated (one force evaluation per step with "euler")
+                profiler.count("pair_interactions", len(system.masses) * (len(system.masses) - 1))
+            with profiler.phase("sync"):
+                system.sync_planets()
+            positions = system.positions
+            if autosave is not None:
+                with profiler.phase("checkpoint"):
+                    autosave.maybe_save()
 
+        # Draw sun first
+        with profiler.phase("draw"):
+            if sun is not None:
+                sun.draw(WIN)
+
+            # Draw other planets based on distance
+            for planet in planets_to_draw:
+                planet.draw(WIN)
+
+            # Bodies without a Planet object (asteroid belts...) are single pixels
+            if len(positions) > len(planets):
+                draw_points(WIN, positions[len(planets):], DARK_GREY)
+
+        profiler.draw_overlay(WIN)
+        with profiler.phase("flip"):
+            pygame.display.update()
+        profiler.end_frame()
+
+    if physics is not None:
+        physics.stop()
+    if autosave is not None:
+        autosave.save()
+    if profile is not None:
+        profiler.dump(profile)
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Planetary system simulation")
+    parser.add_argument("--threaded", action="store_true", help="run the physics on its own thread")
+    parser.add_argument("--profile", metavar="PATH", help="record the time of each phase, per frame (JSON or CSV)")
+    parser.add_argument("--scene", metavar="PATH", help="scene file to load (JSON or TOML, see scenes.py)")
+    parser.add_argument("--checkpoint", metavar="PATH", help="resume from this checkpoint if it exists, and save to it")
+    parser.add_argument("--checkpoint-every", type=float, default=5.0, metavar="SECONDS")
+    parser.add_argument("--ephemeris", metavar="PATH", help="view a precomputed ephemeris (ephemeris.py) instead of simulating")
+    parser.add_argument("--kepler", choices=("analytic", "encke"), help="analytic Kepler propagation (kepler.py)")
+    args = parser.parse_args()
+    main(args.threaded, args.profile, args.scene, args.checkpoint, args.checkpoint_every, args.ephemeris, args.kepler)
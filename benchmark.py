@@ -0,0 +1,276 @@
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+import Simulation
+import Simulation_3D
+import Simulation_planete
+import scenes
+from gravity import BarnesHutSolver, DirectSolver
+
+# Headless throughput benchmarks for the three simulations.
+# For each case and each body count, the physics is stepped without any display and the
+# script reports steps/s, the time spent in each phase and the peak memory. Results can be
+# written to JSON and compared with a previous run:
+#
+#   python benchmark.py --counts 10 100 1000 10000 --output bench.json
+#   python benchmark.py --output new.json --compare bench.json
+#   python benchmark.py --scene scenes/pluie.toml
+
+DEFAULT_COUNTS = [10, 100, 1000, 10000, 100000]
+DEFAULT_STEPS = 20
+DEFAULT_BUDGET = 20.0 # Seconds allowed per (case, count); larger counts are skipped beyond it
+
+
+class PhaseTimer:
+    # Accumulates wall-clock time per named phase
+    def __init__(self):
+        self.totals = {}
+
+    def time(self, name, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - start
+        return result
+
+
+# --- Scenes ---
+# Each builder returns a function step(timer) advancing the scene by one step.
+
+def build_2d(n, rng):
+    # Circles of radius 2-6 px covering about 5% of the area, falling on the floor
+    cote = max(800.0, math.sqrt(n * 1000.0))
+    monde = Simulation.World(sol=Simulation.Sol(cote, 50, Simulation.GRIS, 0.3), largeur_monde=cote)
+    for x, y, rayon, vx, vy in zip(rng.uniform(10, cote - 10, n), rng.uniform(10, cote - 10, n),
+                                   rng.uniform(2, 6, n), rng.uniform(-50, 50, n), rng.uniform(-50, 50, n)):
+        cercle = Simulation.Cercle(x, y, rayon, Simulation.NOIR, 0.8)
+        cercle.vx, cercle.vy, cercle.ay = vx, vy, 98
+        monde.ajouter(cercle)
+    return world_stepper(monde)
+
+
+def world_stepper(monde):
+    if monde.solveur is not None or monde.ccd or monde.sommeil is not None or monde.sous_pas != 1:
+        # These options change the step itself: timed as a whole
+        return lambda timer: timer.time("step", monde.step, monde.dt_fixe)
+
+    def step(timer):
+        timer.time("integration", monde.integrer, monde.dt_fixe)
+        timer.time("bounds", monde.rebonds)
+        boites = timer.time("broad_phase", monde.boites_elargies)
+        paires = timer.time("broad_phase", monde.paires_candidates, boites)
+        timer.time("narrow_phase", monde.phase_etroite, paires, boites)
+
+    return step
+
+
+def build_planets(n, rng, solver):
+    # A sun and n - 1 light bodies on circular orbits between 0.3 and 3 AU
+    sun_mass = 1.989e30
+    radius = rng.uniform(0.3, 3.0, n - 1) * Simulation_planete.AU
+    angle = rng.uniform(0, 2 * math.pi, n - 1)
+    speed = np.sqrt(Simulation_planete.G * sun_mass / radius)
+    positions = np.vstack(([0.0, 0.0], np.column_stack((radius * np.cos(angle), radius * np.sin(angle)))))
+    velocities = np.vstack(([0.0, 0.0], np.column_stack((-speed * np.sin(angle), speed * np.cos(angle)))))
+    masses = np.concatenate(([sun_mass], rng.uniform(1e20, 1e23, n - 1)))
+    fixed = np.zeros(n, dtype=bool)
+    fixed[0] = True
+    system = Simulation_planete.PlanetSystem.from_arrays(positions, velocities, masses, fixed, solver=solver,
+                                                         integrator="verlet")
+    return system_stepper(system)
+
+
+def system_stepper(system):
+    timer_ref = {}
+    accelerations = system.accelerations
+
+    def timed_accelerations(positions=None, targets=None):
+        return timer_ref["timer"].time("forces", accelerations, positions, targets)
+
+    system.accelerations = timed_accelerations
+
+    def step(timer):
+        timer_ref["timer"] = timer
+        start = time.perf_counter()
+        forces_before = timer.totals.get("forces", 0.0)
+        system.step()
+        forces = timer.totals.get("forces", 0.0) - forces_before
+        timer.totals["integration"] = timer.totals.get("integration", 0.0) + time.perf_counter() - start - forces
+
+    return step
+
+
+def build_3d(n, rng):
+    side = max(10.0, math.sqrt(n))
+    balls = [Simulation_3D.Ball(x, y, z, (255, 0, 0), radius=r, vx=vx, vy=vy)
+             for x, y, z, r, vx, vy in zip(rng.uniform(0, side, n), rng.uniform(0, side, n),
+                                           rng.uniform(0, 200, n), rng.uniform(5, 15, n),
+                                           rng.uniform(-1, 1, n), rng.uniform(-1, 1, n))]
+    return balls_stepper(balls)
+
+
+def balls_stepper(balls):
+    def step(timer):
+        timer.time("integration", Simulation_3D.integrate_balls, balls, 1 / 60)
+        timer.time("collisions", Simulation_3D.collide_balls, balls)
+
+    return step
+
+
+CASES = {
+    "2d": build_2d,
+    "planete_direct": lambda n, rng: build_planets(n, rng, DirectSolver()),
+    "planete_barnes_hut": lambda n, rng: build_planets(n, rng, BarnesHutSolver(theta=0.5)),
+    "3d": build_3d,
+}
+STEPPERS = {
+    "simulation": world_stepper,
+    "planete": system_stepper,
+    "3d": balls_stepper,
+}
+
+
+def scene_case(path):
+    # Benchmark case of a scene file (scenes.py): registered in CASES, returns (name, body count).
+    # The body count is fixed by the file, n is ignored.
+    kind = scenes.read(path).get("simulation")
+    built = scenes.load(path)
+    n = built.stock.n if kind == "simulation" else len(built.masses) if kind == "planete" else len(built)
+    name = f"scene:{os.path.basename(path)}"
+    CASES[name] = lambda n, rng: STEPPERS[kind](scenes.load(path))
+    return name, n
+
+
+# --- Measurement ---
+
+def measure(case, n, steps, budget, memory=True, seed=0):
+    builder = CASES[case]
+    step = builder(n, np.random.default_rng(seed))
+
+    # Warm-up step, also used to fit the number of steps into the budget
+    start = time.perf_counter()
+    step(PhaseTimer())
+    warmup = time.perf_counter() - start
+    steps = max(1, min(steps, int(budget / max(warmup, 1e-9))))
+
+    timer = PhaseTimer()
+    start = time.perf_counter()
+    for _ in range(steps):
+        step(timer)
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "case": case,
+        "n": n,
+        "steps": steps,
+        "steps_per_s": steps / elapsed,
+        "seconds_per_step": elapsed / steps,
+        "phases": {name: total / steps for name, total in timer.totals.items()},
+        "peak_memory_mb": None,
+    }
+
+    if memory:
+        # Separate run under tracemalloc (it slows allocations down): scene creation + one step
+        tracemalloc.start()
+        builder(n, np.random.default_rng(seed))(PhaseTimer())
+        result["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result, warmup
+
+
+def run(cases, counts, steps, budget, memory=True):
+    results = []
+    for case in cases:
+        for n in counts:
+            result, warmup = measure(case, n, steps, budget, memory)
+            results.append(result)
+            print_result(result)
+            if warmup > budget:
+                print(f"  {case}: one step took {warmup:.1f} s, larger counts skipped")
+                break
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata():
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+# --- Reporting ---
+
+def print_result(result):
+    phases = ", ".join(f"{name} {1000 * t:.2f} ms" for name, t in result["phases"].items())
+    memory = f", peak {result['peak_memory_mb']:.1f} MB" if result["peak_memory_mb"] is not None else ""
+    print(f"{result['case']:>20} n={result['n']:<7} {result['steps_per_s']:10.2f} steps/s ({phases}{memory})")
+
+
+def compare(results, previous):
+    # Ratio of steps/s between this run and a previous one, for the (case, n) present in both
+    old = {(r["case"], r["n"]): r for r in previous["results"]}
+    print(f"\nComparison with {previous['meta'].get('revision')} ({previous['meta'].get('date')}):")
+    for result in results:
+        before = old.get((result["case"], result["n"]))
+        if before is None:
+            continue
+        ratio = result["steps_per_s"] / before["steps_per_s"]
+        flag = "  REGRESSION" if ratio < 0.9 else ""
+        print(f"{result['case']:>20} n={result['n']:<7} {before['steps_per_s']:10.2f} -> "
+              f"{result['steps_per_s']:10.2f} steps/s (x{ratio:.2f}){flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless throughput benchmarks of the simulations")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--scene", nargs="+", default=[], metavar="PATH",
+                        help="scene files (JSON/TOML) to benchmark instead of the built-in cases")
+    parser.add_argument("--counts", nargs="+", type=int, default=DEFAULT_COUNTS)
+    parser.add_argument("--steps", type=int, default=DEFAULT_STEPS)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help="seconds allowed per (case, count) before larger counts are skipped")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory measurement")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of a previous run to compare with")
+    args = parser.parse_args(argv)
+
+    if args.scene:
+        results = []
+        for path in args.scene:
+            name, n = scene_case(path)
+            results += run([name], [n], args.steps, args.budget, not args.no_memory)
+    else:
+        results = run(args.cases, sorted(args.counts), args.steps, args.budget, not args.no_memory)
+    report = {"meta": metadata(), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
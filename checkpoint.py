@@ -0,0 +1,246 @@
+import argparse
+import contextlib
+import json
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+import Simulation_planete
+from gravity import BarnesHutSolver, DirectSolver
+from integrators import INTEGRATORS
+from kepler import KeplerPropagator
+
+# Binary checkpoints of a planet system (Simulation_planete.PlanetSystem).
+# A checkpoint holds everything a run depends on: body arrays, simulation clock, the integrator
+# and its cached state (Verlet accelerations, block timestep levels...), the gravity solver
+# settings and the Planet objects with their orbit trails. Arrays are stored as raw bytes, so a
+# restored run continues bit for bit like the original one.
+#
+# File layout (little endian):
+#   0   8 bytes  magic
+#   8   uint32   length of the JSON header
+#   12  JSON     scalars, and the dtype / shape / offset of every array
+#   ... arrays   raw, each one starting on a multiple of 64
+#
+# Files are written to a temporary name and renamed, so a crash never leaves a truncated
+# checkpoint behind.
+#
+#   python checkpoint.py run solar.ckpt --steps 1000000 --integrator verlet --every 5
+#   python checkpoint.py info solar.ckpt
+
+MAGIC = b"MCCKPT\x00\x01"
+HEADER = struct.Struct("<8sI")
+ALIGNMENT = 64
+DEFAULT_EVERY = 5.0 # Seconds of wall-clock time between automatic checkpoints
+
+SOLVERS = {cls.__name__: cls for cls in (DirectSolver, BarnesHutSolver)}
+INTEGRATOR_CLASSES = {cls.__name__: cls for cls in (*INTEGRATORS.values(), KeplerPropagator)}
+
+
+# --- Object state ---
+
+def object_state(obj, arrays, prefix):
+    # Attributes of obj: arrays are moved to `arrays` (under prefix.name), the rest is returned
+    values = {}
+    for name, value in vars(obj).items():
+        if isinstance(value, np.ndarray):
+            arrays[f"{prefix}.{name}"] = value
+            values[name] = {"array": f"{prefix}.{name}"}
+        else:
+            values[name] = value.item() if isinstance(value, np.generic) else value
+    return {"class": type(obj).__name__, "values": values}
+
+
+def restore_object(state, classes, arrays):
+    obj = classes[state["class"]]()
+    for name, value in state["values"].items():
+        setattr(obj, name, arrays[value["array"]] if isinstance(value, dict) else value)
+    return obj
+
+
+# --- Planet system ---
+
+def system_state(system):
+    # (header dictionary, {name: array}) describing the whole system
+    arrays = {
+        "positions": system.positions,
+        "velocities": system.velocities,
+        "masses": system.masses,
+        "fixed": system.fixed,
+    }
+    planets = system.planets
+    if planets:
+        arrays["planets"] = np.array([(p.x, p.y, p.x_vel, p.y_vel, p.distance_to_sun) for p in planets], dtype=float)
+        arrays["trails"] = np.stack([p.orbit.world for p in planets])
+    header = {
+        "kind": "planete",
+        "time": system.time,
+        "timestep": system.timestep,
+        "integrator": object_state(system.integrator, arrays, "integrator"),
+        "solver": object_state(system.solver, arrays, "solver"),
+        "planets": [{"radius": p.base_radius, "color": list(p.color), "mass": p.mass, "sun": p.sun,
+                     "trail_head": p.orbit.head, "trail_count": p.orbit.count, "trail_capacity": p.orbit.capacity}
+                    for p in planets],
+    }
+    return header, arrays
+
+
+def restore_system(header, arrays):
+    planets = []
+    for k, meta in enumerate(header["planets"]):
+        x, y, x_vel, y_vel, distance = arrays["planets"][k].tolist()
+        planet = Simulation_planete.Planet(x, y, meta["radius"], tuple(meta["color"]), meta["mass"])
+        planet.x_vel, planet.y_vel = x_vel, y_vel
+        planet.sun = meta["sun"]
+        planet.distance_to_sun = distance
+        planet.orbit = Simulation_planete.OrbitTrail(meta["trail_capacity"])
+        planet.orbit.world[:] = arrays["trails"][k]
+        planet.orbit.head, planet.orbit.count = meta["trail_head"], meta["trail_count"]
+        planets.append(planet)
+
+    system = Simulation_planete.PlanetSystem([], timestep=header["timestep"],
+                                             solver=restore_object(header["solver"], SOLVERS, arrays))
+    system.planets = planets
+    system.positions, system.velocities = arrays["positions"], arrays["velocities"]
+    system.masses, system.fixed = arrays["masses"], arrays["fixed"]
+    system._find_sun()
+    system.integrator = restore_object(header["integrator"], INTEGRATOR_CLASSES, arrays)
+    system.time = header["time"]
+    return system
+
+
+# --- Files ---
+
+def save(system, path, lock=None):
+    # lock: held while the Planet objects are copied, when another thread updates them (the render
+    # thread's sync_planets); the body arrays and the integrator belong to the calling thread
+    with lock if lock is not None else contextlib.nullcontext():
+        header, arrays = system_state(system)
+    # Offsets are relative to the end of the header, which depends on their own length: the
+    # header is encoded with the array table, then the data starts at the next aligned offset
+    table, offset = {}, 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        table[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header["arrays"] = table
+    meta = json.dumps(header).encode()
+    data_offset = -(-(HEADER.size + len(meta)) // ALIGNMENT) * ALIGNMENT
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(meta)) + meta)
+        for name, array in arrays.items():
+            f.seek(data_offset + table[name]["offset"])
+            f.write(array.data)
+        f.truncate(data_offset + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def read(path):
+    # (header, {name: array}) of a checkpoint file
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, meta_length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a checkpoint file")
+    header = json.loads(data[HEADER.size:HEADER.size + meta_length])
+    data_offset = -(-(HEADER.size + meta_length) // ALIGNMENT) * ALIGNMENT
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"]))
+        arrays[name] = np.frombuffer(data, dtype, count, data_offset + entry["offset"]).reshape(entry["shape"]).copy()
+    return header, arrays
+
+
+def load(path):
+    return restore_system(*read(path))
+
+
+class AutoCheckpoint:
+    # Saves the system every `every` seconds of wall-clock time; call maybe_save() after each
+    # step (from the thread that steps the system, so that a checkpoint never sees half a step).
+    # lock: see save(), for a physics thread whose Planet objects are synced by the render thread.
+    def __init__(self, system, path, every=DEFAULT_EVERY, lock=None):
+        self.system = system
+        self.path = path
+        self.every = every
+        self.lock = lock
+        self.last = time.perf_counter()
+        self.count = 0
+
+    def maybe_save(self):
+        now = time.perf_counter()
+        if now - self.last >= self.every:
+            self.save()
+            self.last = now
+
+    def save(self):
+        save(self.system, self.path, self.lock)
+        self.count += 1
+
+
+# --- Command line ---
+
+def run(path, steps, every=DEFAULT_EVERY, integrator="euler", scene=None):
+    # Headless run of `steps` steps, resumed from path if it exists and checkpointed to it
+    if os.path.exists(path):
+        system = load(path)
+        print(f"resumed from {path} at t = {system.time / 86400 / 365.25:.2f} years")
+    elif scene is not None:
+        import scenes
+        system = scenes.load(scene, "planete")
+    else:
+        system = Simulation_planete.PlanetSystem(Simulation_planete.create_solar_system(), integrator=integrator)
+    autosave = AutoCheckpoint(system, path, every)
+    start = time.perf_counter()
+    try:
+        for _ in range(steps):
+            system.step()
+            system.sync_planets()
+            autosave.maybe_save()
+    finally:
+        # Interrupted or finished: the last completed step is saved
+        autosave.save()
+    elapsed = time.perf_counter() - start
+    print(f"{steps} steps in {elapsed:.1f} s, t = {system.time / 86400 / 365.25:.2f} years, "
+          f"{autosave.count} checkpoints written to {path}")
+    return system
+
+
+def info(path):
+    header, arrays = read(path)
+    print(f"{path}: {header['kind']}, {len(arrays['masses'])} bodies, t = {header['time']} s "
+          f"({header['time'] / 86400 / 365.25:.2f} years), timestep {header['timestep']} s")
+    print(f"integrator {header['integrator']['class']}, solver {header['solver']['class']}, "
+          f"{len(header['planets'])} planets with trails, {os.path.getsize(path)} bytes")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checkpointed headless runs of the planet simulation")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run (or resume) a simulation, checkpointing it periodically")
+    run_parser.add_argument("path")
+    run_parser.add_argument("--steps", type=int, required=True)
+    run_parser.add_argument("--every", type=float, default=DEFAULT_EVERY, help="seconds between checkpoints")
+    run_parser.add_argument("--integrator", default="euler", choices=sorted(INTEGRATORS))
+    run_parser.add_argument("--scene", help="scene file (scenes.py) for a new run")
+    info_parser = commands.add_parser("info", help="describe a checkpoint")
+    info_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run(args.path, args.steps, args.every, args.integrator, args.scene)
+    else:
+        info(args.path)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,188 @@
+import numpy as np
+
+# Détection continue des collisions (CCD).
+# Pendant un pas, chaque corps est supposé aller en ligne droite de sa position de départ à sa
+# position d'arrivée (celle que donne l'intégrateur). On calcule, pour chaque paire candidate et
+# pour chaque bord, la fraction du pas s (0 <= s <= 1) à laquelle le premier contact a lieu
+# (temps d'impact, TOI). Tous les corps sont avancés jusqu'au premier impact, celui-ci est résolu,
+# puis le reste du pas est simulé de la même façon. Un corps rapide ne peut donc plus traverser
+# un autre corps, un mur ou le sol entre deux pas.
+#
+# Les contacts déjà établis au début du pas (s = 0, objets posés ou qui se chevauchent) ne sont pas
+# des impacts : ils restent traités par les rebonds et la phase étroite discrets de World.
+
+MAX_IMPACTS_PAR_PAS = 32 # Au-delà, le reste du pas est simulé sans CCD
+TOLERANCE_TOI = 1e-9 # Impacts simultanés (et contacts au tout début du pas, ignorés)
+
+
+def toi_bords(boites, deplacement, largeur_monde, sol=None):
+    # Fraction du pas avant le contact avec un mur (colonne 0) et avec le sol ou le plafond
+    # (colonne 1), inf si aucun contact pendant le pas ; boites : (n, 4) au début du pas
+    dx, dy = deplacement[:, 0], deplacement[:, 1]
+    s = np.full((len(boites), 2), np.inf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s[:, 0] = np.where(dx > 0, (largeur_monde - boites[:, 2]) / dx, np.where(dx < 0, -boites[:, 0] / dx, np.inf))
+        bas = (sol.y - boites[:, 3]) / dy if sol is not None else np.inf
+        s[:, 1] = np.where(dy > 0, bas, np.where(dy < 0, -boites[:, 1] / dy, np.inf))
+    s[(s < 0) | (s > 1)] = np.inf
+    return s
+
+
+def _balayage_intervalles(bas, haut, depart, u):
+    # Temps d'entrée et de sortie, par axe, du point depart + u * s dans l'intervalle ]bas, haut[
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t1 = (bas - depart) / u
+        t2 = (haut - depart) / u
+    entree, sortie = np.minimum(t1, t2), np.maximum(t1, t2)
+    immobile = u == 0
+    dedans = (depart > bas) & (depart < haut)
+    entree[immobile] = np.where(dedans[immobile], -np.inf, np.inf)
+    sortie[immobile] = np.where(dedans[immobile], np.inf, -np.inf)
+    return entree, sortie
+
+
+def _normale_axe(entree_axe, u):
+    # Normale le long de l'axe d'entrée, opposée au déplacement
+    lignes = np.arange(len(u))
+    axe = entree_axe.argmax(axis=1)
+    normale = np.zeros_like(u)
+    normale[lignes, axe] = -np.sign(u[lignes, axe])
+    return normale
+
+
+def _racine_entree(p, u, rayon):
+    # Plus petit s de [0, 1] tel que |p + u * s| = rayon en venant de l'extérieur, inf sinon
+    a = (u * u).sum(axis=1)
+    b = 2 * (p * u).sum(axis=1)
+    c = (p * p).sum(axis=1) - rayon ** 2
+    disc = b * b - 4 * a * c
+    ok = (a > 0) & (b < 0) & (c >= 0) & (disc >= 0)
+    s = np.full(len(p), np.inf)
+    s[ok] = (-b[ok] - np.sqrt(disc[ok])) / (2 * a[ok])
+    s[s > 1] = np.inf
+    return s
+
+
+def toi_cercles(centre_i, rayon_i, centre_j, rayon_j, u):
+    # u : déplacement de j par rapport à i pendant le pas. Renvoie s et la normale de i vers j au contact
+    p = centre_j - centre_i
+    somme = rayon_i + rayon_j
+    s = _racine_entree(p, u, somme)
+    contact = p + u * np.where(np.isfinite(s), s, 0.0)[:, None]
+    return s, contact / somme[:, None]
+
+
+def toi_boites(boite_i, boite_j, u):
+    # Boîtes (xmin, ymin, xmax, ymax) ; j se déplace de u par rapport à i (somme de Minkowski :
+    # le coin min de j balaie la boîte i agrandie de la taille de j)
+    taille_j = boite_j[:, 2:] - boite_j[:, :2]
+    entree_axe, sortie_axe = _balayage_intervalles(boite_i[:, :2] - taille_j, boite_i[:, 2:], boite_j[:, :2], u)
+    entree, sortie = entree_axe.max(axis=1), sortie_axe.min(axis=1)
+    s = np.where((entree < sortie) & (entree >= 0) & (entree <= 1), entree, np.inf)
+    return s, _normale_axe(entree_axe, u)
+
+
+def toi_cercle_boite(centre, rayon, boite, u):
+    # Cercle qui se déplace de u par rapport à la boîte. Renvoie s et la normale sortante de la
+    # boîte au contact. Le centre balaie la boîte agrandie du rayon, aux coins arrondis :
+    # test contre la boîte agrandie, puis contre le cercle du coin si l'entrée se fait dans un coin.
+    r = rayon[:, None]
+    entree_axe, sortie_axe = _balayage_intervalles(boite[:, :2] - r, boite[:, 2:] + r, centre, u)
+    entree, sortie = entree_axe.max(axis=1), sortie_axe.min(axis=1)
+    traverse = (entree < sortie) & (entree <= 1) & (sortie >= 0)
+    s = np.where(traverse & (entree >= 0), entree, np.inf)
+    normale = _normale_axe(entree_axe, u)
+
+    point = centre + u * np.maximum(np.where(traverse, entree, 0.0), 0.0)[:, None]
+    dehors = (point < boite[:, :2]) | (point > boite[:, 2:])
+    coins = np.nonzero(traverse & dehors.all(axis=1))[0]
+    if len(coins):
+        coin = np.where(point[coins] < boite[coins, :2], boite[coins, :2], boite[coins, 2:])
+        p = centre[coins] - coin
+        s_coin = _racine_entree(p, u[coins], rayon[coins])
+        s[coins] = s_coin
+        normale[coins] = (p + u[coins] * np.where(np.isfinite(s_coin), s_coin, 0.0)[:, None]) / r[coins]
+    return s, normale
+
+
+def toi_paires(i, j, cercles, centres, rayons, boites, deplacement):
+    # TOI et normales (de i vers j) des paires candidates, selon le type de forme de chaque corps
+    s = np.full(len(i), np.inf)
+    normale = np.zeros((len(i), 2))
+    u = deplacement[j] - deplacement[i]
+
+    k = np.nonzero(cercles[i] & cercles[j])[0]
+    s[k], normale[k] = toi_cercles(centres[i[k]], rayons[i[k]], centres[j[k]], rayons[j[k]], u[k])
+    k = np.nonzero(~cercles[i] & ~cercles[j])[0]
+    s[k], normale[k] = toi_boites(boites[i[k]], boites[j[k]], u[k])
+    k = np.nonzero(cercles[i] & ~cercles[j])[0]
+    s[k], n = toi_cercle_boite(centres[i[k]], rayons[i[k]], boites[j[k]], -u[k])
+    normale[k] = -n
+    k = np.nonzero(~cercles[i] & cercles[j])[0]
+    s[k], normale[k] = toi_cercle_boite(centres[j[k]], rayons[j[k]], boites[i[k]], u[k])
+    return s, normale
+
+
+def impulsion(vitesse, masse, restitution, i, j, normale):
+    # Choc le long de la normale (même loi que Cercle.gestion_collision) ; False si i et j s'éloignent déjà
+    approche = float((vitesse[j] - vitesse[i]) @ normale)
+    if approche >= 0:
+        return False
+    e = min(restitution[i], restitution[j])
+    choc = -(1 + e) * approche / (1 / masse[i] + 1 / masse[j])
+    vitesse[i] -= choc / masse[i] * normale
+    vitesse[j] += choc / masse[j] * normale
+    return True
+
+
+def avancer_continu(monde, dt):
+    # Intégration du pas dt de monde (World) jusqu'au premier impact, résolution, et ainsi de suite
+    stock = monde.stock
+    n = stock.n
+    position, vitesse = stock.position[:n], stock.vitesse[:n]
+    cercles = monde.masque_cercles()
+    rayons = stock.dimensions[:n, 0] / 2
+    restant = dt
+
+    for _ in range(MAX_IMPACTS_PAR_PAS):
+        depart, vitesse_depart = position.copy(), vitesse.copy()
+        monde.integrer(restant)
+        deplacement = position - depart
+
+        coin = depart + stock.decalage[:n]
+        boites = np.hstack((coin, coin + stock.dimensions[:n]))
+        s_bords = toi_bords(boites, deplacement, monde.largeur, monde.sol)
+
+        # Paires candidates : boîtes balayées pendant le pas
+        balayees = np.hstack((boites[:, :2] + np.minimum(deplacement, 0), boites[:, 2:] + np.maximum(deplacement, 0)))
+        paires = np.array(monde.broad_phase.paires_depuis_boites(balayees), dtype=np.int64).reshape(-1, 2)
+        i, j = paires[:, 0], paires[:, 1]
+        s_paires, normales = toi_paires(i, j, cercles, depart, rayons, boites, deplacement)
+
+        s_bords[s_bords <= TOLERANCE_TOI] = np.inf
+        s_paires[s_paires <= TOLERANCE_TOI] = np.inf
+        s_min = min(s_bords.min(initial=np.inf), s_paires.min(initial=np.inf))
+        if not np.isfinite(s_min):
+            return
+
+        # Tous les corps sont ramenés à l'instant du premier impact
+        position[:] = depart + deplacement * s_min
+        vitesse[:] = vitesse_depart + (vitesse - vitesse_depart) * s_min
+
+        # Impacts contre les bords : mêmes coefficients que StockCorps.rebonds_bords
+        murs = s_bords[:, 0] <= s_min + TOLERANCE_TOI
+        vitesse[murs, 0] *= -stock.restitution[:n][murs]
+        verticaux = s_bords[:, 1] <= s_min + TOLERANCE_TOI
+        sol = verticaux & (deplacement[:, 1] > 0)
+        plafond = verticaux & ~sol
+        vitesse[sol, 1] *= -monde.sol.coefficient_restitution if monde.sol is not None else 1
+        vitesse[plafond, 1] *= -stock.restitution[:n][plafond]
+
+        for k in np.nonzero(s_paires <= s_min + TOLERANCE_TOI)[0].tolist():
+            if impulsion(vitesse, stock.masse[:n], stock.restitution[:n], i[k], j[k], normales[k]):
+                monde.nb_collisions += 1
+
+        restant *= 1 - s_min
+
+    # Trop d'impacts dans ce pas : la fin est simulée sans CCD
+    monde.integrer(restant)
@@ -0,0 +1,297 @@
+import argparse
+import math
+import os
+import sys
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+
+import Simulation
+import Simulation_planete
+from ensemble import print_table, write_csv
+from integrators import INTEGRATORS
+
+# Conservation diagnostics, to choose the timestep of a simulation.
+# Diagnostics follows a PlanetSystem (Simulation_planete.py) or a World (Simulation.py) step
+# after step: the area swept by each body around the sun is accumulated at every step (O(n)),
+# and every `every` steps a sample records the drift of the total energy, linear momentum,
+# angular momentum and swept areas since the start (Kepler's second law: the area grows at the
+# constant rate |r x v| / 2). sweep() looks for the largest timestep whose drift stays under a
+# target, so that long runs take the fewest steps that are still accurate.
+#
+# With a fixed sun the linear momentum of a planet system is not conserved (the sun is an
+# external anchor), and collisions with restitution < 1 dissipate the energy of a World: pick
+# the quantity accordingly.
+#
+#   python diagnostics.py planete --years 10 --integrator verlet --every 40
+#   python diagnostics.py planete --sweep --target 1e-6 --years 10 --integrator verlet
+#   python diagnostics.py simulation --seconds 20 --sweep --target 1e-3
+
+DEFAULT_EVERY = 10 # Steps between samples
+DEFAULT_TARGET = 1e-6
+REFINE = 6 # Bisection steps of the sweep, after the doubling / halving search
+MAX_SEARCH = 20 # Doublings / halvings tried before the sweep gives up
+SHRINK = 0.9 # A halved timestep must reduce the drift below SHRINK times the previous one
+QUANTITIES = ("energy", "momentum", "angular_momentum", "area")
+WORLD_QUANTITIES = QUANTITIES[:-1] # No swept area around a sun in a World
+YEAR = 365.25 * 86400
+
+
+def cross(a, b):
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def swept_area(r0, v0, r1, v1, dt):
+    # Area swept from r0 to r1 during dt, on the cubic Hermite path through both states
+    # (exact for a path of degree <= 3; a straight chord would miss an O(dt^3) segment per step)
+    return (cross(r0, r1) / 2 + dt / 10 * (cross(r0, v0) - cross(r0, v1) + cross(v0, r1) + cross(r1, v1))
+            - dt * dt / 60 * cross(v0, v1))
+
+
+class Diagnostics:
+    def __init__(self, subject, every=DEFAULT_EVERY):
+        self.subject = subject
+        self.every = every
+        self.planets = isinstance(subject, Simulation_planete.PlanetSystem)
+        self.steps = 0
+        self.samples = []
+        positions, velocities = self._state()
+        self._previous = positions, velocities
+        self.areas = np.zeros(len(positions))
+        self.initial = self._measure()
+        self.sample()
+
+    # --- Subject ---
+
+    def _time(self):
+        return self.subject.time if self.planets else self.subject.temps
+
+    def _timestep(self):
+        return self.subject.timestep if self.planets else self.subject.dt_fixe
+
+    def _masses(self):
+        return self.subject.masses if self.planets else self.subject.stock.masse[:self.subject.stock.n]
+
+    def _state(self):
+        # Positions (relative to the sun, if any) and velocities of the moving bodies
+        if self.planets:
+            system = self.subject
+            centre = system.positions[system.sun_index] if system.sun_index is not None else 0.0
+            moving = ~system.fixed
+            return system.positions[moving] - centre, system.velocities[moving].copy()
+        n = self.subject.stock.n
+        return self.subject.stock.position[:n].copy(), self.subject.stock.vitesse[:n].copy()
+
+    def _measure(self):
+        positions, velocities = self._state()
+        masses = self._masses()[~self.subject.fixed] if self.planets else self._masses()
+        return {
+            "energy": self.subject.energy() if self.planets else self.subject.energie(),
+            "momentum": (masses[:, None] * velocities).sum(axis=0),
+            "momentum_scale": (masses * np.linalg.norm(velocities, axis=1)).sum(),
+            "angular_momentum": (masses * cross(positions, velocities)).sum(),
+            "areal_velocity": cross(positions, velocities) / 2,
+        }
+
+    # --- Sampling ---
+
+    def step(self):
+        # Steps the subject, then updates the diagnostics
+        if self.planets:
+            self.subject.step()
+        else:
+            self.subject.step(self.subject.dt_fixe)
+        self.update()
+
+    def update(self):
+        # To call after every step of the subject
+        if self.planets:
+            positions, velocities = self._state()
+            self.areas += swept_area(*self._previous, positions, velocities, self._timestep())
+            self._previous = positions, velocities
+        self.steps += 1
+        if self.steps % self.every == 0:
+            self.sample()
+
+    def sample(self):
+        now, initial = self._measure(), self.initial
+        elapsed = self._time() - self.samples[0]["time"] if self.samples else 0.0
+        row = {
+            "step": self.steps,
+            "time": self._time(),
+            "energy": now["energy"],
+            "energy_drift": relative(now["energy"] - initial["energy"], initial["energy"]),
+            "momentum_drift": relative(np.linalg.norm(now["momentum"] - initial["momentum"]), initial["momentum_scale"]),
+            "angular_momentum_drift": relative(now["angular_momentum"] - initial["angular_momentum"],
+                                               initial["angular_momentum"]),
+        }
+        if not self.planets:
+            self.samples.append(row)
+            return row
+        expected = initial["areal_velocity"] * elapsed
+        if elapsed > 0 and len(expected):
+            # Kepler's second law: worst relative gap between the swept and the expected area
+            with np.errstate(divide="ignore", invalid="ignore"):
+                gaps = np.abs(self.areas - expected) / np.abs(expected)
+            row["area_drift"] = float(np.nanmax(gaps)) if np.isfinite(gaps).any() else 0.0
+        else:
+            row["area_drift"] = 0.0
+        self.samples.append(row)
+        return row
+
+    def drift(self):
+        # Largest absolute drift of each quantity over all the samples (no swept area for a World)
+        return {quantity: max(abs(row[f"{quantity}_drift"]) for row in self.samples)
+                for quantity in QUANTITIES if f"{quantity}_drift" in self.samples[0]}
+
+
+def relative(difference, reference):
+    return float(difference / abs(reference)) if reference != 0 else float(abs(difference))
+
+
+def run(subject, duration, every=DEFAULT_EVERY):
+    # Diagnostics of `duration` seconds of simulated time
+    diagnostics = Diagnostics(subject, every)
+    for _ in range(int(math.ceil(duration / diagnostics._timestep()))):
+        diagnostics.step()
+    if diagnostics.steps % every:
+        diagnostics.sample()
+    return diagnostics
+
+
+# --- Timestep sweep ---
+
+def sweep(build, duration, start, target=DEFAULT_TARGET, quantity="energy", every=DEFAULT_EVERY, refine=REFINE):
+    # Largest timestep whose drift of `quantity` over `duration` stays <= target. build(dt) returns
+    # a new subject stepping with dt. The timestep is doubled (or halved) from start until the
+    # target is crossed, then bisected geometrically. Returns (best timestep or None, rows).
+    # A drift that halving the timestep does not reduce (collisions with restitution < 1 in a World,
+    # linear momentum with a fixed sun) cannot be met: the sweep stops and returns None.
+    rows = []
+
+    def error(dt):
+        diagnostics = run(build(dt), duration, every)
+        drifts = diagnostics.drift()
+        if quantity not in drifts:
+            raise ValueError(f"no {quantity} drift for this simulation, expected one of {sorted(drifts)}")
+        value = drifts[quantity]
+        rows.append({"timestep": dt, "steps": diagnostics.steps, f"{quantity}_drift": value, "ok": value <= target})
+        return value
+
+    low, high = None, None # Largest passing, smallest failing timesteps
+    dt, previous = start, None
+    for _ in range(MAX_SEARCH):
+        value = error(dt)
+        if value <= target:
+            low = dt
+            if high is not None or dt >= duration:
+                break
+            dt *= 2
+        else:
+            if low is not None or (previous is not None and not value < SHRINK * previous):
+                # Passing timestep found, or halving the step no longer reduces the drift: it
+                # does not come from the integration (dissipation, external forces)
+                high = dt if low is not None else high
+                break
+            high, previous = dt, value
+            dt /= 2
+    if low is None:
+        return None, rows
+    if high is not None:
+        for _ in range(refine):
+            middle = math.sqrt(low * high)
+            if error(middle) <= target:
+                low = middle
+            else:
+                high = middle
+    return low, rows
+
+
+# --- Subjects ---
+
+def planet_builder(integrator=None, scene=None):
+    # integrator: name in INTEGRATORS; None keeps the scene's, or "euler" (as the command line)
+    def build(timestep):
+        if scene is not None:
+            import scenes
+            system = scenes.load(scene, "planete")
+            system.timestep = timestep
+            if integrator is not None:
+                system.integrator = INTEGRATORS[integrator]()
+            return system
+        return Simulation_planete.PlanetSystem(Simulation_planete.create_solar_system(), timestep=timestep,
+                                               integrator=integrator or "euler")
+    return build
+
+
+def world_builder(integrateur=None, scene=None):
+    def build(dt):
+        if scene is not None:
+            import scenes
+            monde = scenes.load(scene, "simulation")
+        else:
+            monde = Simulation.creer_monde()
+        monde.dt_fixe = dt
+        if integrateur is not None:
+            monde.integrateur = INTEGRATORS[integrateur]()
+        return monde
+    return build
+
+
+# --- Command line ---
+
+def report(diagnostics, rows=10, output=None):
+    samples = diagnostics.samples
+    shown = [samples[k] for k in np.unique(np.linspace(0, len(samples) - 1, min(rows, len(samples))).astype(int))]
+    print_table(shown)
+    print("max drift: " + ", ".join(f"{name} {value:.3e}" for name, value in diagnostics.drift().items()))
+    if output:
+        write_csv(samples, output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conservation diagnostics and timestep sweeps")
+    commands = parser.add_subparsers(dest="simulation", required=True)
+    planete = commands.add_parser("planete", help="planet system (Simulation_planete.py)")
+    planete.add_argument("--years", type=float, default=10.0)
+    planete.add_argument("--timestep", type=float, default=Simulation_planete.TIMESTEP, help="seconds (start of a sweep)")
+    planete.add_argument("--integrator", choices=sorted(INTEGRATORS), default=None, help="default: euler, or the scene's")
+    simulation = commands.add_parser("simulation", help="2D world (Simulation.py)")
+    simulation.add_argument("--seconds", type=float, default=20.0)
+    simulation.add_argument("--dt", type=float, default=Simulation.DT_FIXE, help="seconds (start of a sweep)")
+    simulation.add_argument("--integrator", choices=sorted(INTEGRATORS), default=None)
+    for command, quantities in ((planete, QUANTITIES), (simulation, WORLD_QUANTITIES)):
+        command.add_argument("--scene", help="scene file (scenes.py) instead of the default scene")
+        command.add_argument("--every", type=int, default=DEFAULT_EVERY, help="steps between samples")
+        command.add_argument("--sweep", action="store_true", help="find the largest timestep meeting --target")
+        command.add_argument("--target", type=float, default=DEFAULT_TARGET, help="largest drift allowed")
+        command.add_argument("--quantity", choices=quantities, default="energy")
+        command.add_argument("--rows", type=int, default=10, help="samples printed")
+        command.add_argument("--output", help="write every sample (or the sweep) to this CSV file")
+    args = parser.parse_args(argv)
+
+    if args.simulation == "planete":
+        build, duration, start = planet_builder(args.integrator, args.scene), args.years * YEAR, args.timestep
+    else:
+        build, duration, start = world_builder(args.integrator, args.scene), args.seconds, args.dt
+
+    if not args.sweep:
+        diagnostics = run(build(start), duration, args.every)
+        report(diagnostics, args.rows, args.output)
+        return diagnostics
+
+    best, rows = sweep(build, duration, start, args.target, args.quantity, args.every)
+    print_table(rows)
+    if best is None:
+        print(f"no timestep meets {args.quantity} drift <= {args.target:g}")
+    else:
+        print(f"largest timestep with {args.quantity} drift <= {args.target:g}: {best:.6g} s "
+              f"({int(math.ceil(duration / best))} steps)")
+    if args.output:
+        write_csv(rows, args.output)
+    return best
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
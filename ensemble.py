@@ -0,0 +1,179 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1") # One banner per worker is just noise
+
+import numpy as np
+
+import Simulation
+import Simulation_planete
+from integrators import make_integrator
+
+# Ensemble runner for parameter sweeps.
+# Every point of a parameter grid is simulated headlessly in a pool of processes (one per core
+# by default) and summarised by a few metrics; all the points end up in one table.
+#
+#   python ensemble.py simulation --grid restitution_cercles=0.3,0.5,0.8 restitution_sol=0.2,0.6 --steps 600
+#   python ensemble.py planete --grid mercury=1.0,1.1,1.2 earth=0.95,1.05 --steps 2000 --output sweep.csv
+
+
+# --- Simulations ---
+# Each function takes the parameters of one grid point and returns a dict of metrics.
+
+def run_simulation(params, steps):
+    # Demo scene of Simulation.py. Parameters: restitution_cercles, restitution_sol,
+    # echelle_vitesse (multiplies the initial velocities), sous_pas, integrateur
+    monde = Simulation.creer_monde()
+    monde.sous_pas = int(params.get("sous_pas", 1))
+    if "integrateur" in params:
+        monde.integrateur = make_integrator(params["integrateur"])
+    if "restitution_sol" in params:
+        monde.sol.coefficient_restitution = float(params["restitution_sol"])
+    for objet in monde.objets:
+        if "restitution_cercles" in params and isinstance(objet, Simulation.Cercle):
+            objet.coefficient_restitution = float(params["restitution_cercles"])
+        objet.vx *= float(params.get("echelle_vitesse", 1.0))
+        objet.vy *= float(params.get("echelle_vitesse", 1.0))
+
+    energie_initiale = monde.energie()
+    monde.run(steps)
+    n = monde.stock.n
+    return {
+        "temps": monde.temps,
+        "energie_initiale": energie_initiale,
+        "energie_finale": monde.energie(),
+        "collisions": monde.nb_collisions,
+        "positions": monde.stock.position[:n].tolist(),
+        "vitesses": monde.stock.vitesse[:n].tolist(),
+    }
+
+
+def run_planete(params, steps):
+    # Solar system of Simulation_planete.py. Parameters: mercury, venus, earth, mars (velocity
+    # multipliers setting the eccentricities), timestep, integrator
+    multipliers = {name: float(params[name]) for name in Simulation_planete.ECCENTRICITY_MULTIPLIERS if name in params}
+    planets = Simulation_planete.create_solar_system(multipliers)
+    system = Simulation_planete.PlanetSystem(planets, timestep=float(params.get("timestep", Simulation_planete.TIMESTEP)),
+                                             integrator=params.get("integrator", "euler"))
+    initial_energy = system.energy()
+    nearest = np.full(len(planets), np.inf)
+    farthest = np.zeros(len(planets))
+    for _ in range(steps):
+        system.step()
+        distances = system.distances_to_sun()
+        np.minimum(nearest, distances, out=nearest)
+        np.maximum(farthest, distances, out=farthest)
+
+    final_energy = system.energy()
+    metrics = {
+        "time": system.time,
+        "initial_energy": initial_energy,
+        "final_energy": final_energy,
+        "energy_drift": abs(final_energy - initial_energy) / abs(initial_energy),
+        "positions": system.positions.tolist(),
+        "velocities": system.velocities.tolist(),
+    }
+    # Eccentricity estimated from the closest and farthest distances reached
+    names = ["sun"] + list(Simulation_planete.ECCENTRICITY_MULTIPLIERS)
+    for name, near, far in zip(names[1:], nearest[1:], farthest[1:]):
+        metrics[f"{name}_eccentricity"] = (far - near) / (far + near)
+    return metrics
+
+
+SIMULATIONS = {
+    "simulation": run_simulation,
+    "planete": run_planete,
+}
+
+
+# --- Runner ---
+
+def grid_points(grid):
+    # {"a": [1, 2], "b": [3]} -> [{"a": 1, "b": 3}, {"a": 2, "b": 3}]
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def run_point(task):
+    simulation, params, steps = task
+    start = time.perf_counter()
+    metrics = SIMULATIONS[simulation](params, steps)
+    return {**params, **metrics, "wall_time": time.perf_counter() - start}
+
+
+def run_ensemble(simulation, grid, steps, processes=None):
+    # Runs every grid point (in parallel, processes=None uses all cores) and returns the rows
+    # of the result table, in grid order
+    tasks = [(simulation, params, steps) for params in grid_points(grid)]
+    if processes == 1:
+        return [run_point(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(run_point, tasks))
+
+
+def write_csv(rows, path):
+    # Lists (final positions, velocities) are stored as JSON in their cell
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: json.dumps(value) if isinstance(value, list) else value for key, value in row.items()})
+
+
+def print_table(rows):
+    columns = [key for key in dict.fromkeys(key for row in rows for key in row)
+               if not any(isinstance(row.get(key), list) for row in rows)]
+    cells = [[format_cell(row.get(key)) for key in columns] for row in rows]
+    widths = [max(len(column), *(len(line[k]) for line in cells)) for k, column in enumerate(columns)]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for line in cells:
+        print("  ".join(cell.rjust(width) for cell, width in zip(line, widths)))
+
+
+def format_cell(value):
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return "" if value is None else str(value)
+
+
+def parse_value(text):
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def parse_grid(items):
+    # ["a=1,2", "b=x"] -> {"a": [1.0, 2.0], "b": ["x"]}
+    grid = {}
+    for item in items:
+        name, _, values = item.partition("=")
+        grid[name] = [parse_value(value) for value in values.split(",")]
+    return grid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parameter sweeps of the simulations over a process pool")
+    parser.add_argument("simulation", choices=sorted(SIMULATIONS))
+    parser.add_argument("--grid", nargs="+", default=[], metavar="NAME=V1,V2,...")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=None, help="default: one per core")
+    parser.add_argument("--output", help="write the table to this CSV file")
+    args = parser.parse_args(argv)
+
+    rows = run_ensemble(args.simulation, parse_grid(args.grid), args.steps, args.processes)
+    print_table(rows)
+    if args.output:
+        write_csv(rows, args.output)
+    return rows
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
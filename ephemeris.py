@@ -0,0 +1,267 @@
+import argparse
+import copy
+import hashlib
+import json
+import sys
+
+import numpy as np
+from numpy.polynomial import chebyshev
+
+import Simulation_planete
+
+# Chebyshev ephemerides of a planet system.
+# The system is integrated once; the trajectory of each body is then cut into segments of equal
+# duration and each coordinate is fitted by a Chebyshev polynomial on every segment. Each body gets
+# the longest segment (among max_segment_steps, max_segment_steps / 2, ...) for which the fit stays
+# within `tolerance` (metres) of the integrated positions. Positions and velocities (derivative of
+# the polynomials) at any time of the covered range then cost one segment lookup and one Clenshaw
+# recurrence per body, whatever the time: jumping, rewinding and time-warping are free.
+#
+#   python ephemeris.py build solar.npz --years 100 --integrator verlet
+#   python ephemeris.py info solar.npz
+#   python Simulation_planete.py --ephemeris solar.npz
+
+DEFAULT_DEGREE = 12
+DEFAULT_TOLERANCE = 1e5 # Metres (about 1/1500 of a pixel at the default scale)
+MAX_SEGMENT_STEPS = 512 # Longest segment tried, in timesteps (a power of two)
+YEAR = 365.25 * 86400
+
+
+class Ephemeris:
+    # coefficients: (total segments, degree + 1, 2), the segments of body b being
+    # coefficients[offsets[b]:offsets[b] + counts[b]], each lasting durations[b] seconds from start
+    def __init__(self, start, end, durations, offsets, counts, coefficients, tolerance, max_error=None):
+        self.start = float(start)
+        self.end = float(end)
+        self.durations = np.asarray(durations, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.derivatives = chebyshev.chebder(self.coefficients, axis=1)
+        self.tolerance = tolerance
+        self.max_error = max_error
+        self.key = None # Inputs it was built from (see cache_key)
+
+    @property
+    def n_bodies(self):
+        return len(self.durations)
+
+    @property
+    def degree(self):
+        return self.coefficients.shape[1] - 1
+
+    def _segments(self, times):
+        # Segment index (into coefficients) and local abscissa in [-1, 1], shapes (len(times), n)
+        times = np.asarray(times, dtype=float)
+        if times.size and (times.min() < self.start or times.max() > self.end):
+            raise ValueError(f"time outside the ephemeris range [{self.start}, {self.end}]")
+        elapsed = times[..., None] - self.start
+        k = np.minimum((elapsed // self.durations).astype(np.int64), self.counts - 1)
+        x = 2 * (elapsed - k * self.durations) / self.durations - 1
+        return self.offsets + k, x
+
+    @staticmethod
+    def _clenshaw(coefficients, x):
+        # Chebyshev series of coefficients (..., degree + 1, 2) at x (...), vectorized
+        b1 = b2 = np.zeros(coefficients.shape[:-2] + (2,))
+        for j in range(coefficients.shape[-2] - 1, 0, -1):
+            b1, b2 = 2 * x[..., None] * b1 - b2 + coefficients[..., j, :], b1
+        return x[..., None] * b1 - b2 + coefficients[..., 0, :]
+
+    def positions(self, times):
+        # Positions (n, 2) at a time, or (len(times), n, 2) for an array of times
+        segment, x = self._segments(times)
+        return self._clenshaw(self.coefficients[segment], x)
+
+    def velocities(self, times):
+        segment, x = self._segments(times)
+        return self._clenshaw(self.derivatives[segment], x) * (2 / self.durations[:, None])
+
+    def state(self, time):
+        # (x, y, x_vel, y_vel) rows, like PlanetSystem.state()
+        segment, x = self._segments(time)
+        return np.hstack((self._clenshaw(self.coefficients[segment], x),
+                          self._clenshaw(self.derivatives[segment], x) * (2 / self.durations[:, None])))
+
+    # --- Files ---
+
+    def save(self, path, key=None):
+        meta = {"start": self.start, "end": self.end, "tolerance": self.tolerance, "max_error": self.max_error,
+                "key": key}
+        with open(path, "wb") as f:
+            np.savez(f, durations=self.durations, offsets=self.offsets, counts=self.counts,
+                     coefficients=self.coefficients, meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            ephemeris = cls(meta["start"], meta["end"], data["durations"], data["offsets"], data["counts"],
+                            data["coefficients"], meta["tolerance"], meta["max_error"])
+        ephemeris.key = meta["key"]
+        return ephemeris
+
+
+class Scrubber:
+    # View time over an ephemeris, driven by the keyboard: RIGHT / LEFT play forwards / backwards,
+    # UP / DOWN double / halve the speed, SPACE pauses, HOME / END jump to the start / end.
+    # The speed (warp) is in timesteps of simulated time per frame.
+    def __init__(self, ephemeris, timestep, warp=1.0):
+        self.ephemeris = ephemeris
+        self.timestep = timestep
+        self.time = ephemeris.start
+        self.warp = warp
+        self.paused = False
+
+    def handle_event(self, event):
+        import pygame
+        if event.type != pygame.KEYDOWN:
+            return
+        if event.key == pygame.K_RIGHT:
+            self.warp = abs(self.warp)
+        elif event.key == pygame.K_LEFT:
+            self.warp = -abs(self.warp)
+        elif event.key == pygame.K_UP:
+            self.warp *= 2
+        elif event.key == pygame.K_DOWN:
+            self.warp /= 2
+        elif event.key == pygame.K_SPACE:
+            self.paused = not self.paused
+        elif event.key == pygame.K_HOME:
+            self.time = self.ephemeris.start
+        elif event.key == pygame.K_END:
+            self.time = self.ephemeris.end
+
+    def advance(self):
+        # Moves the view time by one frame and returns the state there
+        if not self.paused:
+            self.time = min(max(self.time + self.warp * self.timestep, self.ephemeris.start), self.ephemeris.end)
+        return self.ephemeris.state(self.time)
+
+    def trails(self, length):
+        # Positions (length, n, 2) at the last `length` timesteps before the view time
+        times = self.time - self.timestep * np.arange(length - 1, -1, -1)
+        return self.ephemeris.positions(times[times >= self.ephemeris.start])
+
+    def caption(self):
+        state = "pause" if self.paused else f"x{self.warp:g}"
+        return f"Simulation des Lois de Kepler - {self.time / YEAR:.2f} ans ({state})"
+
+
+def fit(samples, steps, degree):
+    # Chebyshev coefficients of consecutive segments of `steps` timesteps (sharing their ends) and
+    # the largest fit error of each body. samples: (n_steps + 1, n, 2), n_steps multiple of steps.
+    # Returns coefficients (n_segments, n, degree + 1, 2) and errors (n,).
+    n_segments = (len(samples) - 1) // steps
+    vander = chebyshev.chebvander(np.linspace(-1, 1, steps + 1), degree)
+    index = np.arange(n_segments)[:, None] * steps + np.arange(steps + 1)
+    values = samples[index] # (n_segments, steps + 1, n, 2)
+    coefficients = np.einsum("ds,ksnc->kndc", np.linalg.pinv(vander), values)
+    errors = np.abs(np.einsum("sd,kndc->ksnc", vander, coefficients) - values).max(axis=(0, 1, 3))
+    return coefficients, errors
+
+
+def build(system, duration, degree=DEFAULT_DEGREE, tolerance=DEFAULT_TOLERANCE, max_segment_steps=MAX_SEGMENT_STEPS):
+    # Integrates a copy of system over at least `duration` seconds and fits its ephemeris
+    minimum = degree + 1 # Steps per segment: at least one sample more than coefficients
+    candidates = [max_segment_steps >> k for k in range(max_segment_steps.bit_length())
+                  if max_segment_steps >> k >= minimum]
+    if not candidates:
+        raise ValueError(f"max_segment_steps must be at least {minimum} for degree {degree}")
+    n_steps = -(-int(np.ceil(duration / system.timestep)) // candidates[0]) * candidates[0]
+
+    integration = Simulation_planete.PlanetSystem.from_arrays(system.positions, system.velocities, system.masses,
+                                                       system.fixed, timestep=system.timestep, solver=system.solver,
+                                                       integrator=copy.deepcopy(system.integrator))
+    integration.time = system.time
+    samples = np.empty((n_steps + 1,) + system.positions.shape)
+    samples[0] = integration.positions
+    for step in range(1, n_steps + 1):
+        integration.step()
+        samples[step] = integration.positions
+
+    # Longest segments first; a body keeps the first length whose fit is within tolerance
+    n = len(system.masses)
+    steps_of = np.zeros(n, dtype=np.int64)
+    errors = np.full(n, np.inf)
+    per_body = [None] * n
+    remaining = np.arange(n)
+    for steps in candidates:
+        coefficients, error = fit(samples[:, remaining], steps, degree)
+        accepted = (error <= tolerance) | (steps == candidates[-1])
+        for column, body in zip(np.nonzero(accepted)[0].tolist(), remaining[accepted].tolist()):
+            steps_of[body], errors[body], per_body[body] = steps, error[column], coefficients[:, column]
+        remaining = remaining[~accepted]
+        if len(remaining) == 0:
+            break
+    if errors.max() > tolerance:
+        worst = int(errors.argmax())
+        raise ValueError(f"body {worst}: fit error {errors[worst]:.3g} m above the tolerance {tolerance:.3g} m "
+                         f"even with segments of {candidates[-1]} steps; raise the degree or lower the timestep")
+
+    counts = np.array([len(c) for c in per_body], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return Ephemeris(system.time, system.time + n_steps * system.timestep, steps_of * system.timestep, offsets, counts,
+                     np.concatenate(per_body), tolerance, float(errors.max()))
+
+
+def cache_key(system, duration, degree, tolerance, max_segment_steps):
+    # Identifies the inputs of an ephemeris: initial state, physics and fit settings
+    digest = hashlib.sha1()
+    for array in (system.positions, system.velocities, system.masses, system.fixed):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update(json.dumps([system.time, system.timestep, type(system.integrator).__name__,
+                              type(system.solver).__name__, duration, degree, tolerance, max_segment_steps]).encode())
+    return digest.hexdigest()
+
+
+def cached(system, duration, path, degree=DEFAULT_DEGREE, tolerance=DEFAULT_TOLERANCE,
+           max_segment_steps=MAX_SEGMENT_STEPS):
+    # Ephemeris from the cache file if it was built from the same inputs, built and saved otherwise
+    key = cache_key(system, duration, degree, tolerance, max_segment_steps)
+    try:
+        ephemeris = Ephemeris.load(path)
+        if ephemeris.key == key:
+            return ephemeris
+    except (OSError, ValueError, KeyError):
+        pass
+    ephemeris = build(system, duration, degree, tolerance, max_segment_steps)
+    ephemeris.key = key
+    ephemeris.save(path, key)
+    return ephemeris
+
+
+# --- Command line ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chebyshev ephemerides of the planet simulation")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="integrate a system and fit its ephemeris")
+    build_parser.add_argument("path")
+    build_parser.add_argument("--years", type=float, required=True)
+    build_parser.add_argument("--integrator", default="euler")
+    build_parser.add_argument("--scene", help="scene file (scenes.py) instead of the solar system")
+    build_parser.add_argument("--degree", type=int, default=DEFAULT_DEGREE)
+    build_parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="metres")
+    build_parser.add_argument("--max-segment-steps", type=int, default=MAX_SEGMENT_STEPS)
+    info_parser = commands.add_parser("info", help="describe an ephemeris file")
+    info_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        if args.scene is not None:
+            import scenes
+            system = scenes.load(args.scene, "planete")
+        else:
+            system = Simulation_planete.PlanetSystem(Simulation_planete.create_solar_system(), integrator=args.integrator)
+        ephemeris = cached(system, args.years * YEAR, args.path, args.degree, args.tolerance, args.max_segment_steps)
+    else:
+        ephemeris = Ephemeris.load(args.path)
+    print(f"{args.path}: {ephemeris.n_bodies} bodies, {ephemeris.start / YEAR:.2f} to {ephemeris.end / YEAR:.2f} years, "
+          f"degree {ephemeris.degree}, {len(ephemeris.coefficients)} segments, "
+          f"max fit error {ephemeris.max_error:.3g} m (tolerance {ephemeris.tolerance:.3g} m)")
+    print("segment length per body (days): " + ", ".join(f"{d / 86400:g}" for d in ephemeris.durations))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,273 @@
+import numpy as np
+
+import kernels
+
+# Gravitational accelerations for many bodies at once.
+# Direct summation, a_i = G * sum_j m_j * (r_j - r_i) / |r_j - r_i|^3 : no trigonometry,
+# computed in (targets x sources) tiles so that the temporary arrays stay bounded
+# (TILE_SIZE**2 * dim floats) whatever the number of bodies.
+
+TILE_SIZE = 512
+
+
+def direct_accelerations(positions, masses, G, targets=None, tile_size=TILE_SIZE, softening=0.0):
+    # positions: (n, dim) array, masses: (n,) array
+    # targets: optional indices of the bodies whose acceleration is wanted (default: all)
+    positions = np.asarray(positions, dtype=float)
+    masses = np.asarray(masses, dtype=float)
+    if targets is None:
+        targets = np.arange(len(positions))
+    targets = np.asarray(targets)
+    result = np.zeros((len(targets), positions.shape[1]))
+    softening_sq = softening * softening
+
+    for t_start in range(0, len(targets), tile_size):
+        target_pos = positions[targets[t_start:t_start + tile_size]]
+        acc = result[t_start:t_start + tile_size]
+        for s_start in range(0, len(positions), tile_size):
+            source_pos = positions[s_start:s_start + tile_size]
+            source_mass = masses[s_start:s_start + tile_size]
+
+            # Separation vectors, one (targets, sources) array per axis
+            d = [source_pos[None, :, k] - target_pos[:, None, k] for k in range(positions.shape[1])]
+            r_sq = np.full(d[0].shape, softening_sq)
+            for d_k in d:
+                r_sq += d_k * d_k
+            # A body does not attract itself (and coincident bodies are ignored, as in Planet.attraction)
+            with np.errstate(divide="ignore"):
+                weight = source_mass / (r_sq * np.sqrt(r_sq))
+            weight[r_sq == 0] = 0.0
+            for k, d_k in enumerate(d):
+                acc[:, k] += (weight * d_k).sum(axis=1)
+
+    result *= G
+    return result
+
+
+# --- Barnes-Hut ---
+# Quadtree approximation in O(n log n): a distant cell (size / distance < theta) acts as a
+# single body at its centre of mass. The tree is built from Morton keys and both its
+# construction and its traversal are vectorized level by level, so no Python recursion
+# happens per body. theta = 0 opens every cell and gives back the direct sum.
+
+MORTON_BITS = 21  # Tree depth limit (cells per axis: 2**MORTON_BITS)
+LEAF_SIZE = 8  # A cell holding at most this many bodies is not split further
+TARGET_CHUNK = 1024  # Leaves whose tree walk is done together (bounds memory)
+
+
+def _spread_bits(v):
+    # Inserts a 0 bit between the bits of v (uint64, up to 32 significant bits)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+def _range_sums(values, starts, ends):
+    # Exact sums of values[start:end] for each (start, end) pair, end > start
+    padded = np.concatenate((values, np.zeros((1,) + values.shape[1:])))
+    bounds = np.empty(2 * len(starts), dtype=np.int64)
+    bounds[0::2] = starts
+    bounds[1::2] = ends
+    return np.add.reduceat(padded, bounds, axis=0)[0::2]
+
+
+class QuadTree:
+    def __init__(self, positions, masses, leaf_size=LEAF_SIZE):
+        positions = np.asarray(positions, dtype=float)
+        masses = np.asarray(masses, dtype=float)
+        n = len(positions)
+
+        # Root square, then integer grid coordinates and Morton keys
+        low = positions.min(axis=0)
+        width = float((positions.max(axis=0) - low).max()) * (1 + 1e-9) or 1.0
+        cells = 1 << MORTON_BITS
+        grid = np.minimum(((positions - low) / width * cells).astype(np.int64), cells - 1)
+        keys = _spread_bits(grid[:, 0].astype(np.uint64)) | (_spread_bits(grid[:, 1].astype(np.uint64)) << np.uint64(1))
+
+        self.order = np.argsort(keys, kind="stable")
+        self.positions = positions[self.order]
+        self.masses = masses[self.order]
+        keys = keys[self.order]
+        grid = grid[self.order]
+
+        # Level-by-level construction: nodes of one level are contiguous in the node arrays,
+        # and the children of a node are contiguous in the next level
+        starts, ends, sizes, levels = [np.array([0])], [np.array([n])], [np.array([width])], [np.array([0])]
+        first_child, child_count = [], []
+        current_start, current_end = starts[0], ends[0]
+        node_offset = 1
+        level = 0
+        while True:
+            counts = current_end - current_start
+            internal = (counts > leaf_size) & (level < MORTON_BITS)
+            fc = np.full(len(current_start), -1, dtype=np.int64)
+            cc = np.zeros(len(current_start), dtype=np.int64)
+            if not internal.any():
+                first_child.append(fc)
+                child_count.append(cc)
+                break
+
+            # Bodies of the internal nodes, split by their key prefix at the next level
+            p_start, p_end = current_start[internal], current_end[internal]
+            lengths = p_end - p_start
+            body = np.repeat(p_start - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            prefix = keys[body] >> np.uint64(2 * (MORTON_BITS - level - 1))
+            new_run = np.ones(len(body), dtype=bool)
+            new_run[1:] = (prefix[1:] != prefix[:-1]) | (body[1:] != body[:-1] + 1)
+            run_start = body[new_run]
+            run_end = np.append(body[np.nonzero(new_run)[0][1:] - 1], body[-1]) + 1
+
+            # Link each internal node to its contiguous block of children
+            first = np.searchsorted(run_start, p_start)
+            last = np.searchsorted(run_start, p_end)
+            fc[internal] = node_offset + first
+            cc[internal] = last - first
+            first_child.append(fc)
+            child_count.append(cc)
+
+            level += 1
+            node_offset += len(run_start)
+            starts.append(run_start)
+            ends.append(run_end)
+            sizes.append(np.full(len(run_start), width / (1 << level)))
+            levels.append(np.full(len(run_start), level))
+            current_start, current_end = run_start, run_end
+
+        self.start = np.concatenate(starts)
+        self.end = np.concatenate(ends)
+        self.size = np.concatenate(sizes)
+        self.first_child = np.concatenate(first_child)
+        self.child_count = np.concatenate(child_count)
+
+        # Mass, centre of mass and square of every node
+        self.mass = _range_sums(self.masses, self.start, self.end)
+        weighted = _range_sums(self.positions * self.masses[:, None], self.start, self.end)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.com = np.where(self.mass[:, None] > 0, weighted / self.mass[:, None],
+                                self.positions[self.start])
+        level_of = np.concatenate(levels)
+        self.box_low = low + (grid[self.start] >> (MORTON_BITS - level_of)[:, None]) * self.size[:, None]
+
+    def accelerations(self, G, theta, softening=0.0, chunk=TARGET_CHUNK):
+        # Accelerations of every body (in the original order).
+        # The walk is done per leaf rather than per body: all bodies of a leaf share the same
+        # interaction list, and a cell is accepted only if it is far enough from the whole leaf.
+        n = len(self.positions)
+        result = np.zeros((n, 2))
+        theta_sq = theta * theta
+        softening_sq = softening * softening
+        leaves = np.nonzero(self.first_child < 0)[0]
+
+        for c_start in range(0, len(leaves), chunk):
+            group = leaves[c_start:c_start + chunk]
+            node = np.zeros(len(group), dtype=np.int64)
+            while len(group):
+                # Distance from the cell's centre of mass to the nearest point of the leaf's square
+                g_low = self.box_low[group]
+                g_high = g_low + self.size[group][:, None]
+                com = self.com[node]
+                gap = np.maximum(g_low - com, 0) + np.maximum(com - g_high, 0)
+                r_sq = (gap * gap).sum(axis=1)
+                size = self.size[node]
+                # A cell containing the leaf (itself or an ancestor) must always be opened
+                inside = ((g_low >= self.box_low[node]) & (g_low < self.box_low[node] + size[:, None])).all(axis=1)
+                leaf = self.first_child[node] < 0
+                accept = ~inside & (size * size < theta_sq * r_sq)
+
+                # Far cells: one monopole interaction for each body of the leaf
+                if accept.any():
+                    body, source = self._expand(group[accept], node[accept])
+                    d = self.com[source] - self.positions[body]
+                    self._accumulate(result, body, d, self.mass[source], softening_sq)
+
+                # Leaves that are too close: direct sum over their bodies
+                near_leaf = ~accept & leaf
+                if near_leaf.any():
+                    body, source_leaf = self._expand(group[near_leaf], node[near_leaf])
+                    counts = self.end[source_leaf] - self.start[source_leaf]
+                    target = np.repeat(body, counts)
+                    source = np.repeat(self.start[source_leaf] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+                    other = source != target
+                    target, source = target[other], source[other]
+                    d = self.positions[source] - self.positions[target]
+                    self._accumulate(result, target, d, self.masses[source], softening_sq)
+
+                # Internal cells that are too close: walk down to their children
+                opened = ~accept & ~leaf
+                og, on = group[opened], node[opened]
+                counts = self.child_count[on]
+                group = np.repeat(og, counts)
+                node = np.repeat(self.first_child[on] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+        result *= G
+        unsorted = np.empty_like(result)
+        unsorted[self.order] = result
+        return unsorted
+
+    def _expand(self, group, node):
+        # (leaf, cell) pairs -> (body of the leaf, cell) pairs
+        counts = self.end[group] - self.start[group]
+        body = np.repeat(self.start[group] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return body, np.repeat(node, counts)
+
+    @staticmethod
+    def _accumulate(acc, index, d, mass, softening_sq):
+        r_sq = (d * d).sum(axis=1) + softening_sq
+        with np.errstate(divide="ignore"):
+            weight = mass / (r_sq * np.sqrt(r_sq))
+        weight[r_sq == 0] = 0.0
+        for k in range(2):
+            acc[:, k] += np.bincount(index, weights=weight * d[:, k], minlength=len(acc))
+
+
+def barnes_hut_accelerations(positions, masses, G, theta=0.5, leaf_size=LEAF_SIZE, softening=0.0):
+    return QuadTree(positions, masses, leaf_size).accelerations(G, theta, softening)
+
+
+# Solvers usable by PlanetSystem: callables (positions, masses, G, targets=None) -> accelerations
+class DirectSolver:
+    def __init__(self, tile_size=TILE_SIZE, softening=0.0):
+        self.tile_size = tile_size
+        self.softening = softening
+
+    def __call__(self, positions, masses, G, targets=None):
+        if kernels.ENABLED:
+            targets = np.arange(len(positions)) if targets is None else np.asarray(targets, dtype=np.int64)
+            return kernels.direct_gravity(np.asarray(positions, dtype=float), np.asarray(masses, dtype=float),
+                                          G, targets, self.softening)
+        return direct_accelerations(positions, masses, G, targets, self.tile_size, self.softening)
+
+
+class BarnesHutSolver:
+    def __init__(self, theta=0.5, leaf_size=LEAF_SIZE, softening=0.0):
+        self.theta = theta  # Opening angle: larger is faster but less accurate
+        self.leaf_size = leaf_size
+        self.softening = softening
+
+    def __call__(self, positions, masses, G, targets=None):
+        # The tree is rebuilt for every call: all bodies are computed, then the targets are selected
+        acc = barnes_hut_accelerations(positions, masses, G, self.theta, self.leaf_size, self.softening)
+        return acc if targets is None else acc[targets]
+
+
+def force_error(positions, masses, G, solver, sample=1000, seed=0):
+    # Relative acceleration error of `solver` against the direct sum, on a random sample of bodies.
+    # Returns a dict of summary statistics (median, 99th percentile, max and RMS).
+    positions = np.asarray(positions, dtype=float)
+    masses = np.asarray(masses, dtype=float)
+    rng = np.random.default_rng(seed)
+    targets = np.sort(rng.choice(len(positions), size=min(sample, len(positions)), replace=False))
+
+    approx = solver(positions, masses, G)[targets]
+    exact = direct_accelerations(positions, masses, G, targets=targets)
+    norm = np.linalg.norm(exact, axis=1)
+    error = np.linalg.norm(approx - exact, axis=1) / np.where(norm > 0, norm, 1.0)
+    return {
+        "median": float(np.median(error)),
+        "p99": float(np.percentile(error, 99)),
+        "max": float(error.max()),
+        "rms": float(np.sqrt((error ** 2).mean())),
+    }
@@ -0,0 +1,126 @@
+import numpy as np
+
+# Broad phase par grille uniforme (hachage spatial).
+# Chaque objet est inséré dans toutes les cellules que couvre sa boîte englobante (AABB).
+# Seules les paires dont les boîtes se chevauchent sont renvoyées : elles sont ensuite
+# confiées à la phase étroite (phase_etroite.py). Les boîtes sont celles du début de la phase :
+# World.phase_etroite rattrape, avec paires_avec, les paires mises en contact par une réponse.
+# Le remplissage de la grille et la recherche des paires sont vectorisés avec NumPy.
+
+
+# Taille de cellule = FACTEUR_CELLULE * côté moyen des boîtes englobantes
+FACTEUR_CELLULE = 1.0
+# paires_avec compare directement chaque corps demandé à toutes les boîtes en dessous de ce nombre de tests
+FORCE_BRUTE = 1 << 22
+
+
+def taille_cellule_auto(boites):
+    # Déduit la taille de cellule de l'étendue des objets : un objet typique couvre 1 à 4 cellules
+    if len(boites) == 0:
+        return 1.0
+    cotes = np.maximum(boites[:, 2] - boites[:, 0], boites[:, 3] - boites[:, 1])
+    return max(FACTEUR_CELLULE * float(cotes.mean()), 1e-6)
+
+
+class GrilleSpatiale:
+    def __init__(self, taille_cellule=None):
+        # Si taille_cellule vaut None, elle est recalculée à chaque appel à partir des objets
+        self.taille_cellule = taille_cellule
+
+    def taille(self, boites):
+        return self.taille_cellule if self.taille_cellule is not None else taille_cellule_auto(boites)
+
+    def paires_candidates(self, objets):
+        return self.paires_depuis_boites([objet.get_boite() for objet in objets])
+
+    def paires_depuis_boites(self, boites):
+        # boites : tableau (n, 4) de (xmin, ymin, xmax, ymax), dans l'ordre des objets
+        # Renvoie la liste des paires (i, j), i < j, triée comme la double boucle d'origine
+        boites = np.asarray(boites, dtype=float).reshape(-1, 4)
+        n = len(boites)
+        if n < 2:
+            return []
+        taille = self.taille(boites)
+        objet, cx, cy = entrees(boites, taille)
+
+        # Tri par cellule puis par objet : les occupants d'une cellule sont contigus et croissants
+        ordre = np.lexsort((objet, cy, cx))
+        cx, cy, objet = cx[ordre], cy[ordre], objet[ordre]
+
+        # Paires à l'intérieur de chaque cellule : entrées distantes de k dans le tableau trié
+        liste_i, liste_j, liste_cx, liste_cy = [], [], [], []
+        k = 1
+        while k < len(objet):
+            meme_cellule = (cx[k:] == cx[:-k]) & (cy[k:] == cy[:-k])
+            if not meme_cellule.any():
+                break
+            a = np.nonzero(meme_cellule)[0]
+            liste_i.append(objet[a])
+            liste_j.append(objet[a + k])
+            liste_cx.append(cx[a])
+            liste_cy.append(cy[a])
+            k += 1
+        if not liste_i:
+            return []
+        i, j = np.concatenate(liste_i), np.concatenate(liste_j)
+        pcx, pcy = np.concatenate(liste_cx), np.concatenate(liste_cy)
+
+        bi, bj = boites[i], boites[j]
+        chevauchent = ((bi[:, 0] < bj[:, 2]) & (bj[:, 0] < bi[:, 2]) &
+                       (bi[:, 1] < bj[:, 3]) & (bj[:, 1] < bi[:, 3]))
+        # Une paire peut partager plusieurs cellules : on ne la garde que dans la cellule
+        # qui contient le coin minimal de l'intersection des deux boîtes (pas de doublon)
+        coin_x = np.floor(np.maximum(bi[:, 0], bj[:, 0]) / taille).astype(np.int64)
+        coin_y = np.floor(np.maximum(bi[:, 1], bj[:, 1]) / taille).astype(np.int64)
+        garder = chevauchent & (coin_x == pcx) & (coin_y == pcy)
+        i, j = i[garder], j[garder]
+
+        # Même ordre que la double boucle i < j d'origine (résultat déterministe)
+        ordre = np.lexsort((j, i))
+        return list(zip(i[ordre].tolist(), j[ordre].tolist()))
+
+    def paires_avec(self, boites, corps):
+        # Paires (i, j), i < j, triées, de boîtes qui se chevauchent dont au moins un corps est parmi
+        # les indices corps. Peu de corps : comparés à toutes les boîtes ; sinon seuls les corps qui
+        # partagent une cellule avec l'un d'eux sont confiés à paires_depuis_boites
+        boites = np.asarray(boites, dtype=float).reshape(-1, 4)
+        corps = np.unique(np.asarray(corps, dtype=np.int64))
+        if len(corps) == 0 or len(boites) < 2:
+            return []
+        if len(corps) * len(boites) <= FORCE_BRUTE:
+            a = boites[corps][:, None, :]
+            chevauchent = ((a[..., 0] < boites[:, 2]) & (boites[:, 0] < a[..., 2]) &
+                           (a[..., 1] < boites[:, 3]) & (boites[:, 1] < a[..., 3]))
+            ligne, autre = np.nonzero(chevauchent)
+            i, j = corps[ligne], autre
+            i, j = np.minimum(i, j)[i != j], np.maximum(i, j)[i != j]
+            cles = np.unique(i * len(boites) + j)
+            return list(zip((cles // len(boites)).tolist(), (cles % len(boites)).tolist()))
+        objet, cx, cy = entrees(boites, self.taille(boites))
+        hauteur = int(cy.max() - cy.min()) + 1
+        cles = cx * hauteur + (cy - cy.min())
+        marque = np.zeros(len(boites), dtype=bool)
+        marque[corps] = True
+        voisins = np.unique(objet[np.isin(cles, cles[marque[objet]])])
+        paires = np.array(self.paires_depuis_boites(boites[voisins]), dtype=np.int64).reshape(-1, 2)
+        i, j = voisins[paires[:, 0]], voisins[paires[:, 1]]
+        garder = marque[i] | marque[j]
+        return list(zip(i[garder].tolist(), j[garder].tolist()))
+
+
+def entrees(boites, taille):
+    # Une entrée (objet, cx, cy) par cellule couverte par chaque boîte
+    cellules = np.floor(boites / taille).astype(np.int64)
+    nb_x = cellules[:, 2] - cellules[:, 0] + 1
+    nb_y = cellules[:, 3] - cellules[:, 1] + 1
+    nb = nb_x * nb_y
+    objet = np.repeat(np.arange(len(boites)), nb)
+    local = np.arange(int(nb.sum())) - np.repeat(np.cumsum(nb) - nb, nb)
+    cx = cellules[objet, 0] + local // nb_y[objet]
+    cy = cellules[objet, 1] + local % nb_y[objet]
+    return objet, cx, cy
+
+
+# Référence O(n²) : toutes les paires i < j (utile pour comparer avec la grille)
+def toutes_les_paires(objets):
+    return [(i, j) for i in range(len(objets)) for j in range(i + 1, len(objets))]
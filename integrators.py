@@ -0,0 +1,173 @@
+import numpy as np
+
+import kernels
+
+# Time integrators shared by the planet system and the 2D world.
+# Every integrator advances (positions, velocities) in place by dt, given a function
+# acceleration(positions) -> accelerations. Symplectic schemes (leapfrog, Yoshida) keep
+# the energy error bounded, which allows much larger timesteps for the same drift.
+
+
+class SemiImplicitEuler:
+    # v += a dt ; x += v dt  (the scheme used originally) - 1 force evaluation per step
+    order = 1
+
+    def step(self, positions, velocities, acceleration, dt):
+        if kernels.ENABLED:
+            kernels.semi_implicit_euler(positions, velocities, np.asarray(acceleration(positions), dtype=float), dt)
+            return
+        velocities += acceleration(positions) * dt
+        positions += velocities * dt
+
+    def reset(self):
+        pass
+
+
+class VelocityVerlet:
+    # Kick-drift-kick leapfrog, 2nd order and symplectic. The acceleration at the end of a
+    # step is reused at the start of the next one, so it costs 1 force evaluation per step.
+    order = 2
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._positions = None
+        self._acceleration = None
+
+    def _initial_acceleration(self, positions, acceleration):
+        # The cached value is only valid if nobody moved the bodies since the last step
+        if self._positions is not None and np.array_equal(self._positions, positions):
+            return self._acceleration
+        return acceleration(positions)
+
+    def step(self, positions, velocities, acceleration, dt):
+        a = self._initial_acceleration(positions, acceleration)
+        velocities += a * (dt / 2)
+        positions += velocities * dt
+        a = acceleration(positions)
+        velocities += a * (dt / 2)
+        self._positions = positions.copy()
+        self._acceleration = a
+
+
+class Yoshida4:
+    # 4th order symplectic composition of three leapfrog steps (Yoshida 1990) - 3 force evaluations
+    order = 4
+    W1 = 1 / (2 - 2 ** (1 / 3))
+    W0 = -(2 ** (1 / 3)) * W1
+    DRIFT = (W1 / 2, (W0 + W1) / 2, (W0 + W1) / 2, W1 / 2)
+    KICK = (W1, W0, W1)
+
+    def step(self, positions, velocities, acceleration, dt):
+        for i, kick in enumerate(self.KICK):
+            positions += velocities * (self.DRIFT[i] * dt)
+            velocities += acceleration(positions) * (kick * dt)
+        positions += velocities * (self.DRIFT[3] * dt)
+
+    def reset(self):
+        pass
+
+
+class RK4:
+    # Classical 4th order Runge-Kutta (not symplectic) - 4 force evaluations
+    order = 4
+
+    def step(self, positions, velocities, acceleration, dt):
+        x0, v0 = positions.copy(), velocities.copy()
+        k1x, k1v = v0, acceleration(x0)
+        k2x = v0 + k1v * (dt / 2)
+        k2v = acceleration(x0 + k1x * (dt / 2))
+        k3x = v0 + k2v * (dt / 2)
+        k3v = acceleration(x0 + k2x * (dt / 2))
+        k4x = v0 + k3v * dt
+        k4v = acceleration(x0 + k3x * dt)
+        positions += (k1x + 2 * k2x + 2 * k3x + k4x) * (dt / 6)
+        velocities += (k1v + 2 * k2v + 2 * k3v + k4v) * (dt / 6)
+
+    def reset(self):
+        pass
+
+
+class BlockTimestep:
+    # Hierarchical block timesteps (kick-drift-kick leapfrog on power-of-two levels).
+    # Each body gets its own step dt / 2**level chosen from an acceleration criterion,
+    # dt_i = eta * |v_i| / |a_i| (a fraction of the orbital time scale): inner bodies substep,
+    # outer bodies take the full step, and forces are only evaluated for the bodies whose
+    # step ends. The acceleration function must accept acceleration(positions, targets).
+    order = 2
+
+    def __init__(self, eta=0.01, max_level=10):
+        self.eta = eta
+        self.max_level = max_level
+        self.force_evaluations = 0  # Number of per-body force evaluations done so far
+        self.reset()
+
+    def reset(self):
+        self._positions = None
+        self._acceleration = None
+        self.levels = None
+
+    def levels_for(self, velocities, acceleration, dt):
+        speed = np.linalg.norm(velocities, axis=1)
+        acc = np.linalg.norm(acceleration, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ideal = np.where(acc > 0, self.eta * speed / acc, np.inf)
+            levels = np.ceil(np.log2(dt / ideal))
+        return np.clip(np.nan_to_num(levels, nan=self.max_level), 0, self.max_level).astype(np.int64)
+
+    def step(self, positions, velocities, acceleration, dt):
+        n = len(positions)
+        if self._positions is None or len(self._positions) != n or not np.array_equal(self._positions, positions):
+            self._acceleration = acceleration(positions, None)
+            self.force_evaluations += n
+            self.levels = self.levels_for(velocities, self._acceleration, dt)
+        acc = self._acceleration
+        levels = self.levels
+        top = int(levels.max()) if n else 0
+        substeps = 1 << top
+        dt_min = dt / substeps
+
+        for s in range(substeps):
+            # Start of their step: first half kick
+            period = 1 << (top - levels)
+            starting = s % period == 0
+            velocities[starting] += acc[starting] * (dt / (1 << levels[starting]) / 2)[:, None]
+
+            positions += velocities * dt_min
+
+            # End of their step: new forces, second half kick, new level
+            ending = np.nonzero((s + 1) % period == 0)[0]
+            if len(ending) == 0:
+                continue
+            acc[ending] = acceleration(positions, ending)
+            self.force_evaluations += len(ending)
+            velocities[ending] += acc[ending] * (dt / (1 << levels[ending]) / 2)[:, None]
+
+            # A body may always move to a finer level, but only to a coarser one whose
+            # step boundary coincides with the current time; levels stay <= top in this step
+            wanted = np.minimum(self.levels_for(velocities[ending], acc[ending], dt), top)
+            aligned = (s + 1) % (1 << (top - wanted)) == 0
+            levels[ending] = np.where(aligned, wanted, levels[ending])
+
+        self._positions = positions.copy()
+
+
+INTEGRATORS = {
+    "euler": SemiImplicitEuler,
+    "verlet": VelocityVerlet,
+    "leapfrog": VelocityVerlet,
+    "yoshida4": Yoshida4,
+    "rk4": RK4,
+    "block": BlockTimestep,
+}
+
+
+def make_integrator(integrator):
+    # Accepts an integrator name (see INTEGRATORS) or an already built integrator
+    if isinstance(integrator, str):
+        try:
+            return INTEGRATORS[integrator]()
+        except KeyError:
+            raise ValueError(f"Unknown integrator {integrator!r}, expected one of {sorted(INTEGRATORS)}") from None
+    return integrator
@@ -0,0 +1,235 @@
+import argparse
+import math
+import sys
+
+import numpy as np
+
+import Simulation_planete
+from integrators import INTEGRATORS
+
+# Analytic two-body propagation around the sun of a planet system.
+# Each body is treated as a Kepler orbit around the central (fixed) body: its state is converted
+# to orbital elements, Kepler's equation is solved for all bodies at once by Newton's method, and
+# the state at the new time follows from the Lagrange f and g coefficients. A jump of any length
+# costs the same as one step.
+#
+# KeplerPropagator has the interface of the integrators (integrators.py). With encke=True the
+# other bodies' attraction is added back as an Encke correction: the deviation from the
+# analytic (osculating) orbit is integrated with leapfrog, and the reference orbit is reset to
+# the true state whenever the deviation grows too large.
+#
+#   python kepler.py check --years 10
+#   python Simulation_planete.py --kepler encke
+
+NEWTON_TOLERANCE = 1e-14 # Radians
+NEWTON_MAX_ITERATIONS = 50
+RECTIFY_RATIO = 1e-3 # Encke: reference orbit reset when |deviation| > RECTIFY_RATIO * |r|
+YEAR = 365.25 * 86400
+
+
+def solve_kepler(mean_anomaly, e):
+    # Eccentric anomaly E with E - e sin E = M, vectorized Newton iterations (e < 1)
+    mean_anomaly, e = np.broadcast_arrays(np.asarray(mean_anomaly, dtype=float), np.asarray(e, dtype=float))
+    E = mean_anomaly + 0.85 * e * np.sign(np.sin(mean_anomaly)) # Danby's starter
+    for _ in range(NEWTON_MAX_ITERATIONS):
+        delta = (E - e * np.sin(E) - mean_anomaly) / (1 - e * np.cos(E))
+        E = E - delta
+        if np.all(np.abs(delta) <= NEWTON_TOLERANCE):
+            break
+    return E
+
+
+def elements(positions, velocities, mu):
+    # Orbital elements of states relative to the central body, as a dict of arrays:
+    # a (semi-major axis), e (eccentricity), omega (argument of periapsis), E and M (eccentric and
+    # mean anomalies), n (mean motion), period, h (specific angular momentum, sign = direction)
+    positions, velocities = np.atleast_2d(positions), np.atleast_2d(velocities)
+    r = np.linalg.norm(positions, axis=1)
+    v2 = (velocities ** 2).sum(axis=1)
+    rv = (positions * velocities).sum(axis=1)
+    energy = v2 / 2 - mu / r
+    if np.any(energy >= 0):
+        raise ValueError("unbound body: the Kepler propagator only handles elliptic orbits")
+    a = -mu / (2 * energy)
+    e_cos = 1 - r / a # e cos E
+    e_sin = rv / np.sqrt(mu * a) # e sin E
+    e_vector = ((v2 - mu / r)[:, None] * positions - rv[:, None] * velocities) / mu
+    E = np.arctan2(e_sin, e_cos)
+    n = np.sqrt(mu / a ** 3)
+    return {
+        "a": a,
+        "e": np.hypot(e_cos, e_sin),
+        "omega": np.arctan2(e_vector[:, 1], e_vector[:, 0]),
+        "E": E,
+        "M": E - e_sin,
+        "n": n,
+        "period": 2 * math.pi / n,
+        "h": positions[:, 0] * velocities[:, 1] - positions[:, 1] * velocities[:, 0],
+    }
+
+
+def propagate(positions, velocities, mu, dt):
+    # States relative to the central body after dt (scalar or per body), by Kepler's equation
+    positions, velocities = np.atleast_2d(positions), np.atleast_2d(velocities)
+    el = elements(positions, velocities, mu)
+    a, e, n = el["a"], el["e"], el["n"]
+    # Whole periods removed: the anomalies stay small whatever the jump
+    dt = np.asarray(dt, dtype=float)
+    dt = dt - el["period"] * np.floor(dt / el["period"])
+    dE = solve_kepler(el["M"] + n * dt, e) - el["E"]
+
+    r0 = np.linalg.norm(positions, axis=1)
+    rv = (positions * velocities).sum(axis=1)
+    sqrt_mu_a = np.sqrt(mu * a)
+    cos_dE, sin_dE = np.cos(dE), np.sin(dE)
+    r = a + (r0 - a) * cos_dE + rv * np.sqrt(a / mu) * sin_dE
+    f = 1 - a / r0 * (1 - cos_dE)
+    g = dt - (dE - sin_dE) / n
+    f_dot = -sqrt_mu_a / (r * r0) * sin_dE
+    g_dot = 1 - a / r * (1 - cos_dE)
+    return (f[:, None] * positions + g[:, None] * velocities,
+            f_dot[:, None] * positions + g_dot[:, None] * velocities)
+
+
+class KeplerPropagator:
+    # Integrator (see integrators.py) propagating every body but `central` on its Kepler orbit of
+    # parameter mu = G * M_central; the central body does not move (like the fixed sun)
+    order = None # Exact for the two-body problem
+
+    def __init__(self, mu=None, central=0, encke=False, rectify=RECTIFY_RATIO):
+        self.mu = mu
+        self.central = central
+        self.encke = encke
+        self.rectify = rectify
+        self.reset()
+
+    @classmethod
+    def for_system(cls, system, encke=False):
+        # Propagator around the sun (fixed body) of a PlanetSystem
+        if system.sun_index is None:
+            raise ValueError("the Kepler propagator needs a central body (sun = True)")
+        return cls(Simulation_planete.G * system.masses[system.sun_index], system.sun_index, encke)
+
+    def reset(self):
+        self._positions = None # State at the end of the last step (to detect outside changes)
+        # Encke: osculating reference orbit relative to the central body, and deviation from it
+        self._reference_positions = None
+        self._reference_velocities = None
+        self._deviation_positions = None
+        self._deviation_velocities = None
+        self._deviation_acceleration = None
+
+    def _bodies(self, positions):
+        moving = np.ones(len(positions), dtype=bool)
+        moving[self.central] = False
+        return moving
+
+    def step(self, positions, velocities, acceleration, dt):
+        moving = self._bodies(positions)
+        centre = positions[self.central]
+        if not self.encke:
+            positions[moving], velocities[moving] = propagate(positions[moving] - centre, velocities[moving], self.mu, dt)
+            positions[moving] += centre
+            self._positions = positions.copy()
+            return
+
+        if self._positions is None or not np.array_equal(self._positions, positions):
+            self._rectify(positions, velocities, acceleration)
+
+        # Leapfrog (kick-drift-kick) on the deviation, the reference moving analytically
+        deviation, deviation_velocity = self._deviation_positions, self._deviation_velocities
+        deviation_velocity += self._deviation_acceleration * (dt / 2)
+        deviation += deviation_velocity * dt
+        reference, reference_velocity = propagate(self._reference_positions, self._reference_velocities, self.mu, dt)
+        positions[moving] = centre + reference + deviation
+        self._deviation_acceleration = self._perturbation(positions, reference, acceleration)
+        deviation_velocity += self._deviation_acceleration * (dt / 2)
+        velocities[moving] = reference_velocity + deviation_velocity
+        self._reference_positions, self._reference_velocities = reference, reference_velocity
+
+        drift = np.linalg.norm(deviation, axis=1) > self.rectify * np.linalg.norm(reference, axis=1)
+        if drift.any():
+            self._rectify(positions, velocities, acceleration)
+        self._positions = positions.copy()
+
+    def _perturbation(self, positions, reference, acceleration):
+        # Acceleration of the deviation: true acceleration minus that of the reference orbit
+        moving = self._bodies(positions)
+        distance = np.linalg.norm(reference, axis=1)
+        return acceleration(positions)[moving] + self.mu * reference / distance[:, None] ** 3
+
+    def _rectify(self, positions, velocities, acceleration):
+        # The reference orbit becomes the osculating orbit of the current state
+        moving = self._bodies(positions)
+        reference = positions[moving] - positions[self.central]
+        self._reference_positions, self._reference_velocities = reference, velocities[moving].copy()
+        self._deviation_positions, self._deviation_velocities = np.zeros_like(reference), np.zeros_like(reference)
+        self._deviation_acceleration = self._perturbation(positions, reference, acceleration)
+
+
+def jump(system, dt):
+    # Advances a PlanetSystem by dt in one analytic step (two-body orbits around the sun)
+    KeplerPropagator.for_system(system).step(system.positions, system.velocities, None, dt)
+    system.integrator.reset()
+    system.time += dt
+
+
+# --- Check against the numerical integration ---
+
+PLANET_NAMES = ("mercury", "venus", "earth", "mars")
+
+
+def check(years, integrator="yoshida4", two_body=False):
+    # Solar system integrated numerically, and propagated analytically (one jump) and with Encke
+    # from the same initial state. two_body: massless planets, so that the numerical path is a pure
+    # Kepler problem. Prints the position differences and, for the numerical path, the drift of
+    # the semi-major axis (third law: constant period), eccentricity (first law) and angular
+    # momentum (second law: constant areal velocity).
+    duration_steps = int(round(years * YEAR / Simulation_planete.TIMESTEP))
+    systems = []
+    for _ in range(3):
+        system = Simulation_planete.PlanetSystem(Simulation_planete.create_solar_system(), integrator=integrator)
+        if two_body:
+            system.masses[~system.fixed] = 0.0
+        systems.append(system)
+    numerical, encke, analytic = systems
+    encke.integrator = KeplerPropagator.for_system(encke, encke=True)
+    mu = KeplerPropagator.for_system(analytic).mu
+    planets = ~numerical.fixed
+    initial = elements(numerical.positions[planets], numerical.velocities[planets], mu)
+
+    for _ in range(duration_steps):
+        numerical.step()
+        encke.step()
+    jump(analytic, duration_steps * Simulation_planete.TIMESTEP)
+    final = elements(numerical.positions[planets], numerical.velocities[planets], mu)
+
+    au = Simulation_planete.AU
+    print(f"after {years:g} years ({duration_steps} steps of {numerical.integrator.__class__.__name__}"
+          f"{', massless planets' if two_body else ''}):")
+    for k, name in enumerate(PLANET_NAMES, start=1):
+        analytic_gap = np.linalg.norm(analytic.positions[k] - numerical.positions[k]) / au
+        encke_gap = np.linalg.norm(encke.positions[k] - numerical.positions[k]) / au
+        print(f"{name:>8}: |kepler - numerical| {analytic_gap:.3e} AU, |encke - numerical| {encke_gap:.3e} AU")
+    print("numerical path:")
+    for k, name in enumerate(PLANET_NAMES):
+        da = final["a"][k] / initial["a"][k] - 1
+        de = final["e"][k] - initial["e"][k]
+        dh = final["h"][k] / initial["h"][k] - 1
+        print(f"{name:>8}: da/a {da:+.3e}, de {de:+.3e}, dh/h {dh:+.3e}")
+    return analytic, encke, numerical
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analytic Kepler propagation of the planet simulation")
+    commands = parser.add_subparsers(dest="command", required=True)
+    check_parser = commands.add_parser("check", help="compare with the numerical integration")
+    check_parser.add_argument("--years", type=float, default=10.0)
+    check_parser.add_argument("--integrator", default="yoshida4", choices=sorted(INTEGRATORS))
+    check_parser.add_argument("--two-body", action="store_true", help="massless planets (pure Kepler problem)")
+    args = parser.parse_args(argv)
+    check(args.years, args.integrator, args.two_body)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
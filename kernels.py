@@ -0,0 +1,206 @@
+import math
+import os
+import sys
+
+import numpy as np
+
+# Optional compiled kernels for the hot loops.
+# Each kernel is a plain loop over array-backed state. When Numba is installed, the kernels are
+# compiled with numba.njit and used instead of the NumPy / per-object code paths; otherwise (or
+# with PHYSICS_BACKEND=python) ENABLED is False and the original code runs unchanged.
+#
+#   python kernels.py    # checks that both backends give the same results
+#
+# Kernels:
+#   semi_implicit_euler  integrators.SemiImplicitEuler (World and PlanetSystem with "euler")
+#   circle_pairs         World.phase_etroite (phase_etroite.py) when every body is a Cercle
+#   direct_gravity       gravity.DirectSolver
+#   update_balls         Simulation_3D.integrate_balls (Ball.apply_gravity + Ball.update)
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKEND = "numba" if numba is not None and os.environ.get("PHYSICS_BACKEND", "numba") != "python" else "python"
+ENABLED = BACKEND == "numba"
+
+
+def jit(function):
+    # Compiled with Numba when available, left as interpreted Python otherwise
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+@jit
+def semi_implicit_euler(positions, velocities, accelerations, dt):
+    # v += a dt ; x += v dt, in place
+    for k in range(positions.shape[0]):
+        for d in range(positions.shape[1]):
+            velocities[k, d] += accelerations[k, d] * dt
+            positions[k, d] += velocities[k, d] * dt
+
+
+@jit
+def circle_pairs(positions, velocities, radii, masses, restitution, pairs_i, pairs_j, hulls, touching):
+    # Cercle.collision + Cercle.gestion_collision for each candidate pair, in order, on the state
+    # left by the previous pairs (the result of phase_etroite.phase_etroite). hulls: (n, 4) boxes
+    # grown to cover every position of the moved circles (phase_etroite.etendre). touching[k] is set
+    # for the colliding pairs; returns their number.
+    count = 0
+    for k in range(len(pairs_i)):
+        i = pairs_i[k]
+        j = pairs_j[k]
+        distance = math.sqrt((positions[j, 0] - positions[i, 0]) ** 2 + (positions[j, 1] - positions[i, 1]) ** 2)
+        if not distance < radii[i] + radii[j]:
+            continue
+        touching[k] = True
+        count += 1
+        if distance == 0:
+            continue
+        nx = (positions[j, 0] - positions[i, 0]) / distance
+        ny = (positions[j, 1] - positions[i, 1]) / distance
+        v1n = velocities[i, 0] * nx + velocities[i, 1] * ny
+        v2n = velocities[j, 0] * nx + velocities[j, 1] * ny
+        e = min(restitution[i], restitution[j])
+        m1 = masses[i]
+        m2 = masses[j]
+        v1n_new = (m1 * v1n + m2 * v2n + m2 * e * (v2n - v1n)) / (m1 + m2)
+        v2n_new = (m1 * v1n + m2 * v2n + m1 * e * (v1n - v2n)) / (m1 + m2)
+        velocities[i, 0] += (v1n_new - v1n) * nx
+        velocities[i, 1] += (v1n_new - v1n) * ny
+        velocities[j, 0] += (v2n_new - v2n) * nx
+        velocities[j, 1] += (v2n_new - v2n) * ny
+        overlap = 0.5 * (radii[i] + radii[j] - distance)
+        if overlap > 0:
+            positions[i, 0] -= overlap * nx
+            positions[i, 1] -= overlap * ny
+            positions[j, 0] += overlap * nx
+            positions[j, 1] += overlap * ny
+            for body in (i, j):
+                for d in range(2):
+                    low = positions[body, d] - radii[body]
+                    hulls[body, d] = min(hulls[body, d], low)
+                    hulls[body, d + 2] = max(hulls[body, d + 2], low + 2 * radii[body])
+    return count
+
+
+@jit
+def direct_gravity(positions, masses, G, targets, softening):
+    # Same sum as gravity.direct_accelerations, one target at a time
+    result = np.zeros((len(targets), positions.shape[1]))
+    softening_sq = softening * softening
+    for t in range(len(targets)):
+        i = targets[t]
+        for j in range(positions.shape[0]):
+            r_sq = softening_sq
+            for d in range(positions.shape[1]):
+                r_sq += (positions[j, d] - positions[i, d]) ** 2
+            if r_sq == 0:
+                continue
+            weight = masses[j] / (r_sq * math.sqrt(r_sq))
+            for d in range(positions.shape[1]):
+                result[t, d] += weight * (positions[j, d] - positions[i, d])
+    return result * G
+
+
+# Columns of the ball state array used by update_balls
+BALL_FIELDS = ("x", "y", "z", "vx", "vy", "vz", "ax", "ay", "az", "restitution")
+
+
+@jit
+def update_balls(state, dt, gravity, floor_z):
+    # Ball.apply_gravity then Ball.update for each row of state (columns: BALL_FIELDS)
+    for k in range(state.shape[0]):
+        state[k, 8] -= gravity * dt
+        for d in range(3):
+            state[k, 3 + d] += state[k, 6 + d] * dt
+        for d in range(3):
+            state[k, d] += state[k, 3 + d] * dt
+        if state[k, 2] <= floor_z:
+            state[k, 2] = floor_z
+            state[k, 5] *= -state[k, 9]
+            state[k, 3] *= 0.9
+            state[k, 4] *= 0.9
+            if abs(state[k, 5]) < 1:
+                state[k, 5] = 0
+                state[k, 8] = 0
+
+
+# --- Backend parity check ---
+
+def check_backends(n=200, steps=50, seed=0):
+    # Runs each kernel and the code path it replaces on the same random state and returns
+    # {kernel: max absolute difference}. Compiled kernels when Numba is installed, interpreted otherwise.
+    import kernels # The module the simulations read ENABLED from (this file may run as __main__)
+    import Simulation
+    import Simulation_3D
+    from gravity import direct_accelerations
+
+    rng = np.random.default_rng(seed)
+    differences = {}
+
+    positions = rng.uniform(0, 100, (n, 2))
+    velocities = rng.uniform(-10, 10, (n, 2))
+    accelerations = rng.uniform(-5, 5, (n, 2))
+    p, v = positions.copy(), velocities.copy()
+    for _ in range(steps):
+        semi_implicit_euler(p, v, accelerations, 0.01)
+        velocities += accelerations * 0.01
+        positions += velocities * 0.01
+    differences["semi_implicit_euler"] = max(np.abs(p - positions).max(), np.abs(v - velocities).max())
+
+    masses = rng.uniform(1, 10, n)
+    targets = np.arange(0, n, 3)
+    differences["direct_gravity"] = float(np.abs(direct_gravity(positions, masses, 1.5, targets, 0.1)
+                                                 - direct_accelerations(positions, masses, 1.5, targets, softening=0.1)).max())
+
+    def world():
+        w = Simulation.World(sol=Simulation.Sol(550, 50, Simulation.GRIS, 0.3))
+        for x, y, r, vx, vy in zip(rng.uniform(20, 780, n), rng.uniform(20, 500, n), rng.uniform(3, 12, n),
+                                   rng.uniform(-50, 50, n), rng.uniform(-50, 50, n)):
+            c = Simulation.Cercle(x, y, r, Simulation.NOIR, rng.uniform(0.2, 1.0))
+            c.vx, c.vy, c.ay = vx, vy, 98
+            w.ajouter(c)
+        return w
+
+    state = rng.bit_generator.state
+    worlds = []
+    enabled = kernels.ENABLED
+    for use_kernels in (False, True):
+        rng.bit_generator.state = state
+        w = world()
+        kernels.ENABLED = use_kernels
+        try:
+            w.run(steps)
+        finally:
+            kernels.ENABLED = enabled
+        worlds.append(w)
+    differences["circle_pairs"] = max(float(np.abs(worlds[0].stock.position[:n] - worlds[1].stock.position[:n]).max()),
+                                      float(np.abs(worlds[0].stock.vitesse[:n] - worlds[1].stock.vitesse[:n]).max()),
+                                      abs(worlds[0].nb_collisions - worlds[1].nb_collisions))
+
+    balls = [Simulation_3D.Ball(x, y, z, (255, 0, 0), radius=10, vx=vx, vy=vy, vz=vz, restitution=e)
+             for x, y, z, vx, vy, vz, e in zip(rng.uniform(0, 10, n), rng.uniform(0, 10, n), rng.uniform(0, 200, n),
+                                               rng.uniform(-1, 1, n), rng.uniform(-1, 1, n), rng.uniform(-50, 50, n),
+                                               rng.uniform(0.3, 0.9, n))]
+    state = np.array([[getattr(b, name) for name in BALL_FIELDS] for b in balls])
+    for _ in range(steps):
+        update_balls(state, 1 / 60, Simulation_3D.GRAVITY, Simulation_3D.FLOOR_Z)
+        for b in balls:
+            b.apply_gravity(1 / 60)
+            b.update(1 / 60)
+    reference = np.array([[getattr(b, name) for name in BALL_FIELDS] for b in balls])
+    differences["update_balls"] = float(np.abs(state - reference).max())
+    return differences
+
+
+if __name__ == "__main__":
+    print(f"backend: {BACKEND}" + ("" if numba is not None else " (Numba not installed, kernels checked interpreted)"))
+    tolerance = 1e-9
+    ok = True
+    for name, difference in check_backends().items():
+        ok &= difference <= tolerance
+        print(f"{name:>20}: max difference {difference:.3g}" + ("" if difference <= tolerance else "  MISMATCH"))
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,205 @@
+import numpy as np
+
+from solveur_contacts import contacts_cercle_boite
+from stock_corps import StockCorps
+
+# Phase étroite par table : les paires candidates sont regroupées par couple de types de forme,
+# et chaque groupe est testé puis résolu d'un coup (tableaux NumPy), sans aiguillage Python par
+# paire. La table couvre tous les couples (Cercle, Carre, Rectangle) ; une paire (a, b) est rangée
+# avec forme a <= forme b, les réponses étant symétriques.
+#
+# Les paires candidates sont réparties en lots sans corps commun, dans l'ordre : deux paires
+# partageant un corps sont traitées dans leur ordre d'origine, et chaque paire est testée sur l'état
+# laissé par les lots précédents. Le résultat est celui de la boucle paire par paire, y compris pour
+# une paire séparée au début du pas et mise en contact par la réponse d'une paire précédente.
+
+CERCLE, CARRE, RECTANGLE = 0, 1, 2
+NB_FORMES = 3
+
+
+def boites(stock, k):
+    # Boîtes (xmin, ymin, xmax, ymax) des corps k
+    coin = stock.position[k] + stock.decalage[k]
+    return np.hstack((coin, coin + stock.dimensions[k]))
+
+
+# --- Cercle / cercle ---
+
+def tester_cercles(stock, i, j):
+    delta = stock.position[j] - stock.position[i]
+    distance = np.sqrt((delta ** 2).sum(axis=1))
+    return distance < stock.dimensions[i, 0] / 2 + stock.dimensions[j, 0] / 2
+
+
+def repondre_cercles(stock, i, j):
+    # Choc 1D le long de la normale (masses m1, m2, vitesses normales u1, u2) :
+    # v1 = (m1*u1 + m2*u2 + m2*e*(u2-u1)) / (m1+m2), v2 = (m1*u1 + m2*u2 + m1*e*(u1-u2)) / (m1+m2),
+    # puis chaque cercle recule de la moitié du chevauchement
+    delta = stock.position[j] - stock.position[i]
+    distance = np.sqrt((delta ** 2).sum(axis=1))
+    distincts = distance > 0 # Centres confondus : pas de normale, paire ignorée
+    i, j, delta, distance = i[distincts], j[distincts], delta[distincts], distance[distincts]
+    normale = delta / distance[:, None]
+    chevauchement = stock.dimensions[i, 0] / 2 + stock.dimensions[j, 0] / 2 - distance
+    v1n = (stock.vitesse[i] * normale).sum(axis=1)
+    v2n = (stock.vitesse[j] * normale).sum(axis=1)
+    e = np.minimum(stock.restitution[i], stock.restitution[j])
+    m1, m2 = stock.masse[i], stock.masse[j]
+    v1n_new = (m1 * v1n + m2 * v2n + m2 * e * (v2n - v1n)) / (m1 + m2)
+    v2n_new = (m1 * v1n + m2 * v2n + m1 * e * (v1n - v2n)) / (m1 + m2)
+    stock.vitesse[i] += (v1n_new - v1n)[:, None] * normale
+    stock.vitesse[j] += (v2n_new - v2n)[:, None] * normale
+
+    recul = 0.5 * chevauchement
+    recul = np.where(recul > 0, recul, 0.0)[:, None] * normale
+    stock.position[i] -= recul
+    stock.position[j] += recul
+
+
+# --- Boîte / boîte (Carre, Rectangle) ---
+
+def tester_boites(stock, i, j):
+    a, b = boites(stock, i), boites(stock, j)
+    return (a[:, 0] < b[:, 2]) & (a[:, 2] > b[:, 0]) & (a[:, 1] < b[:, 3]) & (a[:, 3] > b[:, 1])
+
+
+def repondre_boites(stock, i, j):
+    # Échange simple des vitesses (comme si les masses étaient égales), amorti par e, puis
+    # séparation de moitié chacune le long de l'axe de moindre chevauchement
+    e = np.minimum(stock.restitution[i], stock.restitution[j])[:, None]
+    v1, v2 = stock.vitesse[i], stock.vitesse[j]
+    stock.vitesse[i], stock.vitesse[j] = e * v2, e * v1
+
+    demi_i, demi_j = stock.dimensions[i] / 2, stock.dimensions[j] / 2
+    ecart = (stock.position[j] + stock.decalage[j] + demi_j) - (stock.position[i] + stock.decalage[i] + demi_i)
+    chevauchement = (demi_i + demi_j) - np.abs(ecart)
+    separes = (chevauchement > 0).all(axis=1)
+    axe = np.where(chevauchement[:, 0] < chevauchement[:, 1], 0, 1)[separes]
+    i, j, lignes = i[separes], j[separes], np.nonzero(separes)[0]
+    # L'autre objet est à droite / en dessous : i recule, j avance (et inversement)
+    recul = np.where(ecart[lignes, axe] > 0, 1.0, -1.0) * chevauchement[lignes, axe] / 2
+    stock.position[i, axe] -= recul
+    stock.position[j, axe] += recul
+
+
+# --- Cercle / boîte ---
+
+def tester_cercle_boite(stock, i, j):
+    # Le point de la boîte le plus proche du centre du cercle est dans le cercle
+    boite = boites(stock, j)
+    proche = np.clip(stock.position[i], boite[:, :2], boite[:, 2:])
+    return ((stock.position[i] - proche) ** 2).sum(axis=1) < (stock.dimensions[i, 0] / 2) ** 2
+
+
+def repondre_cercle_boite(stock, i, j):
+    # Même choc 1D que pour deux cercles, le long de la normale sortante de la boîte, s'ils se
+    # rapprochent encore ; puis chacun recule de la moitié de l'interpénétration
+    normale, profondeur = contacts_cercle_boite(stock.position[i], stock.dimensions[i, 0] / 2, boites(stock, j))
+    normale = -normale # Du cercle vers la boîte
+    v1n = (stock.vitesse[i] * normale).sum(axis=1)
+    v2n = (stock.vitesse[j] * normale).sum(axis=1)
+    e = np.minimum(stock.restitution[i], stock.restitution[j])
+    m1, m2 = stock.masse[i], stock.masse[j]
+    approche = v1n > v2n
+    v1n_new = np.where(approche, (m1 * v1n + m2 * v2n + m2 * e * (v2n - v1n)) / (m1 + m2), v1n)
+    v2n_new = np.where(approche, (m1 * v1n + m2 * v2n + m1 * e * (v1n - v2n)) / (m1 + m2), v2n)
+    stock.vitesse[i] += (v1n_new - v1n)[:, None] * normale
+    stock.vitesse[j] += (v2n_new - v2n)[:, None] * normale
+
+    recul = 0.5 * np.maximum(profondeur, 0.0)[:, None] * normale
+    stock.position[i] -= recul
+    stock.position[j] += recul
+
+
+# (forme a, forme b) avec a <= b -> (test, réponse)
+TABLE = {
+    (CERCLE, CERCLE): (tester_cercles, repondre_cercles),
+    (CERCLE, CARRE): (tester_cercle_boite, repondre_cercle_boite),
+    (CERCLE, RECTANGLE): (tester_cercle_boite, repondre_cercle_boite),
+    (CARRE, CARRE): (tester_boites, repondre_boites),
+    (CARRE, RECTANGLE): (tester_boites, repondre_boites),
+    (RECTANGLE, RECTANGLE): (tester_boites, repondre_boites),
+}
+
+
+def groupes(code, lignes):
+    # (test, réponse, lignes) pour chaque couple de formes présent parmi lignes
+    for (a, b), (tester, repondre) in TABLE.items():
+        k = lignes[code[lignes] == a * NB_FORMES + b]
+        if len(k):
+            yield tester, repondre, k
+
+
+def lots_ordonnes(i, j, n):
+    # Répartit les paires en lots où aucun corps n'apparaît deux fois ; une paire passe dans un lot
+    # quand elle est la première (dans l'ordre) des paires restantes de chacun de ses corps
+    restant = np.arange(len(i))
+    lots = []
+    while len(restant):
+        a, b = i[restant], j[restant]
+        premiere = np.full(n, len(i))
+        np.minimum.at(premiere, a, restant)
+        np.minimum.at(premiere, b, restant)
+        retenu = (premiere[a] == restant) & (premiere[b] == restant)
+        lots.append(restant[retenu])
+        restant = restant[~retenu]
+    return lots
+
+
+def etendre(enveloppes, stock, k):
+    # Agrandit les enveloppes (xmin, ymin, xmax, ymax) des corps k pour couvrir leur boîte actuelle
+    boite = boites(stock, k)
+    enveloppes[k, :2] = np.minimum(enveloppes[k, :2], boite[:, :2])
+    enveloppes[k, 2:] = np.maximum(enveloppes[k, 2:], boite[:, 2:])
+
+
+def phase_etroite(stock, formes, i, j, enveloppes=None):
+    # Teste et résout les paires (i, j), dans l'ordre ; renvoie le masque des paires en collision.
+    # enveloppes : tableau (n, 4) des boîtes, agrandi pour couvrir chaque position prise par les
+    # corps déplacés (voir World.phase_etroite)
+    i, j = np.asarray(i, dtype=np.int64), np.asarray(j, dtype=np.int64)
+    echange = formes[i] > formes[j]
+    i, j = np.where(echange, j, i), np.where(echange, i, j)
+    code = formes[i] * NB_FORMES + formes[j]
+
+    touche = np.zeros(len(i), dtype=bool)
+    for lot in lots_ordonnes(i, j, stock.n):
+        for tester, repondre, k in groupes(code, lot):
+            # Les lots précédents ont pu rapprocher ou séparer les corps de la paire
+            k = k[tester(stock, i[k], j[k])]
+            touche[k] = True
+            repondre(stock, i[k], j[k])
+            if enveloppes is not None:
+                etendre(enveloppes, stock, np.concatenate((i[k], j[k])))
+    return touche
+
+
+# --- Une seule paire d'objets (ObjetPhysique.collision / gestion_collision) ---
+
+def _stock_paire(a, b):
+    # Copie des lignes de deux objets (qui peuvent appartenir à des stocks différents)
+    stock = StockCorps(2)
+    stock.allouer(2)
+    for nom, _, _ in StockCorps.CHAMPS:
+        tableau = getattr(stock, nom)
+        tableau[0] = getattr(a._stock, nom)[a._indice]
+        tableau[1] = getattr(b._stock, nom)[b._indice]
+    return stock
+
+
+def collision_paire(a, b):
+    stock = _stock_paire(a, b)
+    i, j = (0, 1) if a.forme <= b.forme else (1, 0)
+    tester, _ = TABLE[min(a.forme, b.forme), max(a.forme, b.forme)]
+    return bool(tester(stock, np.array([i]), np.array([j]))[0])
+
+
+def gestion_paire(a, b):
+    # Réponse au choc de a et b (supposés en collision), écrite dans leurs stocks
+    stock = _stock_paire(a, b)
+    i, j = (0, 1) if a.forme <= b.forme else (1, 0)
+    _, repondre = TABLE[min(a.forme, b.forme), max(a.forme, b.forme)]
+    repondre(stock, np.array([i]), np.array([j]))
+    for objet, k in ((a, 0), (b, 1)):
+        objet._stock.position[objet._indice] = stock.position[k]
+        objet._stock.vitesse[objet._indice] = stock.vitesse[k]
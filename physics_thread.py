@@ -0,0 +1,69 @@
+import threading
+import time
+
+import numpy as np
+
+# Physics on its own thread, decoupled from the display.
+# The worker calls step() at a fixed rate (in steps per second of wall-clock time) and, after
+# every step, copies the state returned by snapshot() into a back buffer that is then swapped
+# with the published ones. The renderer never sees a half-updated state: it asks for the state
+# interpolated between the last two snapshots at its own frame rate, so a slow frame no longer
+# slows the simulation down, and several physics steps can happen per displayed frame.
+
+
+class PhysicsThread(threading.Thread):
+    def __init__(self, step, snapshot, rate, max_catch_up=8):
+        super().__init__(daemon=True)
+        self.step_function = step
+        self.snapshot_function = snapshot
+        self.interval = 1 / rate # Wall-clock time between two physics steps
+        self.max_catch_up = max_catch_up # Steps run back to back at most when late
+
+        state = np.array(snapshot(), dtype=float)
+        # Double buffer of published snapshots (previous, current) + one buffer being written
+        self._previous = state.copy()
+        self._current = state.copy()
+        self._back = state.copy()
+        self._previous_time = self._current_time = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.steps = 0
+
+    def run(self):
+        next_step = time.perf_counter()
+        while not self._stop_event.is_set():
+            late = 0
+            while time.perf_counter() >= next_step and late < self.max_catch_up:
+                self.step_function()
+                self.steps += 1
+                self._publish()
+                next_step += self.interval
+                late += 1
+            if late == self.max_catch_up:
+                # Too slow to keep up: drop the backlog instead of spiralling
+                next_step = time.perf_counter()
+            self._stop_event.wait(max(0.0, next_step - time.perf_counter()))
+
+    def _publish(self):
+        self._back[...] = self.snapshot_function()
+        now = time.perf_counter()
+        with self._lock:
+            self._previous, self._current, self._back = self._current, self._back, self._previous
+            self._previous_time, self._current_time = self._current_time, now
+
+    def latest(self):
+        with self._lock:
+            return self._current.copy()
+
+    def interpolated(self):
+        # State one physics interval in the past, interpolated between the two last snapshots
+        render_time = time.perf_counter() - self.interval
+        with self._lock:
+            span = self._current_time - self._previous_time
+            alpha = 1.0 if span <= 0 else min(max((render_time - self._previous_time) / span, 0.0), 1.0)
+            return self._previous + (self._current - self._previous) * alpha
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
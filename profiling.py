@@ -0,0 +1,168 @@
+import csv
+import json
+import time
+from collections import deque
+
+import pygame
+
+# Per-phase profiling of the simulation loops.
+# Code sections are timed with `with profiler.phase("name"):` and events are counted with
+# profiler.count("name", k); end_frame() closes the current frame. The last frames are kept
+# for an on-screen overlay (toggled with F3), and every frame can be recorded and dumped to
+# JSON or CSV. NULL_PROFILER has the same interface and does nothing.
+#
+#   python Simulation.py --profile frames.csv
+
+OVERLAY_KEY = pygame.K_F3
+WINDOW = 120 # Frames averaged in the overlay
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+class Profiler:
+    def __init__(self, window=WINDOW, record=False):
+        self.window = deque(maxlen=window)
+        self.record = record
+        self.frames = [] # Every frame, if record
+        self.phases = [] # Phase names, in order of first use
+        self.counters = []
+        self.visible = False
+        self._times = {}
+        self._counts = {}
+        self._frame_start = time.perf_counter()
+        self._font = None
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def add(self, name, seconds):
+        if name not in self._times:
+            if name not in self.phases:
+                self.phases.append(name)
+            self._times[name] = 0.0
+        self._times[name] += seconds
+
+    def count(self, name, k=1):
+        if name not in self._counts:
+            if name not in self.counters:
+                self.counters.append(name)
+            self._counts[name] = 0
+        self._counts[name] += k
+
+    def end_frame(self):
+        now = time.perf_counter()
+        row = {"frame": 1000 * (now - self._frame_start)}
+        row.update((name, 1000 * seconds) for name, seconds in self._times.items())
+        row.update(self._counts)
+        self.window.append(row)
+        if self.record:
+            self.frames.append(row)
+        self._times = {}
+        self._counts = {}
+        self._frame_start = now
+
+    def averages(self):
+        # Mean over the window: milliseconds per phase (and per frame), counts per frame
+        if not self.window:
+            return {}
+        names = ["frame"] + self.phases + self.counters
+        return {name: sum(row.get(name, 0) for row in self.window) / len(self.window) for name in names}
+
+    # --- Overlay ---
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN and event.key == OVERLAY_KEY:
+            self.visible = not self.visible
+
+    def lines(self):
+        averages = self.averages()
+        if not averages:
+            return []
+        frame = averages["frame"]
+        lines = [f"frame {frame:6.2f} ms ({1000 / frame if frame > 0 else 0:.0f} fps)"]
+        for name in self.phases:
+            lines.append(f"{name:>14} {averages[name]:6.2f} ms {100 * averages[name] / frame if frame > 0 else 0:5.1f}%")
+        for name in self.counters:
+            lines.append(f"{name:>14} {averages[name]:9.1f} /frame")
+        return lines
+
+    def draw_overlay(self, surface, position=(5, 5)):
+        # Draws the overlay if visible; returns the rectangle drawn (None otherwise)
+        if not self.visible:
+            return None
+        if self._font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            self._font = pygame.font.SysFont("monospace", 14)
+        rendered = [self._font.render(line, True, (255, 255, 255)) for line in self.lines()]
+        if not rendered:
+            return None
+        width = max(text.get_width() for text in rendered) + 10
+        height = sum(text.get_height() for text in rendered) + 10
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        y = 5
+        for text in rendered:
+            panel.blit(text, (5, y))
+            y += text.get_height()
+        return surface.blit(panel, position)
+
+    # --- Export ---
+
+    def dump(self, path):
+        # Recorded frames (or the current window if not recording), as CSV if the path ends
+        # with .csv, JSON otherwise. Times in milliseconds, counters per frame.
+        frames = self.frames if self.record else list(self.window)
+        columns = ["frame"] + self.phases + self.counters
+        if str(path).endswith(".csv"):
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["index"] + columns)
+                for index, row in enumerate(frames):
+                    writer.writerow([index] + [row.get(name, 0) for name in columns])
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"phases": self.phases, "counters": self.counters, "averages": self.averages(),
+                           "frames": frames}, f, indent=1)
+
+
+class NullProfiler:
+    visible = False
+
+    def phase(self, name):
+        return _NO_PHASE
+
+    def add(self, name, seconds):
+        pass
+
+    def count(self, name, k=1):
+        pass
+
+    def end_frame(self):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+import pygame
+
+import Simulation
+import Simulation_3D
+import Simulation_planete
+
+# Trajectory recorder and replay viewer.
+# Per-step body states are streamed to a binary file, one chunk of frames at a time, and read
+# back through a memory map: a replay never recomputes physics, never loads the whole run in
+# RAM and can jump to any frame in O(1).
+#
+# File layout (little endian):
+#   0   8 bytes  magic
+#   8   uint64   number of frames written (updated after every chunk)
+#   16  uint64   offset of the first frame (multiple of 64)
+#   24  uint32   length of the JSON metadata
+#   28  JSON     kind, field names, dt, per-body sizes and colours, scene settings
+#   ... frames   float64 [time, body 0 fields..., body 1 fields..., ...]
+#
+#   python recorder.py record planete orbits.traj --steps 20000
+#   python recorder.py replay orbits.traj
+
+MAGIC = b"MCTRAJ\x00\x01"
+HEADER = struct.Struct("<8sQQI")
+ALIGNMENT = 64
+CHUNK_FRAMES = 256
+
+
+class TrajectoryWriter:
+    def __init__(self, path, kind, n_bodies, fields, dt=0.0, chunk_frames=CHUNK_FRAMES, **metadata):
+        self.n_bodies = n_bodies
+        self.fields = list(fields)
+        self.chunk_frames = chunk_frames
+        self.frame_size = 1 + n_bodies * len(self.fields)
+        self.n_frames = 0
+
+        meta = json.dumps({"kind": kind, "n_bodies": n_bodies, "fields": self.fields, "dt": dt, **metadata}).encode()
+        self.data_offset = -(-(HEADER.size + len(meta)) // ALIGNMENT) * ALIGNMENT
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, 0, self.data_offset, len(meta)) + meta)
+        self.file.write(b"\0" * (self.data_offset - HEADER.size - len(meta)))
+
+        self.buffer = np.empty((chunk_frames, self.frame_size))
+        self.buffered = 0
+
+    def write(self, time, state):
+        # state: (n_bodies, len(fields)) array of the bodies at `time`
+        row = self.buffer[self.buffered]
+        row[0] = time
+        row[1:] = np.asarray(state, dtype=float).reshape(-1)
+        self.buffered += 1
+        if self.buffered == self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        if self.buffered == 0:
+            return
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(self.buffer[:self.buffered].tobytes())
+        self.n_frames += self.buffered
+        self.buffered = 0
+        # Frame count last, so that a reader never sees a frame that is not fully written
+        self.file.seek(8)
+        self.file.write(struct.pack("<Q", self.n_frames))
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReader:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, n_frames, data_offset, meta_length = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a trajectory file")
+            self.meta = json.loads(f.read(meta_length))
+        self.kind = self.meta["kind"]
+        self.fields = self.meta["fields"]
+        self.n_bodies = self.meta["n_bodies"]
+        frame_size = 1 + self.n_bodies * len(self.fields)
+        self.frames = np.memmap(path, dtype="<f8", mode="r", offset=data_offset, shape=(n_frames, frame_size))
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def times(self):
+        return self.frames[:, 0]
+
+    def frame(self, index):
+        # (time, state) of one frame; state is a (n_bodies, n_fields) view on the file
+        row = self.frames[index]
+        return float(row[0]), row[1:].reshape(self.n_bodies, len(self.fields))
+
+    def field(self, name, start=0, stop=None):
+        # One field of every body over a range of frames: (frames, n_bodies) view
+        k = self.fields.index(name)
+        return self.frames[start:stop, 1 + k::len(self.fields)]
+
+
+# --- Recording the three simulations ---
+
+def record_world(monde, path, steps, dt=None):
+    dt = monde.dt_fixe if dt is None else dt
+    n = monde.stock.n
+    # Circles: (radius, radius), boxes: (width, height)
+    sizes = [[o.rayon, o.rayon] if isinstance(o, Simulation.Cercle) else monde.stock.dimensions[k].tolist()
+             for k, o in enumerate(monde.objets)]
+    with TrajectoryWriter(path, "simulation", n, ["x", "y", "vx", "vy"], dt,
+                          shapes=["cercle" if isinstance(o, Simulation.Cercle) else "boite" for o in monde.objets],
+                          sizes=sizes, colors=[list(o.couleur) for o in monde.objets],
+                          sol_y=monde.sol.y if monde.sol is not None else None, width=monde.largeur) as writer:
+        writer.write(monde.temps, monde.etat())
+        for _ in range(steps):
+            monde.step(dt)
+            writer.write(monde.temps, monde.etat())
+
+
+def record_planets(system, path, steps, every=1):
+    # every: keep one frame out of `every` steps
+    planets = system.planets
+    with TrajectoryWriter(path, "planete", len(system.masses), ["x", "y", "vx", "vy"], system.timestep * every,
+                          sizes=[p.base_radius for p in planets] + [1] * (len(system.masses) - len(planets)),
+                          colors=[list(p.color) for p in planets] + [[200, 200, 200]] * (len(system.masses) - len(planets)),
+                          scale=Simulation_planete.SCALE) as writer:
+        writer.write(system.time, system.state())
+        for step in range(1, steps + 1):
+            system.step()
+            if step % every == 0:
+                writer.write(system.time, system.state())
+
+
+def record_balls(balls, path, steps, dt=1 / 60):
+    with TrajectoryWriter(path, "3d", len(balls), ["x", "y", "z", "vx", "vy", "vz"], dt,
+                          sizes=[b.radius for b in balls], colors=[list(b.color) for b in balls]) as writer:
+        time = 0.0
+        writer.write(time, Simulation_3D.ball_state(balls))
+        for _ in range(steps):
+            Simulation_3D.step(balls, dt)
+            time += dt
+            writer.write(time, Simulation_3D.ball_state(balls))
+
+
+# --- Replay ---
+
+TRAIL_FRAMES = 750 # Trail length drawn for the planets (read from the file, not recomputed)
+TRAIL_MAX_BODIES = 50 # Trails are only drawn for small systems
+
+
+def draw_simulation(surface, reader, index):
+    meta = reader.meta
+    _, state = reader.frame(index)
+    surface.fill(Simulation.BLANC)
+    if meta.get("sol_y") is not None:
+        pygame.draw.rect(surface, Simulation.GRIS, (0, meta["sol_y"], surface.get_width(), surface.get_height()))
+    for (x, y), shape, (w, h), color in zip(state[:, :2].tolist(), meta["shapes"], meta["sizes"], meta["colors"]):
+        if shape == "cercle":
+            pygame.draw.circle(surface, color, (int(x), int(y)), int(w))
+        else:
+            pygame.draw.rect(surface, color, (int(x), int(y), w, h))
+
+
+def draw_planete(surface, reader, index):
+    meta = reader.meta
+    _, state = reader.frame(index)
+    view = (meta["scale"], surface.get_width(), surface.get_height())
+    surface.fill((0, 0, 0))
+    if reader.n_bodies <= TRAIL_MAX_BODIES and index > 1:
+        start = max(0, index - TRAIL_FRAMES)
+        xs = reader.field("x", start, index + 1)
+        ys = reader.field("y", start, index + 1)
+        for k in range(reader.n_bodies):
+            trail = Simulation_planete.project(np.column_stack((xs[:, k], ys[:, k])), view)
+            pygame.draw.lines(surface, meta["colors"][k], False, trail.tolist(), 1)
+    points = Simulation_planete.project(np.asarray(state[:, :2]), view)
+    for (x, y), size, color in zip(points.tolist(), meta["sizes"], meta["colors"]):
+        pygame.draw.circle(surface, color, (x, y), max(int(size), 1))
+
+
+def draw_3d(surface, reader, index):
+    meta = reader.meta
+    _, state = reader.frame(index)
+    surface.fill(Simulation_3D.WHITE)
+    Simulation_3D.draw_grid(surface, size=15)
+    # Balls further back (smaller x + y) first
+    for k in np.argsort(state[:, 0] + state[:, 1]).tolist():
+        x, y, z = state[k, :3].tolist()
+        radius = int(meta["sizes"][k])
+        pygame.draw.circle(surface, Simulation_3D.GREY, Simulation_3D.iso_project(x, y, 0), radius)
+        pygame.draw.circle(surface, meta["colors"][k], Simulation_3D.iso_project(x, y, z), radius)
+
+
+VIEWERS = {
+    "simulation": (draw_simulation, (Simulation.largeur, Simulation.hauteur)),
+    "planete": (draw_planete, (Simulation_planete.WIDTH, Simulation_planete.HEIGHT)),
+    "3d": (draw_3d, (Simulation_3D.WIDTH, Simulation_3D.HEIGHT)),
+}
+BAR_HEIGHT = 12
+
+
+def replay(path):
+    # Space: pause, Left/Right: one frame (x100 with Shift), Home/End: first/last frame,
+    # Up/Down: playback speed, click on the bar at the bottom: jump to that point
+    reader = TrajectoryReader(path)
+    if len(reader) == 0:
+        print(f"{path}: no frame recorded")
+        return
+    draw, size = VIEWERS[reader.kind]
+    pygame.init()
+    window = pygame.display.set_mode(size)
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont(None, 20)
+    index, speed, paused, run = 0, 1, False, True
+
+    while run:
+        clock.tick(60)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                run = False
+            elif event.type == pygame.KEYDOWN:
+                jump = 100 if event.mod & pygame.KMOD_SHIFT else 1
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_RIGHT:
+                    index += jump
+                elif event.key == pygame.K_LEFT:
+                    index -= jump
+                elif event.key == pygame.K_HOME:
+                    index = 0
+                elif event.key == pygame.K_END:
+                    index = len(reader) - 1
+                elif event.key == pygame.K_UP:
+                    speed *= 2
+                elif event.key == pygame.K_DOWN:
+                    speed = max(1, speed // 2)
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.pos[1] >= size[1] - BAR_HEIGHT:
+                index = int(event.pos[0] / size[0] * (len(reader) - 1))
+        if not paused:
+            index += speed
+        index = min(max(index, 0), len(reader) - 1)
+
+        draw(window, reader, index)
+        pygame.draw.rect(window, (90, 90, 90), (0, size[1] - BAR_HEIGHT, size[0], BAR_HEIGHT))
+        pygame.draw.rect(window, (230, 160, 30),
+                         (0, size[1] - BAR_HEIGHT, int(size[0] * (index + 1) / len(reader)), BAR_HEIGHT))
+        label = f"frame {index + 1}/{len(reader)}  t = {reader.times[index]:.6g}  x{speed}" + ("  (pause)" if paused else "")
+        window.blit(font.render(label, True, (128, 128, 128)), (5, 5))
+        pygame.display.flip()
+
+    pygame.quit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record a simulation to a trajectory file, or replay one")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record")
+    record.add_argument("simulation", choices=sorted(VIEWERS))
+    record.add_argument("path")
+    record.add_argument("--steps", type=int, default=10000)
+    record.add_argument("--every", type=int, default=1, help="planete: keep one frame every N steps")
+    play = commands.add_parser("replay")
+    play.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "replay":
+        replay(args.path)
+    elif args.simulation == "simulation":
+        record_world(Simulation.creer_monde(), args.path, args.steps)
+    elif args.simulation == "planete":
+        record_planets(Simulation_planete.PlanetSystem(Simulation_planete.create_solar_system()), args.path,
+                       args.steps, args.every)
+    else:
+        record_balls(Simulation_3D.create_balls(), args.path, args.steps)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,245 @@
+import json
+import math
+import os
+
+import numpy as np
+
+try:
+    import tomllib
+except ImportError: # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+import Simulation
+import Simulation_3D
+import Simulation_planete
+from gravity import BarnesHutSolver, DirectSolver
+
+# Declarative scene files (JSON or TOML) for the three simulations.
+# A scene names its simulation, optional settings and a list of bodies. Each entry of `bodies` is
+# either one body, described with the attribute names of the simulation (Cercle / Planet / Ball),
+# or a generator spawning `count` bodies at once. In a generator, any numeric attribute may be a
+# [low, high] range, sampled uniformly per body. Generated bodies are allocated in bulk
+# (World.ajouter_cercles, PlanetSystem.add_bodies, Simulation_3D.balls_from_arrays).
+#
+#   python Simulation.py --scene scenes/pluie.toml
+#   python benchmark.py --scene scenes/ceinture.toml
+#
+# See the scenes/ directory for examples of each simulation and generator.
+
+SIMULATIONS = ("simulation", "planete", "3d")
+
+
+def read(path):
+    # Scene dictionary from a .toml or .json file
+    if os.path.splitext(path)[1].lower() == ".toml":
+        if tomllib is None:
+            raise ImportError("TOML scenes need Python 3.11+ (tomllib) or the tomli package")
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load(path, simulation=None):
+    # Builds the scene of a file: a World ("simulation"), a PlanetSystem ("planete") or a list of
+    # Ball ("3d"). simulation: expected kind, checked against the file.
+    scene = read(path)
+    kind = scene.get("simulation")
+    if kind not in SIMULATIONS:
+        raise ValueError(f"{path}: 'simulation' must be one of {', '.join(SIMULATIONS)}, not {kind!r}")
+    if simulation is not None and kind != simulation:
+        raise ValueError(f"{path} is a {kind!r} scene, not a {simulation!r} scene")
+    return BUILDERS[kind](scene)
+
+
+def sample(spec, count, rng):
+    # A number (same value for every body) or a [low, high] range (uniform per body)
+    if isinstance(spec, (list, tuple)):
+        low, high = spec
+        return rng.uniform(low, high, count)
+    return np.full(count, float(spec))
+
+
+def check_keys(entry, allowed, where):
+    unknown = set(entry) - set(allowed)
+    if unknown:
+        raise ValueError(f"{where}: unknown keys {', '.join(sorted(unknown))}")
+
+
+def split_bodies(scene, generators):
+    # Individual bodies and generators, in file order
+    bodies, generated = [], []
+    for k, entry in enumerate(scene.get("bodies", [])):
+        if "generator" not in entry:
+            bodies.append(entry)
+        elif entry["generator"] in generators:
+            generated.append(entry)
+        else:
+            raise ValueError(f"bodies[{k}]: unknown generator {entry['generator']!r} "
+                             f"(expected one of {', '.join(generators)})")
+    return bodies, generated
+
+
+# --- 2D world (Simulation.py) ---
+
+WORLD_KEYS = ("largeur_monde", "dt_fixe", "sous_pas", "integrateur", "ccd", "sommeil", "solveur")
+SHAPES = {
+    "cercle": (Simulation.Cercle, ("rayon",)),
+    "carre": (Simulation.Carre, ("taille",)),
+    "rectangle": (Simulation.Rectangle, ("largeur", "hauteur")),
+}
+BODY_KEYS_2D = ("type", "x", "y", "vx", "vy", "ax", "ay", "masse", "restitution", "couleur",
+                "rayon", "taille", "largeur", "hauteur")
+CIRCLES_KEYS = ("generator", "count", "region", "rayon", "vx", "vy", "ax", "ay", "masse", "restitution",
+                "couleur", "seed")
+
+
+def build_world(scene):
+    settings = dict(scene.get("world", {}))
+    sol = settings.pop("sol", None)
+    check_keys(settings, WORLD_KEYS, "world")
+    if sol is not None:
+        check_keys(sol, ("y", "hauteur", "couleur", "restitution"), "world.sol")
+        sol = Simulation.Sol(sol["y"], sol.get("hauteur", 50), tuple(sol.get("couleur", Simulation.GRIS)),
+                             sol.get("restitution", 0.3))
+    monde = Simulation.World(sol=sol, **settings)
+
+    bodies, generated = split_bodies(scene, GENERATORS_2D)
+    for k, body in enumerate(bodies):
+        check_keys(body, BODY_KEYS_2D, f"bodies[{k}]")
+        cls, sizes = SHAPES[body.get("type", "cercle")]
+        objet = cls(body["x"], body["y"], *(body[size] for size in sizes), tuple(body.get("couleur", Simulation.NOIR)))
+        for name in ("vx", "vy", "ax", "ay", "masse"):
+            if name in body:
+                setattr(objet, name, body[name])
+        if "restitution" in body:
+            objet.coefficient_restitution = body["restitution"]
+        monde.ajouter(objet)
+    for entry in generated:
+        GENERATORS_2D[entry["generator"]](monde, entry)
+    return monde
+
+
+def generate_circles(monde, entry):
+    # count circles with centres uniformly spread in region = [xmin, ymin, xmax, ymax]
+    check_keys(entry, CIRCLES_KEYS, "generator 'cercles'")
+    rng = np.random.default_rng(entry.get("seed"))
+    count = int(entry["count"])
+    xmin, ymin, xmax, ymax = entry["region"]
+    positions = np.column_stack((rng.uniform(xmin, xmax, count), rng.uniform(ymin, ymax, count)))
+    rayons = sample(entry.get("rayon", 10), count, rng)
+    vitesses = np.column_stack((sample(entry.get("vx", 0), count, rng), sample(entry.get("vy", 0), count, rng)))
+    accelerations = np.column_stack((sample(entry.get("ax", 0), count, rng), sample(entry.get("ay", 0), count, rng)))
+    masses = sample(entry["masse"], count, rng) if "masse" in entry else None
+    monde.ajouter_cercles(positions, rayons, vitesses, accelerations, sample(entry.get("restitution", 0.8), count, rng),
+                          masses, tuple(entry.get("couleur", Simulation.NOIR)))
+
+
+GENERATORS_2D = {"cercles": generate_circles}
+
+
+# --- Planetary system (Simulation_planete.py) ---
+
+SYSTEM_KEYS = ("timestep", "integrator", "solver", "theta")
+BODY_KEYS_PLANETE = ("name", "x", "y", "x_vel", "y_vel", "mass", "radius", "color", "sun")
+BELT_KEYS = ("generator", "count", "inner_au", "outer_au", "eccentricity", "mass", "seed")
+
+
+def build_planets(scene):
+    settings = dict(scene.get("system", {}))
+    check_keys(settings, SYSTEM_KEYS, "system")
+    solver = settings.pop("solver", "direct")
+    theta = settings.pop("theta", 0.5)
+    if solver not in ("direct", "barnes_hut"):
+        raise ValueError(f"system.solver must be 'direct' or 'barnes_hut', not {solver!r}")
+    settings["solver"] = DirectSolver() if solver == "direct" else BarnesHutSolver(theta=theta)
+
+    bodies, generated = split_bodies(scene, GENERATORS_PLANETE)
+    planets = []
+    for k, body in enumerate(bodies):
+        check_keys(body, BODY_KEYS_PLANETE, f"bodies[{k}]")
+        planet = Simulation_planete.Planet(body["x"], body["y"], body.get("radius", 5),
+                                           tuple(body.get("color", Simulation_planete.WHITE)), body["mass"])
+        planet.x_vel = body.get("x_vel", 0)
+        planet.y_vel = body.get("y_vel", 0)
+        planet.sun = bool(body.get("sun", False))
+        planets.append(planet)
+    system = Simulation_planete.PlanetSystem(planets, **settings)
+    for entry in generated:
+        GENERATORS_PLANETE[entry["generator"]](system, entry)
+    return system
+
+
+def generate_asteroid_belt(system, entry):
+    # count bodies on Keplerian orbits around the sun (the fixed body), with semi-major axes between
+    # inner_au and outer_au (uniform surface density), random eccentricity, anomaly and orientation
+    check_keys(entry, BELT_KEYS, "generator 'asteroid_belt'")
+    if system.sun_index is None:
+        raise ValueError("generator 'asteroid_belt' needs a body with sun = true")
+    rng = np.random.default_rng(entry.get("seed"))
+    count = int(entry["count"])
+    mu = Simulation_planete.G * system.masses[system.sun_index]
+    inner, outer = entry["inner_au"] * Simulation_planete.AU, entry["outer_au"] * Simulation_planete.AU
+    a = np.sqrt(rng.uniform(inner ** 2, outer ** 2, count))
+    e = sample(entry.get("eccentricity", 0), count, rng)
+    anomaly = rng.uniform(0, 2 * math.pi, count)
+    periapsis = rng.uniform(0, 2 * math.pi, count)
+
+    # State in the orbital plane (periapsis along x), then rotated by the argument of periapsis
+    p = a * (1 - e ** 2)
+    r = p / (1 + e * np.cos(anomaly))
+    speed = np.sqrt(mu / p)
+    position = np.column_stack((r * np.cos(anomaly), r * np.sin(anomaly)))
+    velocity = np.column_stack((-speed * np.sin(anomaly), speed * (e + np.cos(anomaly))))
+    c, s = np.cos(periapsis), np.sin(periapsis)
+    rotation = np.stack((np.column_stack((c, -s)), np.column_stack((s, c))), axis=1)
+    centre = system.positions[system.sun_index]
+    system.add_bodies(centre + np.einsum("kij,kj->ki", rotation, position),
+                      system.velocities[system.sun_index] + np.einsum("kij,kj->ki", rotation, velocity),
+                      sample(entry.get("mass", 1e15), count, rng))
+
+
+GENERATORS_PLANETE = {"asteroid_belt": generate_asteroid_belt}
+
+
+# --- Isometric balls (Simulation_3D.py) ---
+
+BODY_KEYS_3D = ("x", "y", "z", "vx", "vy", "vz", "ax", "ay", "az", "radius", "color", "restitution")
+BALLS_KEYS = ("generator", "count", "region", "radius", "vx", "vy", "vz", "restitution", "color", "seed")
+
+
+def build_balls(scene):
+    bodies, generated = split_bodies(scene, GENERATORS_3D)
+    balls = []
+    for k, body in enumerate(bodies):
+        check_keys(body, BODY_KEYS_3D, f"bodies[{k}]")
+        balls.append(Simulation_3D.Ball(color=tuple(body.get("color", (255, 0, 0))),
+                                        **{key: value for key, value in body.items() if key != "color"}))
+    for entry in generated:
+        balls.extend(GENERATORS_3D[entry["generator"]](entry))
+    return balls
+
+
+def generate_balls(entry):
+    # count balls uniformly spread in region = [xmin, ymin, zmin, xmax, ymax, zmax] (tiles, pixels for z)
+    check_keys(entry, BALLS_KEYS, "generator 'balls'")
+    rng = np.random.default_rng(entry.get("seed"))
+    count = int(entry["count"])
+    low, high = np.array(entry["region"][:3], dtype=float), np.array(entry["region"][3:], dtype=float)
+    positions = rng.uniform(low, high, (count, 3))
+    velocities = np.column_stack([sample(entry.get(name, 0), count, rng) for name in ("vx", "vy", "vz")])
+    return Simulation_3D.balls_from_arrays(positions, sample(entry.get("radius", 10), count, rng),
+                                           entry.get("color", (255, 0, 0)), velocities,
+                                           sample(entry.get("restitution", 0.8), count, rng))
+
+
+GENERATORS_3D = {"balls": generate_balls}
+
+BUILDERS = {
+    "simulation": build_world,
+    "planete": build_planets,
+    "3d": build_balls,
+}
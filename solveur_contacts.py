@@ -0,0 +1,225 @@
+import numpy as np
+
+# Solveur de contacts par impulsions séquentielles (Gauss-Seidel projeté), avec cache des
+# contacts et démarrage à chaud d'un pas sur l'autre.
+# À chaque pas : les vitesses reçoivent l'accélération, les contacts (normale, profondeur) sont
+# générés pour toutes les paires de formes (Cercle / Carre / Rectangle, en boîtes alignées) et
+# contre le sol, les murs et le plafond (corps statiques de masse infinie), les impulsions du pas
+# précédent sont réappliquées, puis `iterations` passes corrigent les vitesses contact par contact
+# (impulsion normale >= 0, frottement de Coulomb). Les positions avancent en dernier.
+#
+# Les passes sont vectorisées : les contacts sont répartis en lots sans corps commun, et chaque lot
+# est résolu d'un coup (les lots restent traités l'un après l'autre, comme en Gauss-Seidel).
+
+ITERATIONS = 10
+FROTTEMENT = 0.4 # Coefficient de frottement (Coulomb) entre corps, et avec le sol et les murs
+BAUMGARTE = 0.2 # Fraction de l'interpénétration corrigée à chaque pas
+TOLERANCE_PENETRATION = 0.5 # Interpénétration tolérée (pixels) : garde les contacts au repos actifs
+SEUIL_REBOND = 10.0 # Vitesse d'approche (pixels/s) sous laquelle un contact ne rebondit pas
+
+# Corps statiques, à la suite des n corps dans les tableaux étendus : sol, mur gauche, mur droit, plafond
+SOL, MUR_GAUCHE, MUR_DROIT, PLAFOND = range(4)
+
+
+def contacts_cercles(centre_i, rayon_i, centre_j, rayon_j):
+    # Normale de i vers j et profondeur (> 0 si les cercles s'interpénètrent)
+    delta = centre_j - centre_i
+    distance = np.sqrt((delta ** 2).sum(axis=1))
+    normale = np.tile([0.0, 1.0], (len(delta), 1))
+    separes = distance > 0
+    normale[separes] = delta[separes] / distance[separes, None]
+    return normale, rayon_i + rayon_j - distance
+
+
+def contacts_boites(boite_i, boite_j):
+    # Boîtes (xmin, ymin, xmax, ymax) : séparation le long de l'axe de moindre recouvrement
+    recouvrement = np.minimum(boite_i[:, 2:], boite_j[:, 2:]) - np.maximum(boite_i[:, :2], boite_j[:, :2])
+    axe = recouvrement.argmin(axis=1)
+    lignes = np.arange(len(axe))
+    ecart = (boite_j[:, :2] + boite_j[:, 2:] - boite_i[:, :2] - boite_i[:, 2:])[lignes, axe]
+    normale = np.zeros((len(axe), 2))
+    normale[lignes, axe] = np.where(ecart < 0, -1.0, 1.0)
+    profondeur = np.where((recouvrement > 0).all(axis=1), recouvrement[lignes, axe], -1.0)
+    return normale, profondeur
+
+
+def contacts_cercle_boite(centre, rayon, boite):
+    # Normale sortante de la boîte vers le cercle et profondeur
+    proche = np.clip(centre, boite[:, :2], boite[:, 2:])
+    delta = centre - proche
+    distance = np.sqrt((delta ** 2).sum(axis=1))
+    normale = np.zeros_like(delta)
+    profondeur = rayon - distance
+    dehors = distance > 0
+    normale[dehors] = delta[dehors] / distance[dehors, None]
+
+    # Centre dans la boîte : sortie par la face la plus proche
+    dedans = np.nonzero(~dehors)[0]
+    if len(dedans):
+        faces = np.hstack((centre[dedans] - boite[dedans, :2], boite[dedans, 2:] - centre[dedans]))
+        face = faces.argmin(axis=1)
+        normale[dedans] = np.array([[-1.0, 0.0], [0.0, -1.0], [1.0, 0.0], [0.0, 1.0]])[face]
+        profondeur[dedans] = rayon[dedans] + faces[np.arange(len(dedans)), face]
+    return normale, profondeur
+
+
+def contacts_paires(i, j, cercles, centres, rayons, boites):
+    # Normales (de i vers j) et profondeurs des paires candidates, selon le type de forme
+    normale = np.zeros((len(i), 2))
+    profondeur = np.full(len(i), -1.0)
+
+    k = np.nonzero(cercles[i] & cercles[j])[0]
+    normale[k], profondeur[k] = contacts_cercles(centres[i[k]], rayons[i[k]], centres[j[k]], rayons[j[k]])
+    k = np.nonzero(~cercles[i] & ~cercles[j])[0]
+    normale[k], profondeur[k] = contacts_boites(boites[i[k]], boites[j[k]])
+    k = np.nonzero(cercles[i] & ~cercles[j])[0]
+    n, profondeur[k] = contacts_cercle_boite(centres[i[k]], rayons[i[k]], boites[j[k]])
+    normale[k] = -n
+    k = np.nonzero(~cercles[i] & cercles[j])[0]
+    normale[k], profondeur[k] = contacts_cercle_boite(centres[j[k]], rayons[j[k]], boites[i[k]])
+    return normale, profondeur
+
+
+def contacts_bords(boites, largeur_monde, sol=None):
+    # Contacts des corps avec le sol, les murs et le plafond : (corps, bord, normale, profondeur)
+    profondeurs = np.column_stack((
+        boites[:, 3] - sol.y if sol is not None else np.full(len(boites), -1.0),
+        -boites[:, 0],
+        boites[:, 2] - largeur_monde,
+        -boites[:, 1],
+    ))
+    corps, bord = np.nonzero(profondeurs > 0)
+    normales = np.array([[0.0, 1.0], [-1.0, 0.0], [1.0, 0.0], [0.0, -1.0]])[bord]
+    return corps, bord, normales, profondeurs[corps, bord]
+
+
+def lots_independants(i, j, n, graine=0):
+    # Répartit les contacts en lots où aucun corps dynamique (indice < n) n'apparaît deux fois :
+    # à chaque tour, un contact est retenu s'il a la plus petite priorité (aléatoire) parmi les
+    # contacts restants de chacun de ses corps
+    aleatoire = np.random.default_rng(graine)
+    restant = np.arange(len(i))
+    lots = []
+    while len(restant):
+        priorite = aleatoire.permutation(len(restant))
+        a, b = i[restant], j[restant]
+        dynamique = b < n
+        minimum = np.full(n, len(restant))
+        np.minimum.at(minimum, a, priorite)
+        np.minimum.at(minimum, b[dynamique], priorite[dynamique])
+        retenu = minimum[a] == priorite
+        retenu[dynamique] &= minimum[b[dynamique]] == priorite[dynamique]
+        lots.append(restant[retenu])
+        restant = restant[~retenu]
+    return lots
+
+
+class SolveurContacts:
+    def __init__(self, iterations=ITERATIONS, frottement=FROTTEMENT, baumgarte=BAUMGARTE,
+                 tolerance=TOLERANCE_PENETRATION, seuil_rebond=SEUIL_REBOND):
+        self.iterations = iterations
+        self.frottement = frottement
+        self.baumgarte = baumgarte
+        self.tolerance = tolerance
+        self.seuil_rebond = seuil_rebond
+        # Cache des impulsions du pas précédent, par clé de contact triée
+        self.cles = np.zeros(0, dtype=np.int64)
+        self.impulsions = np.zeros((0, 2))
+
+    def step(self, monde, dt, actifs=None):
+        # Un pas de monde (World) : vitesses, contacts, résolution, positions.
+        # actifs : indices des corps éveillés (les autres ne bougent pas), tous si None.
+        stock = monde.stock
+        n = stock.n
+        position, vitesse = stock.position[:n], stock.vitesse[:n]
+        mobiles = slice(None) if actifs is None else actifs
+        vitesse[mobiles] += stock.acceleration[:n][mobiles] * dt
+
+        i, j, normale, profondeur, restitution = self.contacts(monde)
+        paires = j < n
+        monde.nb_collisions += int(paires.sum())
+        if monde.sommeil is not None:
+            monde.sommeil.noter_contacts(i[paires], j[paires])
+        if len(i):
+            self.resoudre(stock, i, j, normale, profondeur, restitution, dt)
+
+        position[mobiles] += vitesse[mobiles] * dt
+        return i[paires], j[paires]
+
+    def contacts(self, monde):
+        stock = monde.stock
+        n = stock.n
+        boites = stock.boites()
+        cercles = monde.masque_cercles()
+
+        paires = np.array(monde.paires_candidates(), dtype=np.int64).reshape(-1, 2)
+        i, j = paires[:, 0], paires[:, 1]
+        if monde.sommeil is not None:
+            i, j = monde.sommeil.filtrer_paires(i, j)
+        monde.profiler.count("pair_tests", len(i))
+        normale, profondeur = contacts_paires(i, j, cercles, stock.position[:n], stock.dimensions[:n, 0] / 2, boites)
+        touche = profondeur > 0
+        i, j, normale, profondeur = i[touche], j[touche], normale[touche], profondeur[touche]
+        restitution = np.minimum(stock.restitution[i], stock.restitution[j])
+
+        # Sol, murs et plafond : corps statiques n + bord
+        corps, bord, normale_bord, profondeur_bord = contacts_bords(boites, monde.largeur, monde.sol)
+        restitution_bord = np.where(bord == SOL, monde.sol.coefficient_restitution if monde.sol is not None else 0.0,
+                                    stock.restitution[corps])
+        return (np.concatenate((i, corps)), np.concatenate((j, n + bord)), np.vstack((normale, normale_bord)),
+                np.concatenate((profondeur, profondeur_bord)), np.concatenate((restitution, restitution_bord)))
+
+    def resoudre(self, stock, i, j, normale, profondeur, restitution, dt):
+        n = stock.n
+        # Tableaux étendus : les 4 bords sont des corps immobiles de masse inverse nulle
+        vitesse = np.vstack((stock.vitesse[:n], np.zeros((4, 2))))
+        inverse = np.concatenate((1 / stock.masse[:n], np.zeros(4)))
+        tangente = np.column_stack((-normale[:, 1], normale[:, 0]))
+        wi, wj = inverse[i], inverse[j]
+        masse_effective = 1 / (wi + wj)
+
+        # Vitesse visée le long de la normale : rebond (si le choc est assez rapide) ou
+        # correction de l'interpénétration au-delà de la tolérance
+        approche = ((vitesse[j] - vitesse[i]) * normale).sum(axis=1)
+        rebond = np.where(approche < -self.seuil_rebond, -restitution * approche, 0.0)
+        correction = self.baumgarte / dt * np.maximum(profondeur - self.tolerance, 0.0)
+        cible = np.maximum(rebond, correction)
+
+        # Démarrage à chaud : impulsions (normale, tangente) des mêmes contacts au pas précédent
+        cles = i * (n + 4) + j
+        impulsion = np.zeros((len(i), 2))
+        if len(self.cles):
+            k = np.minimum(np.searchsorted(self.cles, cles), len(self.cles) - 1)
+            connu = self.cles[k] == cles
+            impulsion[connu] = self.impulsions[k[connu]]
+            choc = impulsion[:, :1] * normale + impulsion[:, 1:] * tangente
+            np.add.at(vitesse, i, -wi[:, None] * choc)
+            np.add.at(vitesse, j, wj[:, None] * choc)
+
+        lots = lots_independants(i, j, n)
+        for _ in range(self.iterations):
+            for lot in lots:
+                a, b = i[lot], j[lot]
+                nl, tl = normale[lot], tangente[lot]
+                relative = vitesse[b] - vitesse[a]
+
+                # Impulsion normale cumulée >= 0
+                ancienne = impulsion[lot, 0]
+                nouvelle = np.maximum(ancienne + masse_effective[lot] * (cible[lot] - (relative * nl).sum(axis=1)), 0.0)
+                impulsion[lot, 0] = nouvelle
+                delta_n = nouvelle - ancienne
+
+                # Frottement : impulsion tangentielle bornée par frottement * impulsion normale
+                ancienne = impulsion[lot, 1]
+                borne = self.frottement * nouvelle
+                nouvelle = np.clip(ancienne - masse_effective[lot] * (relative * tl).sum(axis=1), -borne, borne)
+                impulsion[lot, 1] = nouvelle
+                delta_t = nouvelle - ancienne
+
+                choc = delta_n[:, None] * nl + delta_t[:, None] * tl
+                vitesse[a] -= wi[lot, None] * choc
+                vitesse[b] += wj[lot, None] * choc
+
+        stock.vitesse[:n] = vitesse[:n]
+        ordre = np.argsort(cles)
+        self.cles, self.impulsions = cles[ordre], impulsion[ordre]
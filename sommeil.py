@@ -0,0 +1,116 @@
+import numpy as np
+
+# Mise en sommeil des corps au repos, par îlots de contact.
+# Un corps est calme quand sa vitesse reste sous seuil_vitesse. Les corps en contact forment un
+# îlot (composante connexe du graphe des contacts) : un îlot s'endort d'un bloc quand tous ses
+# corps sont calmes depuis temps_avant_sommeil et que son énergie cinétique par unité de masse est
+# sous seuil_energie. Les corps endormis ne sont plus intégrés et les paires de deux corps endormis
+# ne sont plus testées ; un contact avec un corps éveillé (ou une vitesse imposée de l'extérieur)
+# réveille tout son îlot. Indépendant de la dimension : sert au monde 2D et aux balles 3D.
+
+SEUIL_VITESSE = 15.0 # Vitesse (pixels/s) sous laquelle un corps est calme (quelques a * dt : les piles vibrent)
+SEUIL_ENERGIE = 0.5 * (SEUIL_VITESSE / 2) ** 2 # Énergie cinétique par unité de masse d'un îlot endormi
+TEMPS_AVANT_SOMMEIL = 0.5 # Secondes de calme avant l'endormissement
+
+
+def composantes(n, i, j):
+    # Étiquette de composante connexe (plus petit indice de la composante) de chacun des n corps,
+    # pour les arêtes (i, j) : propagation du minimum et saut de pointeurs, vectorisés
+    etiquette = np.arange(n)
+    if len(i) == 0:
+        return etiquette
+    while True:
+        avant = etiquette
+        etiquette = etiquette.copy()
+        minimum = np.minimum(etiquette[i], etiquette[j])
+        np.minimum.at(etiquette, i, minimum)
+        np.minimum.at(etiquette, j, minimum)
+        etiquette = etiquette[etiquette]
+        if np.array_equal(etiquette, avant):
+            return etiquette
+
+
+class Sommeil:
+    def __init__(self, seuil_vitesse=SEUIL_VITESSE, seuil_energie=SEUIL_ENERGIE,
+                 temps_avant_sommeil=TEMPS_AVANT_SOMMEIL):
+        self.seuil_vitesse = seuil_vitesse
+        self.seuil_energie = seuil_energie
+        self.temps_avant_sommeil = temps_avant_sommeil
+        self.endormi = np.zeros(0, dtype=bool)
+        self.temps_calme = np.zeros(0)
+        self.ilot = np.zeros(0, dtype=np.int64)
+        self._contacts = []
+        # Données des appelants sur les corps endormis (immobiles), vidées quand l'ensemble change
+        self.cache = {}
+
+    def redimensionner(self, n):
+        # Les nouveaux corps sont éveillés et forment chacun leur propre îlot
+        ancien = len(self.endormi)
+        if n > ancien:
+            self.endormi = np.concatenate((self.endormi, np.zeros(n - ancien, dtype=bool)))
+            self.temps_calme = np.concatenate((self.temps_calme, np.zeros(n - ancien)))
+            self.ilot = np.concatenate((self.ilot, np.arange(ancien, n)))
+            self.cache.clear()
+
+    def actifs(self):
+        return np.nonzero(~self.endormi)[0]
+
+    def nb_endormis(self):
+        return int(self.endormi.sum())
+
+    def filtrer_paires(self, i, j):
+        # Retire les paires dont les deux corps dorment
+        garde = ~(self.endormi[i] & self.endormi[j])
+        return i[garde], j[garde]
+
+    def noter_contacts(self, i, j):
+        # Contacts du pas en cours ; réveille les îlots endormis touchés par un corps éveillé
+        i, j = np.asarray(i, dtype=np.int64), np.asarray(j, dtype=np.int64)
+        self.reveiller(np.concatenate((i[self.endormi[i]], j[self.endormi[j]])))
+        self._contacts.append((i, j))
+
+    def reveiller(self, corps):
+        # Réveille les îlots contenant ces corps ; renvoie le masque des corps réveillés
+        corps = np.asarray(corps, dtype=np.int64)
+        reveil = np.zeros(len(self.endormi), dtype=bool)
+        if len(corps) == 0:
+            return reveil
+        reveil = self.endormi & np.isin(self.ilot, self.ilot[corps])
+        self.endormi[reveil] = False
+        self.temps_calme[reveil] = 0.0
+        if reveil.any():
+            self.cache.clear()
+        return reveil
+
+    def reveiller_si_vitesse(self, vitesses):
+        # Un corps endormi dont la vitesse n'est plus nulle a été poussé de l'extérieur
+        self.reveiller(np.nonzero(self.endormi & (vitesses != 0).any(axis=1))[0])
+
+    def mettre_a_jour(self, vitesses, masses, dt):
+        # Fin de pas : îlots des corps éveillés d'après les contacts notés, puis endormissement.
+        # Renvoie le masque des corps qui viennent de s'endormir (leur vitesse est à annuler).
+        n = len(vitesses)
+        carres = (vitesses ** 2).sum(axis=1)
+        self.temps_calme = np.where(carres < self.seuil_vitesse ** 2, self.temps_calme + dt, 0.0)
+
+        if self._contacts:
+            i = np.concatenate([c[0] for c in self._contacts])
+            j = np.concatenate([c[1] for c in self._contacts])
+        else:
+            i = j = np.zeros(0, dtype=np.int64)
+        self._contacts = []
+        # Les îlots endormis gardent leur étiquette (leurs contacts ne sont plus testés)
+        self.ilot = np.where(self.endormi, self.ilot, composantes(n, i, j))
+
+        eveille = ~self.endormi
+        calme_min = np.full(n, np.inf)
+        np.minimum.at(calme_min, self.ilot[eveille], self.temps_calme[eveille])
+        energie = np.bincount(self.ilot, weights=0.5 * masses * carres * eveille, minlength=n)
+        masse = np.bincount(self.ilot, weights=masses * eveille, minlength=n)
+        dort = (calme_min >= self.temps_avant_sommeil) & (energie <= self.seuil_energie * masse)
+
+        nouveaux = eveille & dort[self.ilot]
+        self.endormi |= nouveaux
+        if nouveaux.any():
+            self.cache.clear()
+        return nouveaux
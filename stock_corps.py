@@ -0,0 +1,109 @@
+import numpy as np
+
+# Stockage des corps en structure de tableaux (SoA) : toutes les grandeurs physiques sont
+# rangées dans des tableaux NumPy contigus, une ligne par corps. Les objets (Cercle, Carre,
+# Rectangle) ne sont que des vues : leurs attributs x, vy, masse... lisent et écrivent
+# directement dans ces tableaux, ce qui permet d'intégrer tous les corps d'un seul coup.
+
+CAPACITE_INITIALE = 16
+
+
+class StockCorps:
+    # Tableaux (nom, nombre de colonnes, valeur par défaut)
+    CHAMPS = (
+        ("position", 2, 0.0),
+        ("vitesse", 2, 0.0),
+        ("acceleration", 2, 0.0),
+        ("decalage", 2, 0.0),    # Coin min de la boîte englobante par rapport à (x, y)
+        ("dimensions", 2, 0.0),  # Largeur et hauteur de la boîte englobante
+        ("restitution", 1, 1.0),
+        ("masse", 1, 1.0),
+    )
+
+    def __init__(self, capacite=CAPACITE_INITIALE):
+        self.n = 0
+        self.capacite = max(capacite, 1)
+        for nom, colonnes, defaut in self.CHAMPS:
+            forme = (self.capacite, colonnes) if colonnes > 1 else (self.capacite,)
+            setattr(self, nom, np.full(forme, defaut))
+
+    def _agrandir(self, capacite):
+        # Réallocation (doublement) : les vues gardent (stock, indice), elles restent donc valides
+        for nom, colonnes, defaut in self.CHAMPS:
+            ancien = getattr(self, nom)
+            forme = (capacite, colonnes) if colonnes > 1 else (capacite,)
+            nouveau = np.full(forme, defaut)
+            nouveau[:self.n] = ancien[:self.n]
+            setattr(self, nom, nouveau)
+        self.capacite = capacite
+
+    def allouer(self, n=1):
+        # Réserve n lignes initialisées aux valeurs par défaut ; renvoie l'indice de la première
+        if self.n + n > self.capacite:
+            self._agrandir(max(2 * self.capacite, self.n + n))
+        debut = self.n
+        self.n += n
+        return debut
+
+    def ajouter(self, objet):
+        # Rattache l'objet à ce stock en recopiant son état depuis son stock précédent
+        indice = self.allouer()
+        ancien = getattr(objet, "_stock", None)
+        if ancien is not None:
+            for nom, _, _ in self.CHAMPS:
+                getattr(self, nom)[indice] = getattr(ancien, nom)[objet._indice]
+        objet._stock = self
+        objet._indice = indice
+        return indice
+
+    def boites(self):
+        # Boîtes englobantes (xmin, ymin, xmax, ymax) de tous les corps, tableau (n, 4)
+        coin = self.position[:self.n] + self.decalage[:self.n]
+        return np.hstack((coin, coin + self.dimensions[:self.n]))
+
+    def rebonds_bords(self, largeur_monde, sol=None):
+        # Collisions avec les murs, le plafond et le sol, pour tous les corps à la fois
+        n = self.n
+        x, y = self.position[:n, 0], self.position[:n, 1]
+        vx, vy = self.vitesse[:n, 0], self.vitesse[:n, 1]
+        ox, oy = self.decalage[:n, 0], self.decalage[:n, 1]
+        l, h = self.dimensions[:n, 0], self.dimensions[:n, 1]
+        e = self.restitution[:n]
+
+        droite = x + ox + l > largeur_monde
+        gauche = ~droite & (x + ox < 0)
+        x[droite] = largeur_monde - ox[droite] - l[droite]
+        x[gauche] = -ox[gauche]
+        rebond_x = droite | gauche
+        vx[rebond_x] *= -e[rebond_x]
+
+        if sol is not None:
+            bas = y + oy + h > sol.y
+            y[bas] = sol.y - oy[bas] - h[bas]
+            vy[bas] *= -sol.coefficient_restitution
+        else:
+            bas = np.zeros(n, dtype=bool)
+        haut = ~bas & (y + oy < 0) # Plafond
+        y[haut] = -oy[haut]
+        vy[haut] *= -e[haut]
+
+
+# Propriétés qui lisent/écrivent une case des tableaux du stock
+def champ_vecteur(nom, colonne):
+    def lire(self):
+        return getattr(self._stock, nom).item(self._indice, colonne)
+
+    def ecrire(self, valeur):
+        getattr(self._stock, nom)[self._indice, colonne] = valeur
+
+    return property(lire, ecrire)
+
+
+def champ_scalaire(nom):
+    def lire(self):
+        return getattr(self._stock, nom).item(self._indice)
+
+    def ecrire(self, valeur):
+        getattr(self._stock, nom)[self._indice] = valeur
+
+    return property(lire, ecrire)
@@ -0,0 +1,19 @@
+import pytest
+
+import diagnostics
+import Simulation_planete
+from integrators import SemiImplicitEuler, VelocityVerlet
+
+
+def test_planet_builder_default_integrator():
+    # Same default from Python as from the command line
+    system = diagnostics.planet_builder()(Simulation_planete.TIMESTEP)
+    assert isinstance(system.integrator, SemiImplicitEuler)
+    assert isinstance(diagnostics.planet_builder("verlet")(Simulation_planete.TIMESTEP).integrator, VelocityVerlet)
+
+
+def test_world_has_no_area_quantity():
+    with pytest.raises(SystemExit):
+        diagnostics.main(["simulation", "--sweep", "--quantity", "area"])
+    with pytest.raises(ValueError):
+        diagnostics.sweep(diagnostics.world_builder(), 0.05, 1 / 60, quantity="area")
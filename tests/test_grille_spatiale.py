@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import Simulation
+from grille_spatiale import GrilleSpatiale
+from phase_etroite import CARRE, CERCLE, RECTANGLE
+
+
+class ToutesLesPaires:
+    # Broad phase de référence : toutes les paires i < j, comme la double boucle d'origine
+    def paires_depuis_boites(self, boites):
+        i, j = np.triu_indices(len(boites), 1)
+        return list(zip(i.tolist(), j.tolist()))
+
+    def paires_avec(self, boites, corps):
+        return [] # Toutes les paires sont déjà candidates
+
+
+def chevauchements(boites):
+    # Paires (i, j), i < j, de boîtes qui se chevauchent, par force brute
+    i, j = np.triu_indices(len(boites), 1)
+    a, b = boites[i], boites[j]
+    garder = (a[:, 0] < b[:, 2]) & (b[:, 0] < a[:, 2]) & (a[:, 1] < b[:, 3]) & (b[:, 1] < a[:, 3])
+    return list(zip(i[garder].tolist(), j[garder].tolist()))
+
+
+def boites_aleatoires(n, graine=0):
+    rng = np.random.default_rng(graine)
+    coin = rng.uniform(0, 500, (n, 2))
+    return np.hstack((coin, coin + rng.uniform(5, 40, (n, 2))))
+
+
+def test_paires_depuis_boites():
+    boites = boites_aleatoires(300)
+    assert GrilleSpatiale().paires_depuis_boites(boites) == chevauchements(boites)
+
+
+def test_paires_avec():
+    boites = boites_aleatoires(300, graine=1)
+    corps = np.array([3, 17, 42, 250])
+    attendu = [(i, j) for i, j in chevauchements(boites) if i in corps or j in corps]
+    assert GrilleSpatiale().paires_avec(boites, corps) == attendu
+    assert GrilleSpatiale().paires_avec(boites, []) == []
+
+
+def scene(broad_phase, forme, n=60, graine=0):
+    # n corps serrés qui tombent sur le sol : les réponses en chaîne poussent des corps contre
+    # d'autres dont la boîte ne touchait pas la leur au début de la phase
+    rng = np.random.default_rng(graine)
+    monde = Simulation.World(sol=Simulation.Sol(550, 50, Simulation.GRIS, 0.3), broad_phase=broad_phase)
+    formes = rng.integers(0, 3, n) if forme is None else np.full(n, forme)
+    for f, x, y, vx, vy, t in zip(formes.tolist(), rng.uniform(200, 400, n), rng.uniform(300, 500, n),
+                                  rng.uniform(-80, 80, n), rng.uniform(-80, 80, n), rng.uniform(10, 30, n)):
+        if f == CERCLE:
+            objet = Simulation.Cercle(x, y, t / 2, Simulation.NOIR)
+        elif f == CARRE:
+            objet = Simulation.Carre(x, y, t, Simulation.NOIR)
+        else:
+            objet = Simulation.Rectangle(x, y, t * 1.5, t, Simulation.NOIR)
+        objet.vx, objet.vy, objet.ay = vx, vy, 98
+        monde.ajouter(objet)
+    return monde
+
+
+@pytest.mark.parametrize("forme, n_pas", [(RECTANGLE, 10), (CARRE, 60), (CERCLE, 60), (None, 30)])
+def test_grid_matches_double_loop(forme, n_pas):
+    # Grille spatiale et double boucle sur toutes les paires : même résultat, pas après pas
+    grille, reference = scene(None, forme), scene(ToutesLesPaires(), forme)
+    for _ in range(n_pas):
+        grille.step(1 / 60)
+        reference.step(1 / 60)
+    n = grille.stock.n
+    assert np.abs(grille.stock.position[:n] - reference.stock.position[:n]).max() <= 1e-9
+    assert np.abs(grille.stock.vitesse[:n] - reference.stock.vitesse[:n]).max() <= 1e-9
+    assert grille.nb_collisions == reference.nb_collisions
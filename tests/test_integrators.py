@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+import Simulation
+from integrators import INTEGRATORS
+
+
+def chute_libre(integrateur, n_pas=30):
+    # Un cercle lancé sans sol : trajectoire parabolique exacte pour un schéma d'ordre >= 2
+    monde = Simulation.World(integrateur=integrateur)
+    cercle = monde.ajouter(Simulation.Cercle(400.0, 100.0, 10, Simulation.NOIR))
+    cercle.vx, cercle.vy, cercle.ay = 20.0, -30.0, 98.0
+    monde.run(n_pas)
+    return monde, cercle
+
+
+@pytest.mark.parametrize("integrateur", ["verlet", "yoshida4", "rk4", "block"])
+def test_world_integrators(integrateur):
+    monde, cercle = chute_libre(integrateur)
+    t = monde.temps
+    assert cercle.x == pytest.approx(400.0 + 20.0 * t, abs=1e-9)
+    assert cercle.y == pytest.approx(100.0 - 30.0 * t + 98.0 * t * t / 2, abs=1e-9)
+    assert cercle.vy == pytest.approx(-30.0 + 98.0 * t, abs=1e-9)
+
+
+def test_world_block_with_sleep():
+    # Corps endormis : l'intégrateur ne reçoit que les corps éveillés
+    monde = Simulation.World(sol=Simulation.Sol(550, 50, Simulation.GRIS, 0.3), integrateur="block", sommeil=True)
+    rng = np.random.default_rng(0)
+    for x in rng.uniform(50, 750, 20):
+        monde.ajouter(Simulation.Cercle(float(x), 500.0, 8, Simulation.NOIR)).ay = 98.0
+    monde.run(240)
+    assert monde.sommeil.nb_endormis() > 0
+    assert np.isfinite(monde.stock.position[:monde.stock.n]).all()
+
+
+def test_every_integrator_runs_in_world():
+    for nom in INTEGRATORS:
+        Simulation.World(objets=[Simulation.Carre(100.0, 100.0, 20, Simulation.NOIR)], integrateur=nom).run(3)
@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import kernels
+
+TOLERANCE = 1e-9
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def check_backends_in(backend):
+    # check_backends() in a fresh interpreter, the backend being chosen at import from PHYSICS_BACKEND
+    env = dict(os.environ, PHYSICS_BACKEND=backend)
+    code = "import json, kernels; print(json.dumps([kernels.BACKEND, kernels.ENABLED, kernels.check_backends()]))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_check_backends(monkeypatch, enabled):
+    # Kernels (compiled, or interpreted without Numba) against the code they replace
+    monkeypatch.setattr(kernels, "ENABLED", enabled)
+    differences = kernels.check_backends(n=100, steps=30)
+    assert set(differences) == {"semi_implicit_euler", "direct_gravity", "circle_pairs", "update_balls"}
+    for name, difference in differences.items():
+        assert difference <= TOLERANCE, name
+    assert kernels.ENABLED is enabled
+
+
+def test_numba_backend():
+    pytest.importorskip("numba")
+    backend, enabled, differences = check_backends_in("numba")
+    assert backend == "numba" and enabled
+    for name, difference in differences.items():
+        assert difference <= TOLERANCE, name
+
+
+def test_python_backend():
+    # Forced fallback: the simulations run their original code, the kernels are still checked
+    backend, enabled, differences = check_backends_in("python")
+    assert backend == "python" and not enabled
+    for name, difference in differences.items():
+        assert difference <= TOLERANCE, name
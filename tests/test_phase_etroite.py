@@ -0,0 +1,195 @@
+import math
+
+import numpy as np
+import pytest
+
+import phase_etroite
+import Simulation
+from phase_etroite import CARRE, CERCLE, RECTANGLE
+
+
+def creer(forme, x, y, vx=0.0, vy=0.0, taille=20.0, e=0.8):
+    if forme == CERCLE:
+        objet = Simulation.Cercle(x, y, taille / 2, Simulation.NOIR, e)
+    elif forme == CARRE:
+        objet = Simulation.Carre(x, y, taille, Simulation.NOIR, e)
+    else:
+        objet = Simulation.Rectangle(x, y, taille * 1.5, taille, Simulation.NOIR, e)
+    objet.vx, objet.vy = vx, vy
+    return objet
+
+
+def monde(objets):
+    return Simulation.World(objets=objets)
+
+
+def resoudre(monde, paires):
+    paires = np.array(paires, dtype=np.int64).reshape(-1, 2)
+    return phase_etroite.phase_etroite(monde.stock, monde.formes(), paires[:, 0], paires[:, 1])
+
+
+def centre(objet):
+    # Centre de la boîte englobante
+    return np.array(objet.get_centre(), dtype=float)
+
+
+def placer(objet, cx, cy):
+    # Déplace l'objet pour que son centre soit en (cx, cy)
+    dx, dy = np.array([cx, cy]) - centre(objet)
+    objet.x += dx
+    objet.y += dy
+    return objet
+
+
+# --- Chaque entrée de TABLE ---
+
+@pytest.mark.parametrize("couple", sorted(phase_etroite.TABLE))
+def test_table_entry(couple):
+    # Deux corps qui se chevauchent en se rapprochant (centres à 15 px sur une horizontale) :
+    # collision détectée, corps écartés, vitesse relative qui ne les rapproche plus
+    premier = placer(creer(couple[0], 0.0, 0.0, vx=30.0), 100.0, 100.0)
+    second = placer(creer(couple[1], 0.0, 0.0, vx=-10.0), 115.0, 100.0)
+    m = monde([premier, second])
+
+    assert resoudre(m, [(0, 1)]).tolist() == [True]
+    assert second.vx - premier.vx >= 0
+    assert centre(second)[0] - centre(premier)[0] > 15.0
+    assert centre(premier)[1] == centre(second)[1] == 100.0
+
+
+@pytest.mark.parametrize("couple", sorted(phase_etroite.TABLE))
+def test_table_entry_separated(couple):
+    # Corps éloignés : ni collision ni réponse
+    premier, second = creer(couple[0], 100.0, 100.0, vx=5.0), creer(couple[1], 300.0, 100.0, vx=-5.0)
+    m = monde([premier, second])
+    etat = m.stock.position[:2].copy(), m.stock.vitesse[:2].copy()
+    assert resoudre(m, [(0, 1)]).tolist() == [False]
+    assert np.array_equal(m.stock.position[:2], etat[0]) and np.array_equal(m.stock.vitesse[:2], etat[1])
+
+
+def test_momentum_conserved_for_circles_and_boxes():
+    # Cercle / cercle et cercle / boîte : choc 1D pondéré par les masses
+    for forme in (CERCLE, CARRE, RECTANGLE):
+        m = monde([placer(creer(CERCLE, 0.0, 0.0, vx=40.0, vy=3.0), 100.0, 100.0),
+                   placer(creer(forme, 0.0, 0.0, vx=-20.0), 114.0, 96.0)])
+        masses = m.stock.masse[:2].copy()
+        avant = (masses[:, None] * m.stock.vitesse[:2]).sum(axis=0)
+        assert resoudre(m, [(0, 1)]).tolist() == [True]
+        apres = (masses[:, None] * m.stock.vitesse[:2]).sum(axis=0)
+        assert apres == pytest.approx(avant, abs=1e-9)
+        assert not np.array_equal(m.stock.vitesse[0], [40.0, 3.0])
+
+
+# --- Ordre des lots ---
+
+def test_pair_brought_into_contact_is_tested():
+    # (0, 1) repousse le carré 0 vers la gauche, contre le carré 2 qui ne le touchait pas au début
+    # du pas : comme dans la boucle paire par paire, (0, 2) est testée après cette réponse
+    objets = [creer(CARRE, 100.0, 100.0), creer(CARRE, 110.0, 100.0), creer(CARRE, 78.0, 100.0)]
+    m = monde(objets)
+    assert not phase_etroite.collision_paire(objets[0], objets[2])
+    touche = resoudre(m, [(0, 1), (0, 2)])
+    assert touche.tolist() == [True, True]
+    assert m.stock.position[2, 0] == pytest.approx(76.5)
+
+
+# --- Comparaison avec la boucle paire par paire d'origine ---
+
+def boucle_d_origine(objets):
+    # Carre.gestion_collision / Rectangle.gestion_collision et Cercle.gestion_collision d'avant la
+    # table, appelés pour chaque paire i < j dans l'ordre, sur des copies (x, y, l, h, vx, vy, e, m)
+    corps = [dict(x=o.x, y=o.y, vx=o.vx, vy=o.vy, e=o.coefficient_restitution, m=o.masse, forme=o.forme,
+                  l=o.get_boite()[2] - o.get_boite()[0], h=o.get_boite()[3] - o.get_boite()[1]) for o in objets]
+    for i in range(len(corps)):
+        for j in range(i + 1, len(corps)):
+            a, b = corps[i], corps[j]
+            if a["forme"] == CERCLE:
+                cercles(a, b)
+            else:
+                boites(a, b)
+    return (np.array([(c["x"], c["y"]) for c in corps]), np.array([(c["vx"], c["vy"]) for c in corps]))
+
+
+def cercles(a, b):
+    ra, rb = a["l"] / 2, b["l"] / 2
+    d = math.sqrt((a["x"] - b["x"]) ** 2 + (a["y"] - b["y"]) ** 2)
+    if not d < ra + rb or d == 0:
+        return
+    nx, ny = (b["x"] - a["x"]) / d, (b["y"] - a["y"]) / d
+    v1n, v2n = a["vx"] * nx + a["vy"] * ny, b["vx"] * nx + b["vy"] * ny
+    e, m1, m2 = min(a["e"], b["e"]), a["m"], b["m"]
+    v1 = (m1 * v1n + m2 * v2n + m2 * e * (v2n - v1n)) / (m1 + m2)
+    v2 = (m1 * v1n + m2 * v2n + m1 * e * (v1n - v2n)) / (m1 + m2)
+    a["vx"] += (v1 - v1n) * nx
+    a["vy"] += (v1 - v1n) * ny
+    b["vx"] += (v2 - v2n) * nx
+    b["vy"] += (v2 - v2n) * ny
+    recul = 0.5 * (ra + rb - d)
+    if recul > 0:
+        a["x"] -= recul * nx
+        a["y"] -= recul * ny
+        b["x"] += recul * nx
+        b["y"] += recul * ny
+
+
+def boites(a, b):
+    if not (a["x"] < b["x"] + b["l"] and a["x"] + a["l"] > b["x"] and
+            a["y"] < b["y"] + b["h"] and a["y"] + a["h"] > b["y"]):
+        return
+    e = min(a["e"], b["e"])
+    a["vx"], b["vx"] = e * b["vx"], e * a["vx"]
+    a["vy"], b["vy"] = e * b["vy"], e * a["vy"]
+    overlap_x = (a["l"] / 2 + b["l"] / 2) - abs((a["x"] + a["l"] / 2) - (b["x"] + b["l"] / 2))
+    overlap_y = (a["h"] / 2 + b["h"] / 2) - abs((a["y"] + a["h"] / 2) - (b["y"] + b["h"] / 2))
+    if overlap_x > 0 and overlap_y > 0:
+        dx = (b["x"] + b["l"] / 2) - (a["x"] + a["l"] / 2)
+        dy = (b["y"] + b["h"] / 2) - (a["y"] + a["h"] / 2)
+        if overlap_x < overlap_y:
+            sens = 1 if dx > 0 else -1
+            a["x"] -= sens * overlap_x / 2
+            b["x"] += sens * overlap_x / 2
+        else:
+            sens = 1 if dy > 0 else -1
+            a["y"] -= sens * overlap_y / 2
+            b["y"] += sens * overlap_y / 2
+
+
+def scene(forme, n=60, graine=0):
+    # n corps de la même forme, serrés dans un carré de 200 px : beaucoup de contacts en chaîne
+    rng = np.random.default_rng(graine)
+    return [creer(forme, float(x), float(y), float(vx), float(vy), taille=float(t), e=float(e))
+            for x, y, vx, vy, t, e in zip(rng.uniform(100, 300, n), rng.uniform(100, 300, n),
+                                          rng.uniform(-50, 50, n), rng.uniform(-50, 50, n),
+                                          rng.uniform(10, 30, n), rng.uniform(0.3, 1.0, n))]
+
+
+@pytest.mark.parametrize("forme", [CERCLE, CARRE, RECTANGLE])
+def test_matches_original_pair_loop(forme):
+    objets = scene(forme)
+    positions, vitesses = boucle_d_origine(objets)
+    m = monde(objets)
+    n = len(objets)
+    resoudre(m, [(i, j) for i in range(n) for j in range(i + 1, n)])
+    assert np.abs(m.stock.position[:n] - positions).max() <= 1e-9
+    assert np.abs(m.stock.vitesse[:n] - vitesses).max() <= 1e-9
+
+
+def test_mixed_scene_matches_sequential_table():
+    # Formes mélangées : les lots donnent le résultat de la table appliquée paire par paire
+    rng = np.random.default_rng(3)
+    objets = [creer(int(f), float(x), float(y), float(vx), 0.0, taille=float(t))
+              for f, x, y, vx, t in zip(rng.integers(0, 3, 60), rng.uniform(100, 300, 60), rng.uniform(100, 300, 60),
+                                        rng.uniform(-50, 50, 60), rng.uniform(10, 30, 60))]
+    copies = monde([creer(o.forme, o.x, o.y, o.vx, o.vy) for o in objets])
+    for k, o in enumerate(objets):
+        for nom in ("position", "vitesse", "decalage", "dimensions", "restitution", "masse"):
+            getattr(copies.stock, nom)[k] = getattr(o._stock, nom)[o._indice]
+    n = len(objets)
+    paires = [(i, j) for i in range(n) for j in range(i + 1, n)]
+    for i, j in paires:
+        if phase_etroite.collision_paire(copies.objets[i], copies.objets[j]):
+            phase_etroite.gestion_paire(copies.objets[i], copies.objets[j])
+    m = monde(objets)
+    resoudre(m, paires)
+    assert np.abs(m.stock.position[:n] - copies.stock.position[:n]).max() <= 1e-9
+    assert np.abs(m.stock.vitesse[:n] - copies.stock.vitesse[:n]).max() <= 1e-9